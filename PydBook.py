@@ -1,7 +1,20 @@
 from PySide6 import QtCore, QtWidgets, QtGui
 import math  # Only for floor function
 import locale  # For knowing the user's language
+import os  # For the paths of the journals
+import threading  # For limiting how much of a file is read ahead of what is shown
 from modules import string_changes  # For undoing-redoing
+from modules import journal  # For recovering the text and its history after a crash
+from modules import text_buffer  # For knowing the text before a change
+from modules import text_file  # For reading files in chunks
+from modules import mapped_text  # For viewing files too large to be edited
+from modules import text_stats  # For counting the lines, words and characters while typing
+from modules import diff_worker  # For comparing large texts in the background
+from modules import edit_trace  # For recording editing sessions, to be replayed by benchmarks
+from modules import search_index  # For finding texts
+import argparse  # For the options of the command line
+import functools  # For reading the texts and the stylesheet once
+import itertools  # For reading the texts until the first empty line, and for numbering the journals
 
 
 def get_language() -> str:
@@ -20,21 +33,158 @@ def get_language() -> str:
         return standard_language
 
 
+@functools.cache
+def load_texts(language: str) -> tuple[str, ...]:
+    """Returns the texts of the interface in 'language', in order, read from its file in 'lang' once, and then kept.
+    The texts end at the first empty line."""
+
+    with open(file=os.path.join(APP_FOLDER, "lang", f"{language}.txt"), mode="r", encoding="utf-8") as file:
+        lines = file.read().split("\n")
+
+    return tuple(itertools.takewhile(lambda line: line != "", lines))
+
+
+@functools.cache
+def load_stylesheet(src: str) -> str:
+    """Returns the stylesheet in the file 'src', read once, and then kept."""
+
+    with open(file=src, mode="r", encoding="utf-8") as file:
+        return file.read()
+
+
+def format_size(size: int) -> str:
+    """Returns a number of bytes as a short text, like "1.5 MB"."""
+
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+    return f"{size:.1f} GB"
+
+
 # Constants
+APP_FOLDER = os.path.dirname(os.path.abspath(__file__))  # Where the texts and the stylesheet are, whatever the
+# working folder is
 APP_TITLE = "PydBook"  # Name of the application, on the titles of the windows, for example.
+HISTORY_MAX_BYTES = 64 * 1024 * 1024  # Memory the undo history can use, about, before forgetting its oldest changes
+HISTORY_CHECKPOINT_INTERVAL = 100  # Sets of changes between copies of the whole text, kept for jumping in the history
+HISTORY_CHECKPOINT_BYTES = 4 * 1024 * 1024  # Bytes of changes between copies of the whole text
+OPEN_CHUNK_SIZE = 1024 * 1024  # Characters of a file read, and shown, at once, when opening it
+OPEN_FIRST_CHUNK_SIZE = 64 * 1024  # Characters of the first chunk, smaller so that the file is shown sooner
+OPEN_CHUNKS_AHEAD = 2  # Chunks which can be read before the ones before are shown, so memory stays bounded
+VIEWER_MIN_SIZE = 256 * 1024 * 1024  # Bytes from which files are opened read-only, in a viewer, not in the editor
+DIFF_ASYNC_SIZE = 256 * 1024  # Characters, of both texts, from which texts are compared in the background
+JOURNAL_REWRITE_DELAY = 2000  # Milliseconds without edits after which the journal is rewritten, if it is due
+RELOAD_DELAY = 100  # Milliseconds from the last change of the file, by another program, until it is read again
+RELOAD_PROBE_SIZE = 4096  # Bytes at the end of the file read which must not change for it to be taken as appended to
+WHOLE_TEXT_CHANGES = 1000  # Changes applied at once from which the whole text is replaced, as it costs less
 LANGUAGE = get_language()
+PLAIN_TEXT_TABLE = str.maketrans({"\u2029": "\n", "\u2028": "\n", "\ufdd0": "\n", "\ufdd1": "\n", "\xa0": " "})
+# Qt's separators and non-breaking spaces, as they are in the plain text
+
+
+class EditEvent:
+    """An edit of the text of a PydEditor, as published by its 'edited' signal. 'changes' are the changes done, with
+    the indexes of the changes in the history, or None if the whole text was replaced; 'revision' is the revision of
+    the text afterwards. The text itself is only copied if asked for, by 'text', and only while the event is handled,
+    as the text can change afterwards."""
+
+    __slots__ = ("changes", "revision", "_buffer", "_text")
+
+    def __init__(self, changes: list[string_changes.Change] | None, revision: int, buffer: text_buffer.TextBuffer):
+        self.changes = changes
+        self.revision = revision
+        self._buffer = buffer
+        self._text: str | None = None
+
+    def text(self) -> str:
+        if self._text is None:
+            self._text = self._buffer.text()
+        return self._text
+
+    def slice(self, start: int, end: int) -> str:
+        """Returns the text between the indexes 'start' and 'end', without copying the rest."""
+
+        return self._buffer.slice(start, end)
 
 
 class PydEditor(QtWidgets.QPlainTextEdit):
+    """The editor of the text. Every edit, by the user, by undoing-redoing or by loading a text, is published, once,
+    by the 'edited' signal, with an EditEvent. When sets of changes, which were being calculated, are added to the
+    history, an EditEvent without changes is published, as the revision changes."""
+
+    edited = QtCore.Signal(object)
+    diff_done = QtCore.Signal()  # Sent, from another thread, when a comparison in the background finishes
+
     def __init__(self, parent=None):
         super().__init__(parent)
 
+        self.setUndoRedoEnabled(False)  # The editor keeps its own history, so the document's would only waste memory
+
+        self.document().contentsChange.connect(self.contents_change)
         self.textChanged.connect(self.text_changed)
 
-        self.changes_list = string_changes.ChangesList()  # Ordered list of text-modifying actions
-        self.lastText: str = ""  # Temporary variable of the written text after 'text_changed' event finishes
+        self.changes_list = self.new_changes_list()  # Tree of text-modifying actions
+        self.shadow_text = text_buffer.TextBuffer()  # Copy of the text, as it was before the last contents change.
+        # Qt does not tell which characters were removed, so they are read from here
+        self.stats = text_stats.TextStats()  # Lines, words and characters of the text, kept up to date by each edit
+        self.pending_changes: list[string_changes.Change] = []  # Changes not yet added to 'changes_list'
         self.undo_redoing: bool = False  # If the editor is changing the text for a undo-redoing action
 
+        self.diff_pool = diff_worker.DiffPool()
+        self.queued_history: list[diff_worker.DiffTask | list[string_changes.Change]] = []  # Sets of changes to be
+        # added to 'changes_list', in order, after the first one, whose comparison is still being calculated
+        self.diff_done.connect(self.add_queued_history)
+
+        self.trace_recorder: TraceRecorder | None = None  # If not None, it is told of every action of the user
+
+    @staticmethod
+    def new_changes_list() -> string_changes.ChangesList:
+        return string_changes.ChangesList(max_bytes=HISTORY_MAX_BYTES, checkpoint_interval=HISTORY_CHECKPOINT_INTERVAL,
+                                          checkpoint_bytes=HISTORY_CHECKPOINT_BYTES)
+
+    def load_text(self, text: str, changes_list: string_changes.ChangesList | None = None) -> None:
+        """Replaces the text with 'text', and the history with 'changes_list', or with an empty one. The replacement
+        is not a change in the history."""
+
+        for entry in self.queued_history:
+            if isinstance(entry, diff_worker.DiffTask):
+                entry.cancel()
+        self.queued_history = []
+
+        self.undo_redoing = True
+        self.setPlainText(text)
+        self.undo_redoing = False
+
+        self.changes_list = changes_list if changes_list is not None else self.new_changes_list()
+        self.edited.emit(EditEvent(None, self.revision(), self.shadow_text))
+
+    def append_text(self, text: str) -> None:
+        """Adds 'text' at the end of the text, as when a file is being read. The addition is not a change in the
+        history."""
+
+        position = len(self.shadow_text)
+
+        self.undo_redoing = True
+        cursor = QtGui.QTextCursor(self.document())
+        cursor.movePosition(QtGui.QTextCursor.End)
+        cursor.insertText(text)
+        self.undo_redoing = False
+
+        changes = [string_changes.Change(string_changes.Change.NEW, position, text)]
+        self.edited.emit(EditEvent(changes, self.revision(), self.shadow_text))
+
+    def start_trace(self, trace_src: str) -> None:
+        """Starts recording the editing session to the edit trace at 'trace_src'."""
+
+        self.trace_recorder = TraceRecorder(self, trace_src)
+
+    def stop_trace(self) -> None:
+        if self.trace_recorder is not None:
+            self.trace_recorder.close()
+            self.trace_recorder = None
+
     def keyPressEvent(self, e: QtGui.QKeyEvent) -> None:
         if e.matches(QtGui.QKeySequence.Undo):
             self.undo()
@@ -43,53 +193,752 @@ class PydEditor(QtWidgets.QPlainTextEdit):
             self.redo()
             return
 
+        # A paste is recorded with its text, by 'insertFromMimeData', as the clipboard may differ when replayed
+        if self.trace_recorder is not None and not e.matches(QtGui.QKeySequence.Paste):
+            self.trace_recorder.record(edit_trace.KEY, key=e.key(), modifiers=e.modifiers().value, text=e.text())
+
         super().keyPressEvent(e)
 
-    def text_changed(self) -> None:
+    def insertFromMimeData(self, source: QtCore.QMimeData) -> None:
+        """Called when pasting, or dropping, 'source'."""
+
+        if self.trace_recorder is not None:
+            self.trace_recorder.record(edit_trace.PASTE, text=source.text())
+
+        super().insertFromMimeData(source)
+
+    def contents_change(self, position: int, chars_removed: int, chars_added: int) -> None:
+        """Called when the document reports that, at 'position', 'chars_removed' characters were replaced by
+        'chars_added' ones. The cost of recording it depends on the size of the edit, not on the size of the text.
+        Qt counts them in UTF-16 code units, so they are converted to indexes of characters, as the history's are."""
+
+        # Qt counts the paragraph separator at the end of the document, which is not part of the plain text
+        chars_removed = min(chars_removed, self.shadow_text.utf16_length() - position)
+        chars_added = max(0, min(chars_added, self.document().characterCount() - 1 - position))
+
+        start = self.shadow_text.index_of(position)
+        end = self.shadow_text.index_of(position + chars_removed)
+        removed_text = self.shadow_text.slice(start, end)
+        added_text = self.text_between(position, position + chars_added)
+
+        if removed_text == added_text:  # Only the format changed
+            return
+
+        self.stats.replace(removed_text, added_text, self.shadow_text.slice(start - 1, start),
+                           self.shadow_text.slice(end, end + 1))
+        self.shadow_text.replace(start, end, added_text)
+
         if not self.undo_redoing:
-            self.changes_list.add_changes(string_changes.get_changes(self.lastText, self.toPlainText()))
-        self.lastText = self.toPlainText()
+            if removed_text:
+                self.pending_changes.append(string_changes.Change(string_changes.Change.DELETED, start, removed_text))
+            if added_text:
+                self.pending_changes.append(string_changes.Change(string_changes.Change.NEW, start, added_text))
 
-    def undo(self) -> None:
-        self.undo_redoing = True
+    def text_changed(self) -> None:
+        if self.shadow_text.utf16_length() != self.document().characterCount() - 1:
+            # The reported contents changes did not add up, so the whole text is compared, as a last resort
+            text = self.toPlainText()
+            last_text = string_changes.remake_str(self.shadow_text.text(), self.pending_changes)
+            self.pending_changes = []
+            self.shadow_text = text_buffer.TextBuffer(text)
+            self.stats.reset(text)
+
+            if not self.undo_redoing:
+                self.diff_text(last_text, text)
+            return
 
-        self.setPlainText(string_changes.remake_str(self.toPlainText(), self.changes_list.get_last_change()))
-        self.changes_list.rollback_changes()
+        if self.pending_changes:
+            changes = self.pending_changes
+            self.pending_changes = []
 
-        self.undo_redoing = False
+            self.add_to_history(changes)
+            self.edited.emit(EditEvent(changes, self.revision(), self.shadow_text))
+
+    def add_to_history(self, changes: list[string_changes.Change]) -> None:
+        """Adds 'changes', done to the text, to the history; if sets of changes before are still being calculated,
+        it is queued after them."""
+
+        if self.queued_history:
+            self.queued_history.append(changes)
+        else:
+            self.changes_list.add_changes(changes, self.shadow_text)
+
+    def diff_text(self, original: str, changed: str) -> None:
+        """Adds to the history the changes from 'original', the text before, to 'changed', the text now, which are
+        calculated. Large texts are compared in the background, by 'diff_pool', by lines, and the changes after wait in
+        'queued_history' meanwhile. If a comparison is still being calculated, it is superseded by this one, from its
+        original text, so that both edits, and the ones between them, become one set of changes."""
+
+        if len(original) + len(changed) < DIFF_ASYNC_SIZE:
+            changes = string_changes.get_changes(original, changed)
+            if changes:
+                self.add_to_history(changes)
+            self.edited.emit(EditEvent(changes, self.revision(), self.shadow_text))
+            return
+
+        for index, entry in enumerate(self.queued_history):
+            if isinstance(entry, diff_worker.DiffTask) and not entry.done():
+                original = entry.original
+                del self.queued_history[index:]  # The pool cancels the task, as it is superseded
+                break
+
+        # Large texts are compared by lines first, as they are mostly changed in a few lines, as when pasting
+        task = self.diff_pool.submit(original, changed, key=self, when_done=lambda _task: self.diff_done.emit(),
+                                     by_lines=True)
+        self.queued_history.append(task)
+        self.edited.emit(EditEvent(None, self.revision(), self.shadow_text))
+
+    def add_queued_history(self) -> None:
+        """Adds the queued sets of changes to the history, in order, until one whose comparison is still being
+        calculated. A calculated set is kept apart from the sets before and after it."""
+
+        added = False
+
+        while self.queued_history:
+            entry = self.queued_history[0]
+
+            if isinstance(entry, diff_worker.DiffTask):
+                if not entry.done():
+                    break
+
+                changes = entry.result()
+                if changes:
+                    self.changes_list.close_changes()
+                    self.changes_list.add_changes(changes)
+                    self.changes_list.close_changes()
+            else:
+                self.changes_list.add_changes(entry)
+
+            del self.queued_history[0]
+            added = True
+
+        if added:
+            self.edited.emit(EditEvent([], self.revision(), self.shadow_text))
+
+    def wait_for_history(self) -> None:
+        """Waits until the sets of changes being calculated are, and adds every queued set to the history, as it must
+        be before undoing, for example."""
+
+        for entry in self.queued_history:
+            if isinstance(entry, diff_worker.DiffTask):
+                entry.result()
+        self.add_queued_history()
+
+    def text_between(self, start: int, end: int) -> str:
+        """Returns the plain text between the positions 'start' and 'end' of the document."""
+
+        if start == end:
+            return ""
+
+        cursor = QtGui.QTextCursor(self.document())
+        cursor.setPosition(start)
+        cursor.setPosition(end, QtGui.QTextCursor.KeepAnchor)
+
+        return cursor.selectedText().translate(PLAIN_TEXT_TABLE)
+
+    def undo(self) -> None:
+        if self.trace_recorder is not None:
+            self.trace_recorder.record(edit_trace.UNDO)
+
+        self.wait_for_history()
+        changes = self.changes_list.get_last_change()
+        self.changes_list.rollback_changes()  # Before changing the text, so its revision is right when it changes
+        self.apply_changes(changes, undoing=True)
 
     def redo(self) -> None:
-        self.undo_redoing = True
+        if self.trace_recorder is not None:
+            self.trace_recorder.record(edit_trace.REDO)
 
-        self.setPlainText(string_changes.change_str(self.toPlainText(), self.changes_list.get_next_change()))
+        self.wait_for_history()
+        changes = self.changes_list.get_next_change()
         self.changes_list.roll_forward_changes()
+        self.apply_changes(changes, undoing=False)
+
+    def revision(self) -> int:
+        """Returns the number of the last set of changes applied to the text, in the history. 0 is before any."""
+
+        return self.changes_list.current.number
+
+    def text_length(self) -> int:
+        return len(self.shadow_text)
+
+    def index_of(self, position: int) -> int:
+        """Returns the index, in the text, of the character at 'position' of the document, which Qt counts in UTF-16
+        code units."""
+
+        return self.shadow_text.index_of(position)
+
+    def position_of(self, index: int) -> int:
+        """Returns the position, in the document, of the character at 'index' of the text."""
+
+        return self.shadow_text.position_of(index)
+
+    def text_fingerprint(self) -> tuple[int, int]:
+        """Returns the fingerprint of the text, without copying it out of the document."""
+
+        text_fingerprint = (0, 0)
+        for chunk in self.shadow_text.snapshot():
+            text_fingerprint = journal.update_fingerprint(text_fingerprint, chunk)
+
+        return text_fingerprint
+
+    def jump_to_revision(self, revision: int) -> None:
+        """Undoes or redoes, in any branch of the history, until the last set of changes applied is the one numbered
+        'revision'. It costs, at most, loading one checkpoint of the history and applying the sets of changes between
+        it and the revision."""
+
+        self.wait_for_history()
+        checkpoint_text, changes = self.changes_list.jump_changes(revision)
+        self.apply_changes(changes, undoing=False, base_text=checkpoint_text)
+
+    def switch_branch(self, step: int = 1) -> None:
+        """Changes the text to the one of another branch of the history: the one after the same set of changes as the
+        last one, 'step' branches after, or before, if negative."""
+
+        if self.trace_recorder is not None:
+            self.trace_recorder.record(edit_trace.BRANCH, step=step)
+
+        self.wait_for_history()
+        branches = self.changes_list.get_branches()
+        index = branches.index(self.revision())
+        self.jump_to_revision(branches[(index + step) % len(branches)])
+
+    def previous_branch(self) -> None:
+        self.switch_branch(-1)
+
+    def next_branch(self) -> None:
+        self.switch_branch(1)
+
+    def apply_changes(self, changes: list[string_changes.Change], undoing: bool, base_text: str | None = None) -> None:
+        """Applies, or reverts if 'undoing', the changes in 'changes' to the document, as 'change_document' does, and
+        publishes the edit."""
+
+        self.change_document(changes, undoing, base_text)
+
+        if base_text is not None:
+            changes = None
+        elif undoing:
+            changes = string_changes.invert_changes(changes)
+        self.edited.emit(EditEvent(changes, self.revision(), self.shadow_text))
+
+    def replace_all(self, changes: list[string_changes.Change] | string_changes.Replacement) -> None:
+        """Applies 'changes', which replace every occurrence of a text, as one edit, which is one set of changes in the
+        history, undone at once. A replace-all is kept compactly, as a string_changes.Replacement."""
+
+        if not changes:
+            return
+
+        self.wait_for_history()
+        self.change_document(changes, undoing=False)
+
+        self.changes_list.close_changes()
+        self.add_to_history(changes)
+        self.changes_list.close_changes()
+        self.edited.emit(EditEvent(changes, self.revision(), self.shadow_text))
+
+    def change_document(self, changes: list[string_changes.Change], undoing: bool,
+                        base_text: str | None = None) -> None:
+        """Applies, or reverts if 'undoing', the changes in 'changes' to the document, in place, in only one edit block,
+        without adding them to the history. Only the changed spans are touched, so the cost depends on the size of the
+        changes, and the view is kept; but, if there are more than 'WHOLE_TEXT_CHANGES' changes, as after a
+        replace-all, the whole text is replaced, which costs less than so many edits of the document. If there is a
+        'base_text', the whole text is replaced by it before."""
+
+        if base_text is None and len(changes) > WHOLE_TEXT_CHANGES:
+            text = self.shadow_text.text()
+            base_text = (string_changes.remake_str(text, changes) if undoing
+                         else string_changes.change_str(text, changes))
+            changes = []
+
+        if undoing:
+            removed_type, inserted_type = string_changes.Change.NEW, string_changes.Change.DELETED
+        else:
+            removed_type, inserted_type = string_changes.Change.DELETED, string_changes.Change.NEW
+
+        def change_key(_change: string_changes.Change) -> int: return _change.index
+
+        removed = sorted((change for change in changes if change.change_type == removed_type), key=change_key)
+        inserted = sorted((change for change in changes if change.change_type == inserted_type), key=change_key)
+
+        # Qt only reports the edits at the end of the block, so 'shadow_text' is not updated within it: the positions
+        # are all converted before, from the text as it is then
+        buffer = self.shadow_text if base_text is None or not changes else text_buffer.TextBuffer(base_text)
+        removed_positions, inserted_positions = buffer.edit_positions(removed, inserted)
+
+        self.undo_redoing = True
+
+        cursor = QtGui.QTextCursor(self.document())
+        cursor.beginEditBlock()
+
+        if base_text is not None:
+            cursor.select(QtGui.QTextCursor.Document)
+            cursor.insertText(base_text)
+
+        for start, end in reversed(removed_positions):  # From the last, so that the positions of the others are kept
+            cursor.setPosition(start)
+            cursor.setPosition(end, QtGui.QTextCursor.KeepAnchor)
+            cursor.removeSelectedText()
+
+        for change, position in zip(inserted, inserted_positions):
+            cursor.setPosition(position)
+            cursor.insertText(change.text)
+
+        cursor.endEditBlock()
 
         self.undo_redoing = False
 
 
-class MainUI(QtWidgets.QMainWindow):
-    """This is the main UI, which is the one shown when the app is started, and whereof everything else is son."""
+class TraceRecorder(QtCore.QObject):
+    """Records the editing session of 'editor' to the edit trace at 'trace_src', as described in modules/edit_trace.py,
+    so that it can be replayed, as by benchmarks/replay_trace.py. The editor tells it the actions of the user, and the
+    edits are recorded from its 'edited' signal. Before an action, the selection is recorded if it was changed by
+    something else than the actions recorded, as by the mouse."""
 
-    def texts(self):
-        """It is generator, containing the texts on the right langauge. This generator is used for naming in the
-        __init__ function. It is a generator to save memory."""
+    def __init__(self, editor: PydEditor, trace_src: str):
+        super().__init__(editor)
 
-        src = f"lang/{LANGUAGE}.txt"
+        self.editor = editor
 
-        with open(file=src, mode="r", encoding="utf-8") as file:
-            while True:
-                text = file.readline()
+        cursor = editor.textCursor()
+        self.writer = edit_trace.TraceWriter(trace_src, editor.toPlainText(), cursor.position(), cursor.anchor())
+        self.selection: tuple[int, int] = (cursor.position(), cursor.anchor())  # After the last action recorded
 
-                if text == "" or text == "\n":
-                    break
+        editor.edited.connect(self.record_edit)
+
+    def record(self, event: str, **values) -> None:
+        """Records the action 'event', which is about to be done, with its 'values'."""
+
+        cursor = self.editor.textCursor()
+        if (cursor.position(), cursor.anchor()) != self.selection:
+            self.writer.write_event(edit_trace.CURSOR, position=cursor.position(), anchor=cursor.anchor())
+
+        self.writer.write_event(event, **values)
+        QtCore.QTimer.singleShot(0, self.keep_selection)  # Once the action is done
+
+    def keep_selection(self) -> None:
+        cursor = self.editor.textCursor()
+        self.selection = (cursor.position(), cursor.anchor())
+
+    def record_edit(self, event: EditEvent) -> None:
+        if event.changes is None:  # The changes are not known, or the whole text was replaced
+            self.writer.write_event(edit_trace.LOAD, text=event.text())
+        else:
+            self.writer.write_changes(event.changes)
+
+    def close(self) -> None:
+        self.editor.edited.disconnect(self.record_edit)
+        self.writer.close()
+
+
+class FindBar(QtWidgets.QWidget):
+    """The bar to find, and replace, a text in 'editor'. The occurrences are kept by a SearchIndex, built when the text
+    is first searched, and then updated from each edit of the editor, so that searching again costs about nothing,
+    whatever the length of the text. While the bar is hidden, there is no index to update. Its 'TEXTS' texts are
+    taken, in order, from 'texts', as MainUI's."""
+
+    TEXTS = 6
+
+    def __init__(self, editor: PydEditor, texts, parent=None):
+        super().__init__(parent)
+
+        self.setAttribute(QtCore.Qt.WA_StyledBackground)  # So the stylesheet can set its background
+
+        self.editor = editor
+        self.index: search_index.SearchIndex | None = None  # Of the text searched, if it has been searched
+
+        self.find_edit = QtWidgets.QLineEdit()
+        self.find_edit.setPlaceholderText(next(texts))
+        self.find_edit.textChanged.connect(self.query_changed)
+        self.find_edit.returnPressed.connect(self.find_next)
+
+        self.replace_edit = QtWidgets.QLineEdit()
+        self.replace_edit.setPlaceholderText(next(texts))
+        self.replace_edit.returnPressed.connect(self.replace)
+
+        self.match_case_box = QtWidgets.QCheckBox(next(texts))
+        self.match_case_box.toggled.connect(self.query_changed)
+
+        self.replace_button = QtWidgets.QPushButton(next(texts))
+        self.replace_button.clicked.connect(self.replace)
+
+        self.replace_all_button = QtWidgets.QPushButton(next(texts))
+        self.replace_all_button.clicked.connect(self.replace_all)
+
+        self.occurrences_text = next(texts)
+        self.label_occurrences = QtWidgets.QLabel()
+
+        layout = QtWidgets.QHBoxLayout(self)
+        layout.setContentsMargins(4, 2, 4, 2)
+        for widget in (self.find_edit, self.replace_edit, self.match_case_box, self.replace_button,
+                       self.replace_all_button, self.label_occurrences):
+            layout.addWidget(widget)
+
+        editor.edited.connect(self.text_edited)
+
+    def show_bar(self, replacing: bool = False) -> None:
+        """Shows the bar, with the text selected in the editor, if any, to be found, and focuses where the text to
+        find, or the replacement if 'replacing', is typed."""
+
+        selected = self.editor.textCursor().selectedText()
+        if selected and "\u2029" not in selected:  # Only a part of a line is searched
+            self.find_edit.setText(selected)
+
+        self.show()
+        edit = self.replace_edit if replacing else self.find_edit
+        edit.setFocus()
+        edit.selectAll()
+        self.update_occurrences()
+
+    def hideEvent(self, event: QtGui.QHideEvent) -> None:
+        self.index = None
+        super().hideEvent(event)
+
+    def keyPressEvent(self, e: QtGui.QKeyEvent) -> None:
+        if e.key() == QtCore.Qt.Key_Escape:
+            self.hide()
+            self.editor.setFocus()
+            return
+
+        super().keyPressEvent(e)
+
+    def query_changed(self) -> None:
+        self.index = None
+        self.update_occurrences()
+
+    def search_index(self) -> search_index.SearchIndex:
+        """Returns the index of the text to find, building it if needed."""
+
+        if self.index is None:
+            self.editor.wait_for_history()  # So the text is known
+            self.index = search_index.SearchIndex(self.find_edit.text(), self.match_case_box.isChecked())
+            self.index.build(self.editor.shadow_text.text())
+
+        return self.index
+
+    def text_edited(self, event: EditEvent) -> None:
+        if self.index is None:
+            return
+
+        if event.changes is None or len(event.changes) > WHOLE_TEXT_CHANGES:
+            self.index = None  # The text is searched again, which is faster than applying so many changes
+        elif event.changes:
+            self.index.apply_changes(event.changes, event)
+
+        self.update_occurrences()
+
+    def update_occurrences(self) -> None:
+        if self.isHidden() or not self.find_edit.text():
+            self.label_occurrences.setText("")
+            return
+
+        self.label_occurrences.setText(f"{self.search_index().count()} {self.occurrences_text}")
+
+    def find_next(self) -> None:
+        cursor = self.editor.textCursor()
+        # After the start of the occurrence selected, if any, so that the next one is found, even if overlapping
+        start = (self.editor.index_of(cursor.selectionStart()) + 1 if cursor.hasSelection()
+                 else self.editor.index_of(cursor.position()))
+        self.select(self.search_index().find_next(start))
+
+    def find_previous(self) -> None:
+        self.select(self.search_index().find_previous(self.editor.index_of(self.editor.textCursor().selectionStart())))
+
+    def select(self, start: int | None) -> None:
+        """Selects the occurrence at the index 'start', if any, in the editor."""
+
+        if start is None:
+            return
+
+        cursor = self.editor.textCursor()
+        cursor.setPosition(self.editor.position_of(start))
+        cursor.setPosition(self.editor.position_of(start + len(self.index.query)), QtGui.QTextCursor.KeepAnchor)
+        self.editor.setTextCursor(cursor)
+        self.editor.ensureCursorVisible()
+
+    def replace(self) -> None:
+        """Replaces the occurrence selected, if any, and selects the next one."""
+
+        index = self.search_index()
+        cursor = self.editor.textCursor()
+        start = self.editor.index_of(cursor.selectionStart())
+        end = self.editor.index_of(cursor.selectionEnd())
+
+        if index.query and end - start == len(index.query) and index.find_next(start) == start:
+            replacement = self.replace_edit.text()
+            if self.editor.trace_recorder is not None:
+                self.editor.trace_recorder.record(edit_trace.REPLACE, text=replacement)
+            cursor.insertText(replacement)
+
+        self.find_next()
+
+    def replace_all(self) -> None:
+        """Replaces every occurrence, as one edit, which is undone at once."""
+
+        index = self.search_index()
+        replacement = self.replace_edit.text()
+
+        if self.editor.trace_recorder is not None:
+            self.editor.trace_recorder.record(edit_trace.REPLACE_ALL, query=index.query, replacement=replacement,
+                                              match_case=index.match_case)
+
+        self.editor.replace_all(index.replace_all_changes(replacement, self.editor.shadow_text.text()))
+
+
+class FileLoader(QtCore.QThread):
+    """Reads the text file 'file_src' in a background thread, sending its chunks, in order, by 'chunk_read', with the
+    fraction of the file read so far. Each chunk must be reported as shown by 'chunk_shown'; no more than
+    'OPEN_CHUNKS_AHEAD' chunks are read ahead, so the file is never kept twice in memory. When the whole file has been
+    read, 'loaded' is sent with the fingerprint of its text; if it cannot be read, 'failed' is. It stops, sending
+    neither, if its interruption is requested."""
+
+    chunk_read = QtCore.Signal(str, float)
+    loaded = QtCore.Signal(object)
+    failed = QtCore.Signal()
+
+    def __init__(self, file_src: str, parent=None):
+        super().__init__(parent)
+
+        self.file_src = file_src
+        self.free_chunks = threading.Semaphore(OPEN_CHUNKS_AHEAD)
+
+    def chunk_shown(self) -> None:
+        self.free_chunks.release()
+
+    def run(self) -> None:
+        text_fingerprint = (0, 0)
+
+        try:
+            file_size = max(os.path.getsize(self.file_src), 1)
+
+            for text, bytes_read in text_file.read_chunks(self.file_src, OPEN_CHUNK_SIZE, OPEN_FIRST_CHUNK_SIZE):
+                text_fingerprint = journal.update_fingerprint(text_fingerprint, text)
+
+                while not self.free_chunks.acquire(timeout=0.05):  # Waits, while checking whether to stop
+                    if self.isInterruptionRequested():
+                        return
+                if self.isInterruptionRequested():
+                    return
+
+                self.chunk_read.emit(text, bytes_read / file_size)
+        except Exception:
+            self.failed.emit()
+        else:
+            self.loaded.emit(text_fingerprint)
+
+
+class FileSaver(QtCore.QThread):
+    """Writes 'chunks', a snapshot of a text, to the file 'file_src', in a background thread, atomically, so that the
+    file is never left half-written. 'revision' is the one of the text in the history. When it finishes, 'error' is
+    the exception which stopped it, if any, and 'text_fingerprint' is the fingerprint of the text written."""
+
+    def __init__(self, file_src: str, chunks: list[str], revision: int, parent=None):
+        super().__init__(parent)
+
+        self.file_src = file_src
+        self.chunks = chunks
+        self.revision = revision
+
+        self.error: Exception | None = None
+        self.text_fingerprint = (0, 0)
+
+    def run(self) -> None:
+        try:
+            text_file.write_atomic(self.file_src, self.chunks)
+        except Exception as ex:
+            self.error = ex
+            return
+
+        for chunk in self.chunks:
+            self.text_fingerprint = journal.update_fingerprint(self.text_fingerprint, chunk)
+
+
+class FileReloader(QtCore.QThread):
+    """Reads again the file 'file_src', changed by another program, in a background thread, and finds the changes which
+    make the text, whose snapshot is 'chunks', its text. If 'disk_state', the state of the file when the text was last
+    its text, is given, and the file has only had text appended, only that text is read, into 'appended'; otherwise,
+    the whole file is read and, unless its fingerprint is 'saved_fingerprint', as when only its time of modification
+    changed, compared with the text. When it finishes, 'changes' are the changes, or 'error' is the exception which
+    stopped it; 'unchanged' is whether the file still has the text saved; 'disk_state' is the state of the file read,
+    and 'text_fingerprint' the fingerprint of its text, if the whole file was read."""
+
+    def __init__(self, file_src: str, chunks: list[str], disk_state: tuple[int, int, bytes] | None,
+                 saved_fingerprint: tuple[int, int], parent=None):
+        super().__init__(parent)
+
+        self.file_src = file_src
+        self.chunks = chunks
+        self.disk_state = disk_state
+        self.saved_fingerprint = saved_fingerprint
+
+        self.changes: list[string_changes.Change] = []
+        self.appended: str | None = None
+        self.unchanged = False
+        self.text_fingerprint: tuple[int, int] | None = None
+        self.error: Exception | None = None
+
+    def run(self) -> None:
+        try:
+            if self.disk_state is not None and self.read_appended():
+                return
+
+            text_fingerprint = (0, 0)
+            pieces: list[str] = []
+            size = 0
+            for text, size in text_file.read_chunks(self.file_src, OPEN_CHUNK_SIZE):
+                text_fingerprint = journal.update_fingerprint(text_fingerprint, text)
+                pieces.append(text)
+                if self.isInterruptionRequested():
+                    return
+
+            self.disk_state = text_file.file_state(self.file_src, RELOAD_PROBE_SIZE, size)
+            self.text_fingerprint = text_fingerprint
+            if text_fingerprint == self.saved_fingerprint:
+                self.unchanged = True
+                return
+
+            text = "".join(pieces)
+            original = "".join(self.chunks)
+
+            # If less than half of the longer text can be in common, comparing them, which costs about their length
+            # times their differences, would be slow, for changes about as large as replacing the whole text
+            if 2 * min(len(original), len(text)) < max(len(original), len(text)):
+                self.changes = [string_changes.Change(string_changes.Change.DELETED, 0, original),
+                                string_changes.Change(string_changes.Change.NEW, 0, text)]
+                self.changes = [change for change in self.changes if change.text]
+            else:
+                self.changes = string_changes.get_changes(original, text, self.isInterruptionRequested,
+                                                          by_lines=len(original) + len(text) >= DIFF_ASYNC_SIZE)
+        except Exception as ex:
+            self.error = ex
+
+    def read_appended(self) -> bool:
+        """Reads only the text appended to the file, if it was only appended to, returning whether it was."""
+
+        size, _, probe = self.disk_state
+        try:
+            appended = text_file.read_appended(self.file_src, size, probe)
+        except UnicodeDecodeError:
+            return False
+        if appended is None:
+            return False
+
+        self.appended, size = appended
+        self.disk_state = text_file.file_state(self.file_src, RELOAD_PROBE_SIZE, size)
+        self.unchanged = not self.appended
+        if self.appended:
+            position = sum(len(chunk) for chunk in self.chunks)
+            self.changes = [string_changes.Change(string_changes.Change.NEW, position, self.appended)]
+        return True
+
+
+class LargeFileViewer(QtWidgets.QAbstractScrollArea):
+    """Shows, read-only, the text of a file too large to be edited, from a MappedText. Only the lines in the viewport
+    are read and painted, so the cost of showing it does not depend on the size of the file. While the file is being
+    indexed, the lines which can be scrolled to grow."""
+
+    MARGIN = 4  # Pixels at the left of the lines
+
+    def __init__(self, text: mapped_text.MappedText, parent=None):
+        super().__init__(parent)
+
+        self.text = text
+        self.text_width = 0  # Pixels of the widest line painted so far, which can be scrolled to
+
+        self.setVerticalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOn)
+        self.verticalScrollBar().valueChanged.connect(self.viewport().update)
+        self.horizontalScrollBar().valueChanged.connect(self.viewport().update)
+
+        self.index_timer = QtCore.QTimer(self)  # Updates the lines which can be scrolled to, while indexing
+        self.index_timer.setInterval(200)
+        self.index_timer.timeout.connect(self.update_scroll_range)
+        self.index_timer.start()
+
+        self.text.start_indexing()
+
+    def close_file(self) -> None:
+        self.index_timer.stop()
+        self.text.close()
+
+    def visible_lines(self) -> int:
+        return max(1, self.viewport().height() // self.fontMetrics().lineSpacing())
+
+    def update_scroll_range(self) -> None:
+        if self.text.indexed:
+            self.index_timer.stop()
+
+        vertical_bar = self.verticalScrollBar()
+        vertical_bar.setRange(0, max(0, self.text.line_count() - self.visible_lines()))
+        vertical_bar.setPageStep(self.visible_lines())
+
+        horizontal_bar = self.horizontalScrollBar()
+        horizontal_bar.setRange(0, max(0, self.text_width + 2 * self.MARGIN - self.viewport().width()))
+        horizontal_bar.setPageStep(self.viewport().width())
+
+    def paintEvent(self, event: QtGui.QPaintEvent) -> None:
+        painter = QtGui.QPainter(self.viewport())
+        painter.setPen(self.palette().color(QtGui.QPalette.Text))
+
+        metrics = self.fontMetrics()
+        x = self.MARGIN - self.horizontalScrollBar().value()
+        y = metrics.ascent()
+
+        text_width = self.text_width
+        for line in self.text.lines(self.verticalScrollBar().value(), self.visible_lines() + 1):
+            line = line.expandtabs(4)
+            painter.drawText(x, y, line)
+            text_width = max(text_width, metrics.horizontalAdvance(line))
+            y += metrics.lineSpacing()
+
+        painter.end()
+
+        if text_width > self.text_width:
+            self.text_width = text_width
+            self.update_scroll_range()
+
+    def resizeEvent(self, event: QtGui.QResizeEvent) -> None:
+        super().resizeEvent(event)
+        self.update_scroll_range()
+
+    def changeEvent(self, event: QtCore.QEvent) -> None:
+        super().changeEvent(event)
+        if event.type() == QtCore.QEvent.FontChange:  # As when zooming
+            self.text_width = 0
+            self.update_scroll_range()
+
+    def keyPressEvent(self, e: QtGui.QKeyEvent) -> None:
+        vertical_bar = self.verticalScrollBar()
+
+        if e.matches(QtGui.QKeySequence.MoveToStartOfDocument):
+            vertical_bar.setValue(0)
+        elif e.matches(QtGui.QKeySequence.MoveToEndOfDocument):
+            vertical_bar.setValue(vertical_bar.maximum())
+        elif e.matches(QtGui.QKeySequence.MoveToPreviousPage):
+            vertical_bar.triggerAction(QtWidgets.QAbstractSlider.SliderPageStepSub)
+        elif e.matches(QtGui.QKeySequence.MoveToNextPage):
+            vertical_bar.triggerAction(QtWidgets.QAbstractSlider.SliderPageStepAdd)
+        elif e.matches(QtGui.QKeySequence.MoveToPreviousLine):
+            vertical_bar.triggerAction(QtWidgets.QAbstractSlider.SliderSingleStepSub)
+        elif e.matches(QtGui.QKeySequence.MoveToNextLine):
+            vertical_bar.triggerAction(QtWidgets.QAbstractSlider.SliderSingleStepAdd)
+        else:
+            super().keyPressEvent(e)
+
+
+class MainUI(QtWidgets.QMainWindow):
+    """This is the main UI, which is the one shown when the app is started, and whereof everything else is son."""
 
-                yield text[:-1]  # The last character is "\n"
+    @staticmethod
+    def texts():
+        """Returns an iterator of the texts on the right language, in order, which is used for naming in the __init__
+        function. The texts are read from their file once, by 'load_texts'."""
+
+        return iter(load_texts(LANGUAGE))
 
     def __init__(self):
         super().__init__()
 
         # Application Variables
-        self.stylesheet_file = "./style/main.stylesheet"
+        self.stylesheet_file = os.path.join(APP_FOLDER, "style", "main.stylesheet")
 
         self.standard_title = ""  # Standard title, before the text is associated with a file
 
@@ -97,7 +946,28 @@ class MainUI(QtWidgets.QMainWindow):
         self.save_file: str = ""
 
         self.saved: bool = True  # Whether the current text has been saved, or whether it is blank.
-        self.saved_text: str = ""  # This is a bad solution, better would be to save the changes done
+        self.saved_revision: int | None = 0  # Revision of the saved text in the history, if known
+        self.saved_fingerprint: tuple[int, int] = journal.fingerprint("")  # Fingerprint of the saved text
+
+        self.journal: journal.Journal | None = None  # Journal of the history of the text, on disk
+        self.journal_lock: QtCore.QLockFile | None = None  # Held while the journal is used, so no other window uses it
+        self.file_loader: FileLoader | None = None  # Reads the file being opened, if any
+        self.viewer: LargeFileViewer | None = None  # Shows the file opened, if it is too large to be edited
+        self.file_saver: FileSaver | None = None  # Writes the text being saved, if any
+        self.file_reloader: FileReloader | None = None  # Reads the file again, if changed by another program
+        self.asking_reload = False  # Whether the user is being asked if the file changed should replace unsaved changes
+        self.open_file_selector: QtWidgets.QFileDialog | None = None  # Built when first needed, as the find bar
+        self.save_file_selector: QtWidgets.QFileDialog | None = None
+
+        self.disk_state: tuple[int, int, bytes] | None = None  # Of the file, when it last had the text saved
+        self.file_watcher = QtCore.QFileSystemWatcher(self)  # Tells when another program changes the file
+        self.file_watcher.fileChanged.connect(self.file_changed)
+        self.reload_timer = QtCore.QTimer(self)  # Waits for the other program to stop writing, before reading
+        self.reload_timer.setSingleShot(True)
+        self.reload_timer.setInterval(RELOAD_DELAY)
+        self.reload_timer.timeout.connect(self.reload_file)
+        self.pending_save: tuple[str, list[str], int] | None = None  # The last save asked while another is being
+        # written: its file, the snapshot of the text and its revision
 
         self.standard_font_size = 11  # The zoom is done by changing the font size
         self.current_zoom = 100
@@ -120,8 +990,17 @@ class MainUI(QtWidgets.QMainWindow):
 
         self.text_editor = PydEditor()
         self.text_editor.setVerticalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOn)
-        self.text_editor.textChanged.connect(self.text_changed)
-        self.setCentralWidget(self.text_editor)
+        self.text_editor.edited.connect(self.text_changed)
+
+        self.central_widgets = QtWidgets.QStackedWidget()  # The editor, or the viewer of a large file
+        self.central_widgets.addWidget(self.text_editor)
+
+        central_widget = QtWidgets.QWidget()  # The central widgets, with the find bar below
+        self.central_layout = QtWidgets.QVBoxLayout(central_widget)
+        self.central_layout.setContentsMargins(0, 0, 0, 0)
+        self.central_layout.setSpacing(0)
+        self.central_layout.addWidget(self.central_widgets)
+        self.setCentralWidget(central_widget)
 
         # Menu Bar
 
@@ -165,6 +1044,40 @@ class MainUI(QtWidgets.QMainWindow):
         self.redo_action.triggered.connect(self.text_editor.redo)
         self.menuBar_edit.addAction(self.redo_action)
 
+        self.menuBar_edit.addSeparator()
+
+        self.previousBranch_action = QtGui.QAction(next(texts))
+        self.previousBranch_action.setShortcut("Ctrl+Alt+Z")
+        self.previousBranch_action.triggered.connect(self.text_editor.previous_branch)
+        self.menuBar_edit.addAction(self.previousBranch_action)
+
+        self.nextBranch_action = QtGui.QAction(next(texts))
+        self.nextBranch_action.setShortcut("Ctrl+Alt+Y")
+        self.nextBranch_action.triggered.connect(self.text_editor.next_branch)
+        self.menuBar_edit.addAction(self.nextBranch_action)
+
+        self.menuBar_edit.addSeparator()
+
+        self.find_action = QtGui.QAction(next(texts))
+        self.find_action.setShortcut("Ctrl+F")
+        self.find_action.triggered.connect(lambda: self.get_find_bar().show_bar())
+        self.menuBar_edit.addAction(self.find_action)
+
+        self.findNext_action = QtGui.QAction(next(texts))
+        self.findNext_action.setShortcut("F3")
+        self.findNext_action.triggered.connect(lambda: self.get_find_bar().find_next())
+        self.menuBar_edit.addAction(self.findNext_action)
+
+        self.findPrevious_action = QtGui.QAction(next(texts))
+        self.findPrevious_action.setShortcut("Shift+F3")
+        self.findPrevious_action.triggered.connect(lambda: self.get_find_bar().find_previous())
+        self.menuBar_edit.addAction(self.findPrevious_action)
+
+        self.replace_action = QtGui.QAction(next(texts))
+        self.replace_action.setShortcut("Ctrl+H")
+        self.replace_action.triggered.connect(lambda: self.get_find_bar().show_bar(replacing=True))
+        self.menuBar_edit.addAction(self.replace_action)
+
         self.menuBar_view = self.menuBar().addMenu(next(texts))
         self.menuBar_file.setWindowFlags(self.menuBar_file.windowFlags() | QtCore.Qt.NoDropShadowWindowHint)
 
@@ -189,18 +1102,80 @@ class MainUI(QtWidgets.QMainWindow):
         self.statusBar = QtWidgets.QStatusBar()
         self.setStatusBar(self.statusBar)
 
+        self.history_text = next(texts)
+        self.label_history = QtWidgets.QLabel()
+        self.update_history_label()
+
         self.label_zoom = QtWidgets.QLabel()
         self.label_zoom.setText(f"{self.current_zoom}%")
 
+        self.cursor_text = next(texts)  # Formats of the position of the cursor, and of the statistics of the text
+        self.stats_text = next(texts)
+        self.label_cursor = QtWidgets.QLabel()
+        self.label_stats = QtWidgets.QLabel()
+
+        # The labels are updated at most once per frame, as the cursor and the text can change many times in one
+        self.stats_timer = QtCore.QTimer(self)
+        self.stats_timer.setSingleShot(True)
+        self.stats_timer.setInterval(max(1, round(1000 / QtGui.QGuiApplication.primaryScreen().refreshRate())))
+        self.stats_timer.timeout.connect(self.update_stats_labels)
+        self.text_editor.textChanged.connect(self.schedule_stats_update)
+        self.text_editor.cursorPositionChanged.connect(self.schedule_stats_update)
+        self.update_stats_labels()
+
+        self.open_progress = QtWidgets.QProgressBar()  # Shown while a file is being opened
+        self.open_progress.setRange(0, 1000)
+        self.open_progress.setMaximumWidth(150)
+        self.open_progress.hide()
+
+        self.cancel_open_button = QtWidgets.QPushButton(next(texts))
+        self.cancel_open_button.clicked.connect(self.cancel_open)
+        self.cancel_open_button.hide()
+
+        self.statusBar.addWidget(self.open_progress)
+        self.statusBar.addWidget(self.cancel_open_button)
+        self.statusBar.addPermanentWidget(self.label_cursor)
+        self.statusBar.addPermanentWidget(self.label_stats)
+        self.statusBar.addPermanentWidget(self.label_history)
         self.statusBar.addPermanentWidget(self.label_zoom)
 
+        self.read_only_text = next(texts)
+
+        # Find Bar
+
+        self.find_bar: FindBar | None = None  # Built when first needed, by 'get_find_bar', not when starting
+        self.find_bar_texts = [next(texts) for _ in range(FindBar.TEXTS)]
+
+        # Journal
+
+        # The journal is only rewritten while the text is not being edited, as the history and the text must agree
+        self.journal_timer = QtCore.QTimer(self)
+        self.journal_timer.setSingleShot(True)
+        self.journal_timer.setInterval(JOURNAL_REWRITE_DELAY)
+        self.journal_timer.timeout.connect(self.rewrite_journal)
+        self.text_editor.edited.connect(lambda _event: self.journal_timer.start())
+
+        self.start_journal()  # Recovers the text of a session which crashed, if any
+
+    def get_find_bar(self) -> FindBar:
+        if self.find_bar is None:
+            self.find_bar = FindBar(self.text_editor, iter(self.find_bar_texts))
+            self.find_bar.hide()
+            self.central_layout.addWidget(self.find_bar)
+
+        return self.find_bar
+
     def update_style(self):
-        with open(file=self.stylesheet_file, mode="r", encoding="utf-8") as file:
-            self.setStyleSheet(file.read())
+        self.setStyleSheet(load_stylesheet(self.stylesheet_file))
 
     def closeEvent(self, event: QtGui.QCloseEvent) -> None:
         event.ignore()
 
+        self.stop_file_loader()  # A file being opened, or viewed, has nothing to be saved
+        self.close_viewer()
+
+        discarded = False  # Whether the user chose not to save the text
+
         if not self.saved:
 
             match LANGUAGE:
@@ -214,17 +1189,30 @@ class MainUI(QtWidgets.QMainWindow):
             if user_will == 0 or user_will == QtWidgets.QMessageBox.Cancel:  # Canceled
                 return
             elif user_will == QtWidgets.QMessageBox.No:  # Not save
-                event.accept()
+                discarded = True
             elif user_will == QtWidgets.QMessageBox.Yes:  # Wants to save
                 self.user_save()
-                event.accept()
-        else:
-            event.accept()
 
-    def text_changed(self):
-        """Called when the text, of 'self.text_editor', changes."""
+        self.finish_saving()  # The saves being written, the one just asked for included
+        if not discarded and not self.saved:
+            return  # The save failed, or was cancelled, so the window, and the journal, are kept, with the only copy
+
+        event.accept()
+
+        self.unwatch_file()
+        self.text_editor.stop_trace()
+        self.stop_journal()  # Closed normally, so there is nothing to recover
+        self.text_editor.diff_pool.shutdown()
+
+    def text_changed(self, event: EditEvent | None = None):
+        """Called when the text, of 'self.text_editor', is edited, and when the saved text changes."""
+
+        if self.file_loader is not None:  # The text is still being read from its file
+            return
+
+        self.update_history_label()
 
-        if self.text_editor.toPlainText() != self.saved_text:
+        if not self.is_text_saved():
             self.saved = False
 
             if self.isSaveFile:
@@ -241,16 +1229,273 @@ class MainUI(QtWidgets.QMainWindow):
             else:
                 self.setWindowTitle(f"{self.standard_title} — {APP_TITLE}")
 
-    def set_saving_file(self, file_src: str):
-        """Called when saved or a file is opened. It updates whether the application has a file it can save to."""
+    def is_text_saved(self) -> bool:
+        """Returns whether the text is the one saved. It is known, at once, from its revision in the history; only if
+        the text has another revision, but the length of the saved text, as when undoing into another branch, is its
+        fingerprint calculated."""
+
+        if self.text_editor.revision() == self.saved_revision and not self.text_editor.queued_history:
+            return True
+
+        saved_length, _ = self.saved_fingerprint
+        if self.text_editor.text_length() != saved_length:
+            return False
+
+        return self.text_editor.text_fingerprint() == self.saved_fingerprint
+
+    def set_saved_text(self, revision: int | None, text_fingerprint: tuple[int, int]):
+        """Keeps which text is the saved one: the one with the revision 'revision', if known, and the fingerprint
+        'text_fingerprint'. It updates whether the current text is saved, and the title."""
+
+        self.saved_revision = revision
+        self.saved_fingerprint = text_fingerprint
+
+        self.text_changed()
+
+    def update_history_label(self):
+        """Shows how much memory the undo history is using."""
+
+        self.label_history.setText(f"{self.history_text}: {format_size(self.text_editor.changes_list.memory_usage)}")
+
+    def schedule_stats_update(self):
+        if not self.stats_timer.isActive():
+            self.stats_timer.start()
+
+    def update_stats_labels(self):
+        """Shows the position of the cursor, and the numbers of lines, words and characters of the text. None of them
+        depends on the length of the text: the statistics are kept by the editor, and Qt finds the line of the cursor
+        in its tree of blocks."""
+
+        cursor = self.text_editor.textCursor()
+        stats = self.text_editor.stats
+
+        self.label_cursor.setText(self.cursor_text.format(line=cursor.blockNumber() + 1,
+                                                          column=cursor.positionInBlock() + 1))
+        self.label_stats.setText(self.stats_text.format(lines=stats.lines, words=stats.words,
+                                                        characters=stats.characters))
+
+    def start_journal(self, file_src: str = "", saved_fingerprint: tuple[int, int] | None = None):
+        """Starts the journal of the text of the file 'file_src', or of a text without a file. If a journal was left, as
+        after a crash, the text and its history are recovered from it. 'saved_fingerprint' is the one of the text, if it
+        is the text of a file. The journal is locked while it is used: if the journal of the file is locked by another
+        window, or it cannot be written, as in a read-only folder, the text has no journal."""
+
+        self.stop_journal()
+
+        try:
+            journal_srcs = [self.journal_path(file_src)] if file_src else self.untitled_journal_paths()
+            journal_src = self.lock_journal(journal_srcs)
+            if journal_src is None:
+                return
+
+            recovered_text = None
+            if os.path.exists(journal_src):
+                changes_list = self.text_editor.new_changes_list()
+                saved_text = self.text_editor.toPlainText() if saved_fingerprint is not None else None
+                try:
+                    recovered_text = journal.recover(journal_src, changes_list, saved_text)
+                except Exception:
+                    recovered_text = None
+
+                if recovered_text is not None:
+                    self.saved_revision = None  # The saved text is only known by its fingerprint in the recovered
+                    self.text_editor.load_text(recovered_text, changes_list)  # history
+                else:
+                    os.remove(journal_src)  # It cannot be used
+
+            self.journal = journal.Journal(journal_src)
+        except OSError:
+            self.stop_journal()  # Only unlocks it, as there is no journal
+            return
+
+        self.text_editor.changes_list.journal = self.journal
+
+        if recovered_text is None:
+            if saved_fingerprint is None:
+                self.journal.record_base(self.text_editor.revision(), self.text_editor.toPlainText())
+            else:
+                self.journal.record_saved(self.text_editor.revision(), saved_fingerprint)
+
+    def rewrite_journal(self):
+        """Rewrites the journal, in the background, if it has grown enough with versions of the history no longer
+        needed. It waits for the sets of changes still being calculated, which are added when they are."""
+
+        if self.journal is None or not self.journal.rewrite_due() or self.text_editor.queued_history:
+            return
+
+        self.journal.rewrite(self.text_editor.changes_list, self.text_editor.shadow_text.snapshot())
+
+    def stop_journal(self):
+        """Stops the journal of the text, deleting it, as its text has been either saved or discarded."""
+
+        if self.journal is not None:
+            self.text_editor.changes_list.journal = None
+            self.journal.close(delete=True)
+            self.journal = None
+
+        if self.journal_lock is not None:
+            self.journal_lock.unlock()
+            self.journal_lock = None
+
+    def lock_journal(self, journal_srcs: list[str]) -> str | None:
+        """Locks the first journal of 'journal_srcs' which no other window, of any instance, has locked, and returns
+        where it is kept, or None if they all are. The lock is kept in 'self.journal_lock'."""
+
+        for journal_src in journal_srcs:
+            lock = QtCore.QLockFile(f"{journal_src}.lock")
+            lock.setStaleLockTime(0)  # Only stale if its process is not running anymore, as after a crash
+            if lock.tryLock(0):
+                self.journal_lock = lock
+                return journal_src
+
+        return None
+
+    @staticmethod
+    def untitled_journal_paths() -> list[str]:
+        """Returns where the journals of texts without a file can be kept, in the application's data folder: the ones
+        which exist, from windows open or from sessions which crashed, to be recovered, and then a new one. Each window
+        uses one which no other has locked."""
+
+        data_folder = QtCore.QStandardPaths.writableLocation(QtCore.QStandardPaths.AppDataLocation)
+        os.makedirs(data_folder, exist_ok=True)
+
+        def untitled_path(number: int) -> str:
+            return os.path.join(data_folder, "untitled.pydjournal" if number == 1 else f"untitled-{number}.pydjournal")
+
+        paths = [untitled_path(number) for number in
+                 itertools.takewhile(lambda number: os.path.exists(untitled_path(number)), itertools.count(1))]
+        paths.append(untitled_path(len(paths) + 1))
+        return paths
+
+    @staticmethod
+    def journal_path(file_src: str) -> str:
+        """Returns where the journal of the text of the file 'file_src' is kept: next to it."""
+
+        folder, file_name = os.path.split(file_src)
+        return os.path.join(folder, f".{file_name}.pydjournal")
+
+    def set_saving_file(self, file_src: str, revision: int | None, text_fingerprint: tuple[int, int]):
+        """Called when saved or a file is opened. It updates whether the application has a file it can save to, whose
+        text has the revision 'revision' and the fingerprint 'text_fingerprint'."""
 
         self.isSaveFile = True
         self.save_file = file_src
-        self.saved_text = self.text_editor.toPlainText()
-        self.saved = True
 
-        file_name = file_src.split("/")[-1]
-        self.setWindowTitle(f"{file_name} — {APP_TITLE}")
+        self.set_saved_text(revision, text_fingerprint)
+        self.watch_file(file_src)
+
+    def watch_file(self, file_src: str):
+        """Watches the file 'file_src', which has the text saved, so that it is read again when another program
+        changes it."""
+
+        self.unwatch_file()
+
+        try:
+            self.disk_state = text_file.file_state(file_src, RELOAD_PROBE_SIZE)
+        except OSError:
+            return
+        self.file_watcher.addPath(file_src)
+
+    def unwatch_file(self):
+        self.stop_file_reloader()
+        self.reload_timer.stop()
+        self.disk_state = None
+        if self.file_watcher.files():
+            self.file_watcher.removePaths(self.file_watcher.files())
+
+    def file_changed(self, file_src: str):
+        """Called when the file watched changes. It is read again once it stops changing for 'RELOAD_DELAY'."""
+
+        # A file replaced, as by saving atomically, is no longer watched, so its replacement is watched instead
+        if file_src not in self.file_watcher.files() and os.path.exists(file_src):
+            self.file_watcher.addPath(file_src)
+
+        self.reload_timer.start()
+
+    def reload_file(self):
+        """Reads the file again, if another program changed it, in the background, by a FileReloader. If the text was
+        saved, and the file only had text appended, as a log being written, only that text is read. Otherwise, the whole
+        file is read, and compared with the text. The text is then changed as the file was, as one set of changes in the
+        history, so the reload can be undone; over unsaved changes, only if the user chooses so."""
+
+        if self.disk_state is None or self.file_loader is not None or self.file_saver is not None:
+            return  # Saving, or opening, watches the file again, as it is then
+        if self.asking_reload:  # Asked again once answered
+            return
+
+        try:
+            status = os.stat(self.save_file)
+        except OSError:  # Deleted, or being replaced
+            return
+        if (status.st_size, status.st_mtime_ns) == self.disk_state[:2]:  # As when the text was saved here
+            return
+
+        self.stop_file_reloader()  # Superseded, as this one reads the file as it is now
+        self.text_editor.wait_for_history()
+
+        # The text only begins as the file did if it is the one saved
+        self.file_reloader = FileReloader(self.save_file, self.text_editor.shadow_text.snapshot(),
+                                          self.disk_state if self.saved else None, self.saved_fingerprint, self)
+        self.file_reloader.finished.connect(self.file_reloaded)
+        self.file_reloader.start()
+
+    def file_reloaded(self):
+        """Called when the FileReloader finishes. Its changes are applied, unless the text changed meanwhile, when the
+        file is read again, or the file still has the text saved. Over unsaved changes, the user is asked first; if they
+        keep theirs, the text is left unsaved, as the file no longer has the text saved, and so is the journal."""
+
+        file_reloader = self.file_reloader
+        if self.sender() is not file_reloader:  # Superseded
+            return
+        self.stop_file_reloader()
+
+        if file_reloader.error is not None:
+            return
+        if self.text_editor.shadow_text.snapshot() != file_reloader.chunks:  # Edited while the file was read
+            self.reload_timer.start()
+            return
+        if file_reloader.unchanged:  # As when only its time of modification changed
+            self.disk_state = file_reloader.disk_state
+            return
+
+        if not self.saved:
+            self.asking_reload = True
+            reloading = self.ask_if_wants_to_reload()
+            self.asking_reload = False
+            self.reload_timer.start()  # In case the file changed again meanwhile
+
+            if self.text_editor.shadow_text.snapshot() != file_reloader.chunks or self.disk_state is None:
+                return  # Edited, or opened, or saved, meanwhile
+            self.disk_state = file_reloader.disk_state
+            if not reloading:
+                self.set_saved_text(None, file_reloader.text_fingerprint)
+                return
+
+        scroll_bar = self.text_editor.verticalScrollBar()
+        following = file_reloader.appended and scroll_bar.value() == scroll_bar.maximum()  # As when tailing a log
+
+        self.text_editor.replace_all(file_reloader.changes)
+        if following:
+            scroll_bar.setValue(scroll_bar.maximum())
+
+        text_fingerprint = file_reloader.text_fingerprint
+        if text_fingerprint is None:
+            text_fingerprint = journal.update_fingerprint(self.saved_fingerprint, file_reloader.appended)
+
+        revision = self.text_editor.revision()
+        self.set_saving_file(self.save_file, revision, text_fingerprint)
+        self.disk_state = file_reloader.disk_state  # As read, which may stop before a character still being written
+        if self.journal is not None:
+            self.journal.record_saved(revision, text_fingerprint)
+
+    def stop_file_reloader(self):
+        if self.file_reloader is None:
+            return
+
+        self.file_reloader.requestInterruption()
+        self.file_reloader.wait()
+        self.file_reloader.deleteLater()
+        self.file_reloader = None
 
     def ask_if_wants_to_save(self, second_text: str = "") -> int:
         """This is called for the user to decide whether they want to save the file, before some other action;
@@ -302,14 +1547,44 @@ class MainUI(QtWidgets.QMainWindow):
         pressed_button = asking_box.exec()  # Returns 0 if unsuccessful
         return pressed_button
 
+    def ask_if_wants_to_reload(self) -> bool:
+        """Asks if the user wants to load the file, changed by another program, replacing the unsaved changes, which
+        are kept in the history; returns whether they do."""
+
+        asking_box = QtWidgets.QMessageBox(self)
+        asking_box.setWindowModality(QtCore.Qt.WindowModal)
+        asking_box.setWindowTitle(APP_TITLE)
+        asking_box.setIcon(QtWidgets.QMessageBox.Warning)
+
+        keep_button = QtWidgets.QMessageBox.No
+        load_button = QtWidgets.QMessageBox.Yes
+        asking_box.setStandardButtons(keep_button | load_button)
+        asking_box.setDefaultButton(keep_button)
+
+        save_file_name = self.save_file.split("/")[-1]
+        match LANGUAGE:
+            case "en":
+                asking_box.button(keep_button).setText("Keep Mine")
+                asking_box.button(load_button).setText("Load File")
+                asking_box.setText(f"{save_file_name} was changed by another program. Would you like to load it, "
+                                   f"replacing your unsaved changes? They can still be undone.")
+            case "pt":
+                asking_box.button(keep_button).setText("Manter o Meu")
+                asking_box.button(load_button).setText("Carregar o Arquivo")
+                asking_box.setText(f"{save_file_name} foi alterado por outro programa. Você gostaria de carregá-lo, "
+                                   f"substituindo as suas alterações não salvas? Elas ainda podem ser desfeitas.")
+
+        return asking_box.exec() == load_button
+
     def save_warn_if_needed(second_texts: dict[str, str] = ""):
         """This is a decorator with the attribute 'second_text'. If the text has not been saved, tt asks if the user
         wants to save the file before an action, which is the function the decorator wraps.
 
         The attribute is a dictionary with the languge code (e.g. "EN") pointing to the message on the appropriate
         language; the message is directly concatenated to the asker box. If the user refuses, the action will continue
-        normally; if the user accepts, they will be asked to save the file and, then, the action will continue
-        normally; if they somehow cancel, nothing shall happen."""
+        normally; if the user accepts, they will be asked to save the file and, then, once it is saved, the action
+        will continue normally; if they somehow cancel, or the save fails, nothing shall happen, so the text, and its
+        journal, are kept."""
 
         def decorator(func):
             def wrapper(self, *args, **kwargs):
@@ -322,7 +1597,9 @@ class MainUI(QtWidgets.QMainWindow):
                         func(self, *args, **kwargs)
                     elif user_will == QtWidgets.QMessageBox.Yes:  # Wants to save
                         self.user_save()
-                        func(self, *args, **kwargs)
+                        self.finish_saving()  # Waits for the save just asked for, as the action may discard the text
+                        if self.saved:  # Otherwise, the save failed, or was cancelled
+                            func(self, *args, **kwargs)
                 else:
                     func(self, *args, **kwargs)
             return wrapper
@@ -335,58 +1612,223 @@ class MainUI(QtWidgets.QMainWindow):
 
         # File Selection
 
+        file_selector = self.open_selector()
+        result = file_selector.exec()  # Returns 1 if file was selected, 0 otherwise; for example, 'cancel' is pressed
+
+        # Interpretation of the File Selection
+
+        if result == 0:
+            return
+
+        file_selected: str = file_selector.selectedFiles()[0]  # As only one file can be selected
+
+        self.open_file(file_selected)
+
+    def open_selector(self) -> QtWidgets.QFileDialog:
+        """Returns the dialog to select the file to be opened. It is built when first needed, not when starting, and
+        kept, so it is built once, and it opens where the last file was selected."""
+
+        if self.open_file_selector is not None:
+            return self.open_file_selector
+
         file_selector = QtWidgets.QFileDialog(self)
         file_selector.setFileMode(QtWidgets.QFileDialog.ExistingFile)  # Only one file is to be selected
 
         match LANGUAGE:
             case "en":
-                file_selector.setLabelText(file_selector.Accept, "Open")
-                file_selector.setLabelText(file_selector.Reject, "Close")
-                file_selector.setLabelText(file_selector.FileName, "Name:")
-                file_selector.setLabelText(file_selector.LookIn, "Look in:")
-                file_selector.setLabelText(file_selector.FileType, "Type:")
+                file_selector.setLabelText(QtWidgets.QFileDialog.Accept, "Open")
+                file_selector.setLabelText(QtWidgets.QFileDialog.Reject, "Close")
+                file_selector.setLabelText(QtWidgets.QFileDialog.FileName, "Name:")
+                file_selector.setLabelText(QtWidgets.QFileDialog.LookIn, "Look in:")
+                file_selector.setLabelText(QtWidgets.QFileDialog.FileType, "Type:")
                 file_selector.setWindowTitle("Open a File")
                 text_filter: str = "Text File (*.txt)"
                 any_file_filter: str = "Any File (*)"
             case "pt":
-                file_selector.setLabelText(file_selector.Accept, "Abrir")
-                file_selector.setLabelText(file_selector.Reject, "Fechar")
-                file_selector.setLabelText(file_selector.FileName, "Nome:")
-                file_selector.setLabelText(file_selector.LookIn, "Em:")
-                file_selector.setLabelText(file_selector.FileType, "Tipo:")
+                file_selector.setLabelText(QtWidgets.QFileDialog.Accept, "Abrir")
+                file_selector.setLabelText(QtWidgets.QFileDialog.Reject, "Fechar")
+                file_selector.setLabelText(QtWidgets.QFileDialog.FileName, "Nome:")
+                file_selector.setLabelText(QtWidgets.QFileDialog.LookIn, "Em:")
+                file_selector.setLabelText(QtWidgets.QFileDialog.FileType, "Tipo:")
                 file_selector.setWindowTitle("Abrir um Arquivo")
                 text_filter: str = "Documento de Texto (*.txt)"
                 any_file_filter: str = "Todos os Arquivos (*)"
 
         file_selector.setNameFilter(f"{text_filter};;{any_file_filter}")  # Filters are separated by ;;
 
-        result = file_selector.exec()  # Returns 1 if file was selected, 0 otherwise; for example, 'cancel' is pressed
+        self.open_file_selector = file_selector
+        return file_selector
 
-        # Interpretation of the File Selection
+    def open_file(self, file_src: str):
+        """Opens the file 'file_src'. Its text is read in a background thread and shown as it is read, so the window
+        keeps responding; meanwhile, the editor is read-only and the opening can be cancelled. The history and the
+        journal of the text start when it has been completely read."""
 
-        if result == 0:
+        self.finish_saving()
+        self.stop_file_loader()
+        self.unwatch_file()
+        self.close_viewer()
+        self.stop_journal()  # The current text is being discarded
+
+        try:
+            too_large = os.path.getsize(file_src) >= VIEWER_MIN_SIZE
+        except OSError:
+            too_large = False  # The loader tells that it cannot be read
+        if too_large:
+            self.view_file(file_src)
             return
 
-        file_selected: str = file_selector.selectedFiles()[0]  # As only one file can be selected
+        self.file_loader = FileLoader(file_src, self)
+        self.file_loader.chunk_read.connect(self.file_chunk_read)
+        self.file_loader.loaded.connect(self.file_loaded)
+        self.file_loader.failed.connect(self.file_failed)
+
+        self.text_editor.load_text("")
+        self.text_editor.setReadOnly(True)
+        self.saved = True  # Until it is read, there is nothing to be saved
+        self.show_opening(True)
+
+        self.file_loader.start()
+
+    def file_chunk_read(self, text: str, progress: float):
+        """Called when the file being opened has a chunk read, 'progress' being the fraction of the file read."""
+
+        if self.sender() is not self.file_loader:  # From an opening which was cancelled
+            return
+
+        self.text_editor.append_text(text)
+        self.open_progress.setValue(round(progress * 1000))
+        self.file_loader.chunk_shown()
+
+    def file_loaded(self, text_fingerprint: tuple[int, int]):
+        """Called when the file being opened has been completely read."""
+
+        if self.sender() is not self.file_loader:
+            return
+
+        file_src = self.file_loader.file_src
+        self.stop_file_loader()
+
+        self.set_saving_file(file_src, self.text_editor.revision(), text_fingerprint)
+        self.start_journal(file_src, text_fingerprint)
+        self.update_history_label()
+
+    def file_failed(self):
+        """Called when the file being opened could not be read."""
+
+        if self.sender() is not self.file_loader:
+            return
+
+        file_src = self.file_loader.file_src
+        self.cancel_open()
+        self.warn_could_not_open(file_src)
+
+    def warn_could_not_open(self, file_src: str):
+        match LANGUAGE:
+            case "en":
+                warning_message = f"{APP_TITLE} could not open the file: {file_src}."
+            case "pt":
+                warning_message = f"{APP_TITLE} não pôde abriro o arquivo: {file_src}."
+
+        warning_box = WarningMessage(self, text=warning_message)
+        warning_box.exec()
+
+    def cancel_open(self):
+        """Cancels opening a file, leaving a new, blank text."""
+
+        if self.file_loader is None:
+            return
+        self.stop_file_loader()
+        self.new_text()
+
+    def new_text(self):
+        """Makes the text a new, blank one, without a file."""
+
+        self.text_editor.load_text("")
+        self.unwatch_file()
+        self.isSaveFile = False
+        self.save_file = ""
+        self.set_saved_text(self.text_editor.revision(), journal.fingerprint(""))
+
+        self.start_journal()
+
+    def stop_file_loader(self):
+        """Stops reading the file being opened, if any, and makes the text editable again."""
+
+        if self.file_loader is None:
+            return
+
+        self.file_loader.requestInterruption()
+        self.file_loader.wait()
+        self.file_loader.deleteLater()
+        self.file_loader = None
+
+        self.text_editor.setReadOnly(False)
+        self.show_opening(False)
+
+    def show_opening(self, opening: bool):
+        """Shows, or hides, the progress of opening a file, and disables the actions which cannot be done meanwhile."""
+
+        self.open_progress.setValue(0)
+        self.open_progress.setVisible(opening)
+        self.cancel_open_button.setVisible(opening)
+
+        for action in (self.open_action, self.save_action, self.save_as_action):
+            action.setEnabled(not opening)
+
+    def view_file(self, file_src: str):
+        """Shows the file 'file_src', read-only, in a viewer, which never has its whole text in memory."""
 
         try:
-            file = open(file_selected, "r", encoding="utf-8")
-            text = file.read()
+            text = mapped_text.MappedText(file_src)
         except Exception:
-            match LANGUAGE:
-                case "en":
-                    warning_message = f"{APP_TITLE} could not open the file: {file_selected}."
-                case "pt":
-                    warning_message = f"{APP_TITLE} não pôde abriro o arquivo: {file_selected}."
+            self.new_text()
+            self.warn_could_not_open(file_src)
+            return
 
-            warning_box = WarningMessage(self, text=warning_message)
-            warning_box.exec()
+        self.text_editor.load_text("")  # Its text is discarded
+        self.set_saved_text(self.text_editor.revision(), journal.fingerprint(""))
+
+        if self.find_bar is not None:
+            self.find_bar.hide()
+        self.label_cursor.hide()  # They are of the editor
+        self.label_stats.hide()
+        self.viewer = LargeFileViewer(text)
+        self.central_widgets.addWidget(self.viewer)
+        self.central_widgets.setCurrentWidget(self.viewer)
+        self.viewer.setFocus()
+        self.update_zoom()
+
+        for action in self.editing_actions():
+            action.setEnabled(False)
+
+        self.isSaveFile = False
+        self.save_file = ""
+        file_name = file_src.split("/")[-1]
+        self.setWindowTitle(f"{file_name} [{self.read_only_text}] — {APP_TITLE}")
+
+    def close_viewer(self):
+        """Closes the viewer of a large file, if any, going back to the editor."""
+
+        if self.viewer is None:
             return
-        else:
-            file.close()
-            self.text_editor.setPlainText(text)
 
-            self.set_saving_file(file_selected)
+        self.viewer.close_file()
+        self.central_widgets.removeWidget(self.viewer)
+        self.viewer.deleteLater()
+        self.viewer = None
+        self.label_cursor.show()
+        self.label_stats.show()
+
+        for action in self.editing_actions():
+            action.setEnabled(True)
+
+    def editing_actions(self) -> tuple[QtGui.QAction, ...]:
+        """Returns the actions which change, save, or search, the text, which cannot be done in the viewer."""
+
+        return (self.save_action, self.save_as_action, self.undo_action, self.redo_action,
+                self.previousBranch_action, self.nextBranch_action, self.find_action, self.findNext_action,
+                self.findPrevious_action, self.replace_action)
 
     def user_save(self):
         """Called when the users want to 'save' the text."""
@@ -400,27 +1842,56 @@ class MainUI(QtWidgets.QMainWindow):
         """Called when the user presses 'save as' button. It asks the user to select a file, where the text shall be
         saved, using UTF-8."""
 
-        # File Selector Widget
+        # File Selection
+
+        file_selector = self.save_selector()
+        result = file_selector.exec()  # Returns 1 if file was selected, 0 otherwise; for example, 'cancel' is pressed
+
+        if result == 0:
+            return
+
+        files_selected: list[str] = file_selector.selectedFiles()
+        filter_selected: str = file_selector.selectedNameFilter()
+        file_src: str = files_selected[0]  # As only one file can be selected
+
+        if filter_selected == file_selector.nameFilters()[0]:  # The filter of text files
+            file_name = file_src.split("/")[-1]
+
+            if file_name.endswith(".txt"):
+                saving_file = file_src
+            else:
+                saving_file = file_src + ".txt"
+        else:  # The filter of any file
+            saving_file = file_src
+
+        self.save(saving_file)
+
+    def save_selector(self) -> QtWidgets.QFileDialog:
+        """Returns the dialog to select the file where the text is saved, built when first needed, and kept, as
+        'open_selector'."""
+
+        if self.save_file_selector is not None:
+            return self.save_file_selector
 
         file_selector = QtWidgets.QFileDialog(self)
         file_selector.setFileMode(QtWidgets.QFileDialog.AnyFile)  # Only one file is to be selected, existing or not
 
         match LANGUAGE:
             case "en":
-                file_selector.setLabelText(file_selector.Accept, "Save")
-                file_selector.setLabelText(file_selector.Reject, "Close")
-                file_selector.setLabelText(file_selector.FileName, "Name:")
-                file_selector.setLabelText(file_selector.LookIn, "Look in:")
-                file_selector.setLabelText(file_selector.FileType, "Type:")
+                file_selector.setLabelText(QtWidgets.QFileDialog.Accept, "Save")
+                file_selector.setLabelText(QtWidgets.QFileDialog.Reject, "Close")
+                file_selector.setLabelText(QtWidgets.QFileDialog.FileName, "Name:")
+                file_selector.setLabelText(QtWidgets.QFileDialog.LookIn, "Look in:")
+                file_selector.setLabelText(QtWidgets.QFileDialog.FileType, "Type:")
                 file_selector.setWindowTitle("Save As")
                 text_filter: str = "Text File (*.txt)"
                 any_file_filter: str = "Any File (*)"
             case "pt":
-                file_selector.setLabelText(file_selector.Accept, "Salvar")
-                file_selector.setLabelText(file_selector.Reject, "Fechar")
-                file_selector.setLabelText(file_selector.FileName, "Nome:")
-                file_selector.setLabelText(file_selector.LookIn, "Em")
-                file_selector.setLabelText(file_selector.FileType, "Tipo:")
+                file_selector.setLabelText(QtWidgets.QFileDialog.Accept, "Salvar")
+                file_selector.setLabelText(QtWidgets.QFileDialog.Reject, "Fechar")
+                file_selector.setLabelText(QtWidgets.QFileDialog.FileName, "Nome:")
+                file_selector.setLabelText(QtWidgets.QFileDialog.LookIn, "Em")
+                file_selector.setLabelText(QtWidgets.QFileDialog.FileType, "Tipo:")
                 file_selector.setWindowTitle("Salvar Como")
                 text_filter: str = "Documento de Texto (*.txt)"
                 any_file_filter: str = "Todos os Arquivos (*)"
@@ -428,54 +1899,101 @@ class MainUI(QtWidgets.QMainWindow):
         file_selector.setNameFilter(f"{text_filter};;{any_file_filter}")  # Filter are separated by ;;
         file_selector.setViewMode(QtWidgets.QFileDialog.List)
 
-        # File Selection
+        self.save_file_selector = file_selector
+        return file_selector
 
-        result = file_selector.exec()  # Returns 1 if file was selected, 0 otherwise; for example, 'cancel' is pressed
+    def save(self, file_src):
+        """It saves the text in the file 'file_src'. A snapshot of the text is taken, which costs about nothing, and
+        written by a FileSaver, in the background, so the text can still be edited. If another save is being written,
+        this one waits for it, replacing any other save waiting, so that only the last one is written. The title, and
+        whether the text is saved, are updated when the text has been written."""
 
-        if result == 0:
-            return
+        if self.text_editor.trace_recorder is not None:
+            self.text_editor.trace_recorder.record(edit_trace.SAVE)
 
-        files_selected: list[str] = file_selector.selectedFiles()
-        filter_selected: str = file_selector.selectedNameFilter()
-        file_src: str = files_selected[0]  # As only one file can be selected
+        self.text_editor.wait_for_history()  # So the revision saved is the one of the text
+        changes_list = self.text_editor.changes_list
+        changes_list.close_changes()  # The saved text must not change by merging
 
-        if filter_selected == text_filter:
-            file_name = file_src.split("/")[-1]
+        self.pending_save = (file_src, self.text_editor.shadow_text.snapshot(), changes_list.current.number)
+        if self.file_saver is None:
+            self.start_save()
 
-            if file_name.endswith(".txt"):
-                saving_file = file_src
-            else:
-                saving_file = file_src + ".txt"
-        else:  # filter_selected == any_file_filter:
-            saving_file = file_src
+    def start_save(self):
+        file_src, chunks, revision = self.pending_save
+        self.pending_save = None
 
-        self.save(saving_file)
+        self.file_saver = FileSaver(file_src, chunks, revision, self)
+        self.file_saver.finished.connect(self.save_written)
+        self.file_saver.start()
 
-    def save(self, file_src):
-        """It saves the text in the file 'file_src'."""
+    def save_written(self):
+        """Called when the FileSaver finishes writing."""
 
-        try:
-            file = open(file_src, "w", encoding="utf-8")
-            text = self.text_editor.toPlainText()
-            file.write(text)
-        except Exception:
+        if self.sender() is self.file_saver:  # Otherwise, it has already been ended by 'finish_saving'
+            self.end_save()
+
+    def end_save(self):
+        """Updates the state of the text after the FileSaver has written it, and starts the save waiting, if any."""
+
+        file_saver = self.file_saver
+        file_saver.wait()
+        self.file_saver = None
+        file_saver.deleteLater()
+
+        if file_saver.error is not None:
             match LANGUAGE:
                 case "en":
-                    warning_text = f"{APP_TITLE} could not save the text at {file_src}."
+                    warning_text = f"{APP_TITLE} could not save the text at {file_saver.file_src}."
                 case "pt":
-                    warning_text = f"{APP_TITLE} não pôde salvar o texto em {file_src}."
+                    warning_text = f"{APP_TITLE} não pôde salvar o texto em {file_saver.file_src}."
 
             warning_box = WarningMessage(self, text=warning_text)
             warning_box.exec()
         else:
-            file.close()
-            self.set_saving_file(file_src)
+            self.set_saving_file(file_saver.file_src, file_saver.revision, file_saver.text_fingerprint)
+
+            if self.journal is not None:
+                journal_src = self.journal_path(file_saver.file_src)
+                if self.journal.path != journal_src:
+                    self.move_journal(journal_src)
+                self.journal.record_saved(file_saver.revision, file_saver.text_fingerprint)
+
+        if self.pending_save is not None:
+            self.start_save()
+
+    def move_journal(self, journal_src: str):
+        """Moves the journal to 'journal_src', as when the text is saved to another file, locking it there. If another
+        window has locked it, or it cannot be moved, the journal is kept where it is."""
+
+        old_lock = self.journal_lock
+        if self.lock_journal([journal_src]) is None:
+            return
+
+        try:
+            self.journal.move(journal_src)
+        except OSError:
+            self.journal_lock.unlock()
+            self.journal_lock = old_lock
+            return
+
+        if old_lock is not None:
+            old_lock.unlock()
+
+    def finish_saving(self):
+        """Waits until the text being saved, and the one waiting, if any, have been written, as before the text is
+        discarded."""
+
+        while self.file_saver is not None:
+            self.end_save()
 
     def update_zoom(self):
         """If the variable of how much to zoom has been altered, this function is called. It alters the text size."""
 
         zoom_point = math.floor(self.current_zoom / 100 * self.standard_font_size)
         self.text_editor.setStyleSheet(f"QPlainTextEdit {{font-size: {zoom_point}pt;}}")
+        if self.viewer is not None:
+            self.viewer.setStyleSheet(f"LargeFileViewer {{font-size: {zoom_point}pt;}}")
 
         self.label_zoom.setText(f"{self.current_zoom}%")
 
@@ -558,7 +2076,13 @@ class ErrorMessage(QtWidgets.QMessageBox):
 
 
 def main():
+    parser = argparse.ArgumentParser(prog=APP_TITLE)
+    parser.add_argument("--record-trace", metavar="FILE", help="records the editing session to an edit trace, which "
+                                                                "can be replayed by benchmarks/replay_trace.py")
+    arguments, _ = parser.parse_known_args()
+
     app = QtWidgets.QApplication([])
+    app.setApplicationName(APP_TITLE)  # Names the folder of the application's data, where untitled texts' journals are
 
     try:
         ui = MainUI()
@@ -570,6 +2094,9 @@ def main():
         ui.resize(800, 600)
         ui.show()
 
+        if arguments.record_trace is not None:
+            ui.text_editor.start_trace(arguments.record_trace)
+
     app.exec()
 
 
@@ -0,0 +1,340 @@
+"""Measures the functions and classes of string_changes on synthetic edit workloads, and on recorded ones: typing one
+character in documents of several sizes, large pastes and deletions, scattered edits, and long walks of undoing and
+redoing. For each benchmark, it reports the time of one operation, the least of 'REPETITIONS' runs, as the others are
+only slowed by the rest of the system, and the peak memory allocated while running it, measured by tracemalloc in
+another run, as tracing slows the code down.
+
+The results are compared with a baseline, stored in 'BASELINE_SRC'. A benchmark which is slower than its baseline by
+more than 'TIME_TOLERANCE', or allocates more than 'MEMORY_TOLERANCE' more, is a regression: they are listed, and the
+run fails. Timings depend on the machine, so the baseline should be saved on the one it is compared on, with
+'--save-baseline'.
+
+Recorded workloads are edit traces, as recorded by PydBook with '--record-trace' (see modules/edit_trace.py), given
+with '--trace'. Only the edits of a trace are measured, not the events which caused them.
+
+Run it from the root of the repository: python -m benchmarks.bench_changes [--save-baseline] [--trace FILE]..."""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from typing import Callable
+
+from benchmarks.documents import make_random_document
+from modules import edit_trace, string_changes
+from modules.text_buffer import TextBuffer
+
+BASELINE_SRC = os.path.join(os.path.dirname(__file__), "bench_changes_baseline.json")
+REPETITIONS = 5
+TIME_TOLERANCE = 0.5  # Slower by more than 50 % is a regression
+MIN_TIME_DIFFERENCE = 50e-6  # In seconds; smaller differences are noise, even if above the tolerance
+MEMORY_TOLERANCE = 0.1  # Allocating more than 10 % more is a regression,
+MIN_MEMORY_DIFFERENCE = 64 * 1024  # if it is, at least, this many bytes more
+
+KIB = 1024
+MIB = 1024 * KIB
+
+
+class Benchmark:
+    """An operation to measure, 'name'. 'setup' prepares it, untimed, and returns a function which runs it once,
+    which does 'operations' operations, so that the time of one is reported."""
+
+    def __init__(self, name: str, setup: Callable[[], Callable[[], object]], operations: int = 1):
+        self.name = name
+        self.setup = setup
+        self.operations = operations
+
+
+def scatter_edits(text: str, count: int, seed: int = 0) -> str:
+    """Returns 'text' with 'count' small edits, in random lines: words typed, deleted or replaced."""
+
+    random_generator = random.Random(seed)
+    characters = list(text)
+
+    for _ in range(count):
+        position = random_generator.randrange(len(characters))
+        kind = random_generator.randrange(3)
+        if kind == 0:
+            characters[position: position] = "edit "
+        elif kind == 1:
+            del characters[position: position + random_generator.randint(1, 8)]
+        else:
+            characters[position: position + 3] = "XYZ"
+
+    return "".join(characters)
+
+
+def diff_benchmarks(name: str, original: str, changed: str) -> list[Benchmark]:
+    """Returns the benchmarks of finding the changes from 'original' to 'changed', and of applying and of reverting
+    them."""
+
+    changes = string_changes.get_changes(original, changed)
+    return [
+        Benchmark(f"get_changes {name}", lambda: lambda: string_changes.get_changes(original, changed)),
+        Benchmark(f"change_str {name}", lambda: lambda: string_changes.change_str(original, changes)),
+        Benchmark(f"remake_str {name}", lambda: lambda: string_changes.remake_str(changed, changes)),
+    ]
+
+
+def typing_benchmarks(size: int, label: str) -> list[Benchmark]:
+    text = make_random_document(size)
+    position = size // 2
+    return diff_benchmarks(f"typing ({label})", text, text[:position] + "a" + text[position:])
+
+
+def history_benchmark(name: str, text: str, edits: list[tuple[int, int, str]], merge: bool) -> Benchmark:
+    """Returns the benchmark of adding 'edits', done to 'text', to a ChangesList, one at a time, as when they are done.
+    If 'merge', typing is merged as in the editor; if not, every edit is a set of changes."""
+
+    changes_sets = edits_changes(text, edits)
+
+    def setup():
+        changes_list = string_changes.ChangesList(merge_interval=60.0 if merge else 0)
+
+        def run():
+            for changes in changes_sets:
+                changes_list.add_changes(changes)
+
+        return run
+
+    return Benchmark(name, setup, len(changes_sets))
+
+
+def walk_benchmark(name: str, text: str, edits: list[tuple[int, int, str]]) -> Benchmark:
+    """Returns the benchmark of undoing all of 'edits', done to 'text', and redoing them, one at a time, as the editor
+    does: its copy of the text, a TextBuffer, is changed in place."""
+
+    changes_sets = edits_changes(text, edits)
+
+    def setup():
+        changes_list = string_changes.ChangesList(changes_sets, merge_interval=0)
+        changes_list.current = changes_list.nodes[len(changes_sets)]
+        buffer = TextBuffer(text)
+        for changes in changes_sets:
+            string_changes.change_buffer(buffer, changes)
+
+        def run():
+            for _ in changes_sets:
+                string_changes.change_buffer(buffer, string_changes.invert_changes(changes_list.get_last_change()))
+                changes_list.rollback_changes()
+            for _ in changes_sets:
+                changes_list.roll_forward_changes()
+                string_changes.change_buffer(buffer, changes_list.get_last_change())
+
+        return run
+
+    return Benchmark(name, setup, 2 * len(changes_sets))
+
+
+def edits_changes(text: str, edits: list[tuple[int, int, str]]) -> list[list[string_changes.Change]]:
+    """Returns the set of changes of each of 'edits', done in order to 'text'."""
+
+    buffer = TextBuffer(text)
+    changes_sets: list[list[string_changes.Change]] = []
+
+    for position, removed, inserted in edits:
+        changes: list[string_changes.Change] = []
+        if removed:
+            changes.append(string_changes.Change(string_changes.Change.DELETED, position,
+                                                 buffer.slice(position, position + removed)))
+        if inserted:
+            changes.append(string_changes.Change(string_changes.Change.NEW, position, inserted))
+
+        string_changes.change_buffer(buffer, changes)
+        changes_sets.append(changes)
+
+    return changes_sets
+
+
+def typing_edits(text: str, count: int, seed: int = 0) -> list[tuple[int, int, str]]:
+    """Returns 'count' edits of typing, as a person does: runs of characters typed at a place, fixed with backspace
+    now and then, before going to another place."""
+
+    random_generator = random.Random(seed)
+    edits: list[tuple[int, int, str]] = []
+    length = len(text)
+    position = length // 2
+
+    while len(edits) < count:
+        if random_generator.random() < 0.02:  # Goes to another place
+            position = random_generator.randrange(length + 1)
+        elif random_generator.random() < 0.1 and position > 0:  # Backspace
+            position -= 1
+            edits.append((position, 1, ""))
+            length -= 1
+        else:
+            edits.append((position, 0, random_generator.choice("abcdefghij      \n")))
+            position += 1
+            length += 1
+
+    return edits
+
+
+def read_trace(path: str) -> tuple[str, list[tuple[int, int, str]]]:
+    """Returns the text, and the edits, of the edit trace at 'path'. A text loaded is an edit replacing the whole
+    text."""
+
+    header, events = edit_trace.read_trace(path)
+    text = header["text"]
+    length = len(text)
+
+    edits: list[tuple[int, int, str]] = []
+    for event in events:
+        if event["event"] == edit_trace.EDIT:
+            edits.append((event["position"], event["removed"], event["text"]))
+            length += len(event["text"]) - event["removed"]
+        elif event["event"] == edit_trace.LOAD:
+            edits.append((0, length, event["text"]))
+            length = len(event["text"])
+
+    return text, edits
+
+
+def trace_benchmarks(path: str) -> list[Benchmark]:
+    """Returns the benchmarks of a recorded edit trace: comparing the text before and after it, and adding and
+    walking its history."""
+
+    name = os.path.basename(path)
+    text, edits = read_trace(path)
+
+    buffer = TextBuffer(text)
+    for changes in edits_changes(text, edits):
+        string_changes.change_buffer(buffer, changes)
+    final_text = buffer.text()
+
+    return [
+        Benchmark(f"get_changes trace {name}", lambda: lambda: string_changes.get_changes(text, final_text)),
+        history_benchmark(f"ChangesList.add_changes trace {name}", text, edits, merge=True),
+        walk_benchmark(f"undo/redo walk trace {name}", text, edits),
+    ]
+
+
+def benchmarks(trace_paths: list[str]) -> list[Benchmark]:
+    document = make_random_document(4 * MIB)
+    paste = make_random_document(1 * MIB, seed=1)
+    half = len(document) // 2
+    scattered_document = make_random_document(256 * KIB)
+    scattered = scatter_edits(scattered_document, 100)
+
+    suite = typing_benchmarks(10 * KIB, "10 KiB") + typing_benchmarks(1 * MIB, "1 MiB") + \
+        typing_benchmarks(8 * MIB, "8 MiB")
+    suite += diff_benchmarks("paste 1 MiB (4 MiB)", document, document[:half] + paste + document[half:])
+    suite += diff_benchmarks("deletion 1 MiB (4 MiB)", document, document[:half] + document[half + MIB:])
+    suite += diff_benchmarks("100 scattered edits (256 KiB)", scattered_document, scattered)
+    suite.append(Benchmark("get_changes 100 scattered edits by lines (256 KiB)",
+                           lambda: lambda: string_changes.get_changes(scattered_document, scattered, by_lines=True)))
+
+    history_document = make_random_document(1 * MIB)
+    edits = typing_edits(history_document, 5000)
+    suite.append(history_benchmark("ChangesList.add_changes typing (1 MiB)", history_document, edits, merge=True))
+    suite.append(history_benchmark("ChangesList.add_changes unmerged (1 MiB)", history_document, edits, merge=False))
+    suite.append(walk_benchmark("undo/redo walk 5000 sets (1 MiB)", history_document, edits))
+
+    for path in trace_paths:
+        suite += trace_benchmarks(path)
+
+    return suite
+
+
+def measure(benchmark: Benchmark) -> dict[str, float]:
+    """Returns the time of one operation of 'benchmark', in seconds, and the peak memory it allocates, in bytes."""
+
+    timings: list[float] = []
+    for _ in range(REPETITIONS):
+        run = benchmark.setup()
+        gc.collect()
+
+        start = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - start) / benchmark.operations)
+
+    run = benchmark.setup()
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    run()
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+
+    return {"time": min(timings), "memory": peak}
+
+
+def regressions(name: str, result: dict[str, float], baseline: dict[str, float]) -> list[str]:
+    """Returns why 'result' of the benchmark 'name' is a regression from 'baseline', if it is."""
+
+    found: list[str] = []
+
+    time_difference = result["time"] - baseline["time"]
+    if time_difference > MIN_TIME_DIFFERENCE and result["time"] > baseline["time"] * (1 + TIME_TOLERANCE):
+        found.append(f"{name}: {format_time(result['time'])} per operation, was {format_time(baseline['time'])}")
+
+    memory_difference = result["memory"] - baseline["memory"]
+    if memory_difference > MIN_MEMORY_DIFFERENCE and result["memory"] > baseline["memory"] * (1 + MEMORY_TOLERANCE):
+        found.append(f"{name}: {format_memory(result['memory'])} peak memory, was {format_memory(baseline['memory'])}")
+
+    return found
+
+
+def format_time(seconds: float) -> str:
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f} µs"
+    return f"{seconds * 1e3:.2f} ms"
+
+
+def format_memory(size: float) -> str:
+    if size < MIB:
+        return f"{size / KIB:.1f} KiB"
+    return f"{size / MIB:.2f} MiB"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of string_changes, compared with a baseline.")
+    parser.add_argument("--save-baseline", action="store_true", help="stores the results as the new baseline")
+    parser.add_argument("--trace", action="append", default=[], help="an edit trace to measure, too")
+    parser.add_argument("--only", help="only runs the benchmarks whose names contain this")
+    arguments = parser.parse_args()
+
+    baseline: dict[str, dict[str, float]] = {}
+    if os.path.exists(BASELINE_SRC):
+        with open(BASELINE_SRC, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+
+    results: dict[str, dict[str, float]] = {}
+    found: list[str] = []
+
+    print(f"{'Benchmark':56} {'time/op':>10} {'baseline':>10} {'peak memory':>12} {'baseline':>12}")
+    for benchmark in benchmarks(arguments.trace):
+        if arguments.only is not None and arguments.only not in benchmark.name:
+            continue
+
+        result = results[benchmark.name] = measure(benchmark)
+        former = baseline.get(benchmark.name)
+
+        print(f"{benchmark.name:56} {format_time(result['time']):>10}"
+              f" {format_time(former['time']) if former else '-':>10}"
+              f" {format_memory(result['memory']):>12} {format_memory(former['memory']) if former else '-':>12}")
+
+        if former is not None:
+            found += regressions(benchmark.name, result, former)
+
+    if arguments.save_baseline:
+        baseline.update(results)
+        with open(BASELINE_SRC, "w", encoding="utf-8") as file:
+            json.dump(baseline, file, indent=2, sort_keys=True)
+            file.write("\n")
+        print(f"Baseline saved to {BASELINE_SRC}")
+        return
+
+    if found:
+        print("\nREGRESSIONS:")
+        for regression in found:
+            print(f"  {regression}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
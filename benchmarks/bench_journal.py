@@ -0,0 +1,191 @@
+"""Measures the journal, the autosave of the history of a text (see modules/journal.py): the cost, in the thread of
+the interface, of recording an edit; how many batches are written while typing, as writing waits for typing to pause;
+the throughput of writing batches, and the time of the processor used for each; and rewriting the journal of a long
+history, with the size of the journal and the time of recovering from it, before and after.
+
+The journals are written to a temporary folder, so they are synced to its disk, as PydBook's are.
+
+Run it from the root of the repository: python -m benchmarks.bench_journal [--size CHARACTERS]"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.documents import make_document
+from modules import journal, string_changes
+
+KIB = 1024
+MIB = 1024 * KIB
+
+
+def new_history(path: str, text: str) -> tuple[string_changes.ChangesList, journal.Journal]:
+    changes_list = string_changes.ChangesList()
+    journal_ = journal.Journal(path)
+    journal_.record_base(0, text)
+    changes_list.journal = journal_
+    return changes_list, journal_
+
+
+def typing_changes(text: str, count: int, seed: int = 0) -> tuple[list[list[string_changes.Change]], str]:
+    """Returns the sets of changes of typing 'count' characters in 'text', as words in random places, 40 characters in
+    each, and the text afterwards."""
+
+    random_generator = random.Random(seed)
+    characters = list(text)
+    list_changes: list[list[string_changes.Change]] = []
+    position = 0
+
+    for index in range(count):
+        if index % 40 == 0:
+            position = random_generator.randrange(len(characters) + 1)
+
+        character = " " if index % 6 == 5 else random_generator.choice("abcdefghij")
+        characters.insert(position, character)
+        list_changes.append([string_changes.Change(string_changes.Change.NEW, position, character)])
+        position += 1
+
+    return list_changes, "".join(characters)
+
+
+def type_changes(changes_list: string_changes.ChangesList, list_changes: list[list[string_changes.Change]],
+                 interval: float = 0) -> None:
+    """Adds the sets of changes of 'typing_changes' to 'changes_list', one every 'interval' seconds."""
+
+    for index, changes in enumerate(list_changes):
+        if index % 40 == 0:  # A new place, and a new set of changes
+            changes_list.close_changes()
+        changes_list.add_changes(changes)
+
+        if interval:
+            time.sleep(interval)
+
+
+def wait_for_writes(journal_: journal.Journal) -> None:
+    while True:
+        with journal_._condition:  # Held by the thread while it writes a batch
+            if not journal_._records and journal_._rewriting is None:
+                return
+        time.sleep(0.001)
+
+
+def measure_recording(folder: str, text: str) -> None:
+    count = 20000
+    list_changes, _ = typing_changes(text, count)
+
+    changes_list = string_changes.ChangesList()
+    start = time.perf_counter()
+    type_changes(changes_list, list_changes)
+    without = time.perf_counter() - start
+
+    changes_list, journal_ = new_history(os.path.join(folder, "recording"), text)
+    start = time.perf_counter()
+    type_changes(changes_list, list_changes)
+    with_journal = time.perf_counter() - start
+    journal_.close()
+
+    print(f"Recording an edit, in the thread of the interface: {(with_journal - without) / count * 1e6:.2f} µs "
+          f"({with_journal / count * 1e6:.2f} µs with the history, {without / count * 1e6:.2f} µs without)")
+
+
+def measure_typing(folder: str, text: str) -> None:
+    """Types for a few seconds, at about 100 characters per second, and counts the batches written."""
+
+    count, interval = 300, 0.01
+    list_changes, _ = typing_changes(text, count)
+
+    changes_list, journal_ = new_history(os.path.join(folder, "typing"), text)
+    wait_for_writes(journal_)
+    flushes = journal_.flushes
+
+    type_changes(changes_list, list_changes, interval)
+    typing_flushes = journal_.flushes - flushes
+    journal_.close()
+
+    print(f"Batches written while typing {count} characters in {count * interval:.0f} s: {typing_flushes} "
+          f"(at most one each {journal_.MAX_FLUSH_DELAY:.1f} s, as typing does not pause for "
+          f"{journal_.FLUSH_DELAY:.1f} s)")
+
+
+def measure_throughput(folder: str, text: str) -> None:
+    """Records large edits, as pastes, written in batches as soon as possible."""
+
+    paste = make_document(256 * KIB)
+    count = 64
+
+    changes_list, journal_ = new_history(os.path.join(folder, "throughput"), text)
+    journal_.FLUSH_DELAY = 0
+    journal_.MAX_FLUSH_DELAY = 0
+    wait_for_writes(journal_)
+    flushes, bytes_written, flush_time = journal_.flushes, journal_.bytes_written, journal_.flush_time
+
+    start = time.perf_counter()
+    for index in range(count):
+        changes_list.add_changes([string_changes.Change(string_changes.Change.NEW, index * len(paste), paste)])
+        changes_list.close_changes()
+    wait_for_writes(journal_)
+    elapsed = time.perf_counter() - start
+
+    flushes = journal_.flushes - flushes
+    bytes_written = journal_.bytes_written - bytes_written
+    flush_time = journal_.flush_time - flush_time
+    journal_.close()
+
+    print(f"Writing {bytes_written / MIB:.1f} MiB of records: {bytes_written / MIB / elapsed:.1f} MiB/s, "
+          f"in {flushes} batches, {flush_time / max(flushes, 1) * 1000:.2f} ms of processor each")
+
+
+def measure_rewrite(folder: str, text: str) -> None:
+    """Builds a long history, and rewrites its journal."""
+
+    path = os.path.join(folder, "rewrite")
+    changes_list, journal_ = new_history(path, text)
+    journal_.FLUSH_DELAY = 0
+    changes_list.merge_interval = 10  # Every character typed is merged, and recorded again, as when typing fast
+    list_changes, text = typing_changes(text, 40000)
+    type_changes(changes_list, list_changes)
+    wait_for_writes(journal_)
+    size_before = os.path.getsize(path)
+
+    start = time.perf_counter()
+    recovered = journal.recover(path, string_changes.ChangesList())
+    recovery_before = time.perf_counter() - start
+    assert recovered == text
+
+    start = time.perf_counter()
+    journal_.rewrite(changes_list, [text])
+    snapshot_time = time.perf_counter() - start
+    wait_for_writes(journal_)
+    elapsed = time.perf_counter() - start
+    size_after = os.path.getsize(path)
+
+    start = time.perf_counter()
+    recovered = journal.recover(path, string_changes.ChangesList())
+    recovery_after = time.perf_counter() - start
+    assert recovered == text
+
+    print(f"Rewriting the journal of {len(changes_list.nodes) - 1} sets of changes, and {len(text) / MIB:.1f} MiB of "
+          f"text: {elapsed * 1000:.1f} ms, {journal_.rewrite_time * 1000:.1f} ms of processor, "
+          f"{size_after / MIB / elapsed:.1f} MiB/s; {snapshot_time * 1000:.2f} ms in the thread of the interface")
+    print(f"  Journal: {size_before / MIB:.2f} MiB before, {size_after / MIB:.2f} MiB after; recovery: "
+          f"{recovery_before * 1000:.1f} ms before, {recovery_after * 1000:.1f} ms after")
+    journal_.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the journal of the history of a text.")
+    parser.add_argument("--size", type=int, default=MIB, help="characters of the text edited")
+    arguments = parser.parse_args()
+
+    text = make_document(arguments.size)
+
+    with tempfile.TemporaryDirectory() as folder:
+        measure_recording(folder, text)
+        measure_typing(folder, text)
+        measure_throughput(folder, text)
+        measure_rewrite(folder, text)
+
+
+if __name__ == "__main__":
+    main()
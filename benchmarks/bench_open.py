@@ -0,0 +1,104 @@
+"""Measures opening a large file, headlessly: the time until the window first paints some of its text, the time until
+all of it is loaded, and the peak memory (RSS) of the process. It compares the streaming open of MainUI with the
+former one, which read the whole file and set it at once with 'setPlainText'. Each way runs in its own process, so
+that their peak memories are not mixed.
+
+Run it from the root of the repository: python -m benchmarks.bench_open"""
+
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")  # Before Qt is imported, so no display is needed
+
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from PySide6 import QtCore, QtWidgets
+
+FILE_SIZE = 100 * 1024 * 1024  # In bytes
+
+
+def make_file(path: str, size: int) -> None:
+    line = "2024-01-01 12:00:00 INFO The quick brown fox jumps over the lazy dog, again and again.\n"
+    block = line * (1024 * 1024 // len(line))
+
+    with open(path, "w", encoding="utf-8") as file:
+        for _ in range(size // len(block) + 1):
+            file.write(block)
+
+
+def peak_rss() -> int:
+    """Returns the peak memory of this process, in bytes."""
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # It is in KiB on Linux
+
+
+def former_open(ui, file_src: str) -> None:
+    """The former open: the whole file is read and set at once, in the thread of the interface."""
+
+    with open(file_src, "r", encoding="utf-8") as file:
+        text = file.read()
+    ui.text_editor.load_text(text)
+    ui.set_saving_file(file_src)
+
+
+def run(way: str, file_src: str) -> dict[str, float]:
+    from PydBook import MainUI
+
+    app = QtWidgets.QApplication([])
+    app.setApplicationName("PydBookBenchmark")  # So the journals of the user are not touched
+
+    ui = MainUI()
+    ui.resize(800, 600)
+    ui.show()
+    app.processEvents()
+    base_rss = peak_rss()
+
+    start = time.perf_counter()
+    if way == "former":
+        former_open(ui, file_src)
+        ui.grab()  # Paints the window
+        first_paint = loaded = time.perf_counter() - start
+    else:
+        ui.open_file(file_src)
+        while ui.text_editor.document().characterCount() <= 1:
+            app.processEvents(QtCore.QEventLoop.WaitForMoreEvents)
+        ui.grab()
+        first_paint = time.perf_counter() - start
+
+        while ui.file_loader is not None:
+            app.processEvents(QtCore.QEventLoop.WaitForMoreEvents)
+        loaded = time.perf_counter() - start
+
+    result = {"first_paint": first_paint, "loaded": loaded, "peak_rss": peak_rss(), "base_rss": base_rss}
+
+    ui.saved = True
+    ui.close()
+    return result
+
+
+def main():
+    if len(sys.argv) == 3:  # A process measuring one way
+        print(json.dumps(run(sys.argv[1], sys.argv[2])))
+        return
+
+    with tempfile.TemporaryDirectory() as folder:
+        file_src = os.path.join(folder, "large.log")
+        make_file(file_src, FILE_SIZE)
+        print(f"File: {os.path.getsize(file_src) / 1024 / 1024:.0f} MiB")
+
+        for way in ("former", "streaming"):
+            output = subprocess.run([sys.executable, "-m", "benchmarks.bench_open", way, file_src],
+                                    capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.splitlines()[-1])
+
+            print(f"  {way:10} first paint {result['first_paint'] * 1000:8.0f} ms"
+                  f"  loaded {result['loaded'] * 1000:8.0f} ms"
+                  f"  peak RSS {result['peak_rss'] / 1024 / 1024:6.0f} MiB"
+                  f" (+{(result['peak_rss'] - result['base_rss']) / 1024 / 1024:.0f} MiB)")
+
+
+if __name__ == "__main__":
+    main()
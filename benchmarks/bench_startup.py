@@ -0,0 +1,122 @@
+"""Measures the cold startup of PydBook, headlessly, under Qt's offscreen platform. Each run is a new interpreter, as
+imports are only slow the first time, which reports how long each phase of the startup took:
+    interpreter: from the start of the process until this module runs;
+    import Qt: importing QtCore, QtGui and QtWidgets;
+    import PydBook: importing PydBook and its modules, without Qt;
+    application: making the QApplication;
+    style, editor, journal: reading and applying the stylesheet, making the editor, and starting, or recovering, the
+    journal, within MainUI;
+    window: the rest of MainUI: its widgets, menus and status bar;
+    show: showing the window, until its first paint.
+The total is the time until the window is shown, from the start of the process. The parts of the interface which
+are only built when first needed are also measured, after the startup: the find bar, and the dialogs to open and to
+save a file.
+For each phase, the median, and the least, of the runs are reported.
+
+Run it from the root of the repository: python -m benchmarks.bench_startup [--runs RUNS]"""
+
+import os
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")  # Before Qt is imported, so no display is needed
+
+import argparse
+import json
+import statistics
+import subprocess
+
+PHASES = ("interpreter", "import Qt", "import PydBook", "application", "style", "editor", "journal", "window", "show",
+          "total")
+LAZY_PHASES = ("find bar", "open dialog", "save dialog")
+
+
+def timed(function, times: dict[str, float], phase: str):
+    """Returns 'function', adding the time of each of its calls to 'times[phase]'."""
+
+    def timed_function(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            times[phase] = times.get(phase, 0.0) + time.perf_counter() - start
+
+    return timed_function
+
+
+def run_startup(process_start: float) -> dict[str, float]:
+    """Starts PydBook, in this new interpreter, started at 'process_start', by time.time(), and returns how long each
+    phase took, in seconds."""
+
+    times: dict[str, float] = {"interpreter": time.time() - process_start}
+    start = time.perf_counter()
+    startup_start = start - times["interpreter"]
+
+    def end_phase(phase: str) -> None:
+        nonlocal start
+        now = time.perf_counter()
+        times[phase] = now - start
+        start = now
+
+    from PySide6 import QtCore, QtGui, QtWidgets
+    end_phase("import Qt")
+
+    import PydBook
+    end_phase("import PydBook")
+
+    app = QtWidgets.QApplication([])
+    app.setApplicationName("PydBookBenchmark")  # So the journals of the user are not touched
+    end_phase("application")
+
+    PydBook.MainUI.update_style = timed(PydBook.MainUI.update_style, times, "style")
+    PydBook.PydEditor.__init__ = timed(PydBook.PydEditor.__init__, times, "editor")
+    PydBook.MainUI.start_journal = timed(PydBook.MainUI.start_journal, times, "journal")
+
+    ui = PydBook.MainUI()
+    end_phase("window")
+    times["window"] -= times["style"] + times["editor"] + times["journal"]
+
+    ui.resize(800, 600)
+    ui.show()
+    app.processEvents()
+    end_phase("show")
+    times["total"] = time.perf_counter() - startup_start
+
+    for phase, build in (("find bar", ui.get_find_bar), ("open dialog", ui.open_selector),
+                         ("save dialog", ui.save_selector)):
+        build()
+        end_phase(phase)
+
+    ui.saved = True
+    ui.close()
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the cold startup of PydBook.")
+    parser.add_argument("--runs", type=int, default=5, help="number of startups measured")
+    parser.add_argument("--child", type=float, help=argparse.SUPPRESS)  # The start of this process, when measured
+    arguments = parser.parse_args()
+
+    if arguments.child is not None:
+        print(json.dumps(run_startup(arguments.child)))
+        return
+
+    results: list[dict[str, float]] = []
+    for _ in range(arguments.runs):
+        process_start = time.time()
+        output = subprocess.run([sys.executable, "-m", "benchmarks.bench_startup", "--child", repr(process_start)],
+                                capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"Startup of PydBook, in {arguments.runs} runs")
+    print(f"  {'phase':16} {'median':>10} {'least':>10}")
+    for phase in PHASES + LAZY_PHASES:
+        if phase == LAZY_PHASES[0]:
+            print("  Built when first needed, after the startup:")
+        values = [result[phase] for result in results]
+        print(f"  {phase:16} {statistics.median(values) * 1000:7.1f} ms {min(values) * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""Measures the latency of undoing and redoing on a large document, headlessly. It compares the in-place undo of
+PydEditor with replacing the whole text, as 'setPlainText' does. It also checks that typing around a character outside
+of the Basic Multilingual Plane, which Qt counts as two, is recorded, and undone and redone, exactly, and measures the
+latency of those keystrokes; and that a set of several changes around such characters, and a replace-all, are applied,
+undone and redone exactly.
+
+Run it from the root of the repository: python -m benchmarks.bench_undo"""
+
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")  # Before Qt is imported, so no display is needed
+
+import statistics
+import time
+
+from PySide6 import QtWidgets, QtGui
+
+from PydBook import PydEditor
+from benchmarks.documents import make_document
+from modules import search_index, string_changes
+
+DOCUMENT_SIZE = 5 * 1024 * 1024  # In characters
+REPETITIONS = 5
+
+
+def edit(editor: PydEditor, position: int, text: str) -> None:
+    cursor = QtGui.QTextCursor(editor.document())
+    cursor.setPosition(position)
+    cursor.insertText(text)
+
+
+def set_plain_text_undo(editor: PydEditor) -> None:
+    """The former undo: the whole text is rebuilt and set again."""
+
+    editor.undo_redoing = True
+    editor.setPlainText(string_changes.remake_str(editor.toPlainText(), editor.changes_list.get_last_change()))
+    editor.changes_list.rollback_changes()
+    editor.undo_redoing = False
+
+
+def measure(editor: PydEditor, edit_text: str, undo) -> list[float]:
+    timings: list[float] = []
+
+    for _ in range(REPETITIONS):
+        edit(editor, DOCUMENT_SIZE // 2, edit_text)
+
+        start = time.perf_counter()
+        undo()
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+
+def check_wide_characters(app: QtWidgets.QApplication) -> None:
+    """Types, one character at a time, a text with an emoji, in the middle of a document which ends with another; then
+    undoes it all, and redoes it all, comparing the texts with the expected ones."""
+
+    document = make_document(DOCUMENT_SIZE) + "\U0001F600"
+    typed = "a\U0001F600bcd"
+    position = DOCUMENT_SIZE // 2
+    expected = document[:position] + typed + document[position:]
+
+    editor = PydEditor()
+    editor.load_text(document)
+    app.processEvents()
+
+    cursor = QtGui.QTextCursor(editor.document())
+    cursor.setPosition(position)
+    editor.setTextCursor(cursor)
+    timings: list[float] = []
+
+    for character in typed:
+        start = time.perf_counter()
+        editor.textCursor().insertText(character)
+        timings.append(time.perf_counter() - start)
+        editor.changes_list.close_changes()  # Each character is a set of changes, undone one by one
+
+    typed_right = editor.toPlainText() == expected
+    for _ in typed:
+        editor.undo()
+    undone_right = editor.toPlainText() == document
+    for _ in typed:
+        editor.redo()
+    redone_right = editor.toPlainText() == expected
+
+    print(f"  typing around emojis {statistics.median(timings) * 1000:9.2f} ms per key; text typed "
+          f"{'right' if typed_right else 'WRONG'}, undone {'right' if undone_right else 'WRONG'}, redone "
+          f"{'right' if redone_right else 'WRONG'}")
+
+    editor.close()
+
+
+def check_wide_changes(app: QtWidgets.QApplication) -> None:
+    """Changes a text with emojis in several places at once, as reloading its file does, which is a set of several
+    changes, applied in one edit block; then undoes and redoes it, comparing the texts with the expected ones."""
+
+    document = "a\U0001F600b\U0001F600c\U0001F600d\n" * 3
+    changed = "a1\U0001F600b\U0001F600\U0001F600c2d\n" + document[len(document) // 3:].replace("c", "\U0001F600c3")
+
+    editor = PydEditor()
+    editor.load_text(document)
+    app.processEvents()
+
+    changes = string_changes.get_changes(document, changed)
+    editor.replace_all(changes)
+    changed_right = editor.toPlainText() == changed
+    editor.undo()
+    undone_right = editor.toPlainText() == document
+    editor.redo()
+    redone_right = editor.toPlainText() == changed
+
+    print(f"  {len(changes)} changes around emojis: applied {'right' if changed_right else 'WRONG'}, undone "
+          f"{'right' if undone_right else 'WRONG'}, redone {'right' if redone_right else 'WRONG'}")
+
+    editor.close()
+
+
+def check_wide_replace_all(app: QtWidgets.QApplication) -> None:
+    """Replaces every occurrence of a text between emojis, as the find bar does, then undoes and redoes it, comparing
+    the texts with the expected ones: with a few occurrences, which are edited one by one, and with more than
+    'WHOLE_TEXT_CHANGES', when the whole text is replaced."""
+
+    for count in (3, 2000):
+        document = "x\U0001F600" * count + "x"
+        replaced = document.replace("x", "yy")
+
+        editor = PydEditor()
+        editor.load_text(document)
+        app.processEvents()
+
+        index = search_index.SearchIndex("x")
+        index.build(document)
+        editor.replace_all(index.replace_all_changes("yy", document))
+        replaced_right = editor.toPlainText() == replaced
+        editor.undo()
+        undone_right = editor.toPlainText() == document
+        editor.redo()
+        redone_right = editor.toPlainText() == replaced
+
+        print(f"  replace-all of {count + 1} around emojis: replaced {'right' if replaced_right else 'WRONG'}, undone "
+              f"{'right' if undone_right else 'WRONG'}, redone {'right' if redone_right else 'WRONG'}")
+
+        editor.close()
+
+
+def main():
+    app = QtWidgets.QApplication([])
+
+    print(f"Document: {DOCUMENT_SIZE / 1024 / 1024:.0f} MiB, median of {REPETITIONS} runs")
+
+    for edit_name, edit_text in (("word", "hello "), ("100 KiB paste", make_document(100 * 1024))):
+        for undo_name in ("in place", "setPlainText"):
+            editor = PydEditor()
+            editor.resize(800, 600)
+            editor.show()
+            editor.setPlainText(make_document(DOCUMENT_SIZE))
+            editor.verticalScrollBar().setValue(editor.verticalScrollBar().maximum() // 2)
+            app.processEvents()
+
+            scroll = editor.verticalScrollBar().value()
+            undo = editor.undo if undo_name == "in place" else (lambda: set_plain_text_undo(editor))
+            timings = measure(editor, edit_text, undo)
+            app.processEvents()
+            kept = "kept" if editor.verticalScrollBar().value() == scroll else "lost"
+
+            print(f"  undo of {edit_name:14} {undo_name:13} {statistics.median(timings) * 1000:9.2f} ms"
+                  f"  (scroll position {kept})")
+
+            editor.close()
+
+    check_wide_characters(app)
+    check_wide_changes(app)
+    check_wide_replace_all(app)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""Offers the texts which the benchmarks edit."""
+
+import random
+
+
+def make_document(size: int) -> str:
+    """Returns a text of 'size' characters, of the same line repeated, as a long prose document."""
+
+    line = "The quick brown fox jumps over the lazy dog, again and again.\n"
+    return (line * (size // len(line) + 1))[:size]
+
+
+def make_random_document(size: int, seed: int = 0) -> str:
+    """Returns a text of 'size' characters, of lines of random words, by 'seed'. Unlike the lines of 'make_document',
+    they differ, as comparing texts, which matches their lines, is only measured fairly on lines which do."""
+
+    random_generator = random.Random(seed)
+    words = ["the", "quick", "brown", "fox", "jumps", "over", "lazy", "dog", "again", "and", "PydBook", "text", "1234"]
+
+    lines: list[str] = []
+    length = 0
+    while length < size:
+        line = " ".join(random_generator.choice(words) for _ in range(random_generator.randint(0, 14))) + "\n"
+        lines.append(line)
+        length += len(line)
+
+    return "".join(lines)[:size]
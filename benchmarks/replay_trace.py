@@ -0,0 +1,164 @@
+"""Replays edit traces, recorded by PydBook with '--record-trace' (see modules/edit_trace.py), headlessly, in MainUI,
+and measures the latency of each action: from when it is sent until the window has handled it, and everything it
+posted, painting included. The latencies are reported by kind of action and size of the document, as their 50th,
+95th and 99th percentiles. Saves are written to a temporary file.
+With '--pad', the text of the trace is followed by generated text, of the given numbers of characters, one replay for
+each, so that the same session is measured on larger documents. Without it, the text replayed is checked to be the
+one recorded.
+
+Run it from the root of the repository: python -m benchmarks.replay_trace TRACE [--pad SIZE]..."""
+
+import os
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")  # Before Qt is imported, so no display is needed
+
+import argparse
+import math
+import tempfile
+import time
+
+from PySide6 import QtCore, QtGui, QtWidgets
+
+from benchmarks.documents import make_document
+from modules import edit_trace, journal
+
+SIZE_CLASSES = ((64 * 1024, "< 64 KiB"), (1024 * 1024, "< 1 MiB"), (16 * 1024 * 1024, "< 16 MiB"))
+LARGEST_SIZE_CLASS = ">= 16 MiB"
+
+
+def size_class(size: int) -> str:
+    for limit, name in SIZE_CLASSES:
+        if size < limit:
+            return name
+    return LARGEST_SIZE_CLASS
+
+
+def percentile(sorted_values: list[float], percentage: float) -> float:
+    """Returns the 'percentage' percentile of 'sorted_values', by the nearest rank."""
+
+    return sorted_values[max(0, math.ceil(percentage / 100 * len(sorted_values)) - 1)]
+
+
+def recorded_text(header: dict, events: list[dict]) -> str:
+    """Returns the text at the end of the trace, from its edits."""
+
+    text = header["text"]
+    for event in events:
+        if event["event"] == edit_trace.EDIT:
+            text = text[:event["position"]] + event["text"] + text[event["position"] + event["removed"]:]
+        elif event["event"] == edit_trace.LOAD:
+            text = event["text"]
+
+    return text
+
+
+def set_selection(editor, position: int, anchor: int) -> None:
+    cursor = editor.textCursor()
+    cursor.setPosition(anchor)
+    cursor.setPosition(position, QtGui.QTextCursor.KeepAnchor)
+    editor.setTextCursor(cursor)
+
+
+def replay(app, header: dict, events: list[dict], padding: int, save_src: str) -> dict[tuple[str, str], list[float]]:
+    """Replays the trace in a new MainUI, and returns the latencies of its actions, by kind and size class."""
+
+    from PydBook import MainUI
+
+    ui = MainUI()
+    ui.resize(800, 600)
+    ui.show()
+    editor = ui.text_editor
+
+    text = header["text"] + make_document(padding)
+    editor.load_text(text)
+    ui.set_saving_file(save_src, editor.revision(), journal.fingerprint(text))
+    set_selection(editor, header["cursor"], header["anchor"])
+    app.processEvents()
+
+    latencies: dict[tuple[str, str], list[float]] = {}
+
+    for event in events:
+        kind = event["event"]
+        if kind == edit_trace.EDIT:  # Done by the actions
+            continue
+        if kind == edit_trace.CURSOR:
+            set_selection(editor, event["position"], event["anchor"])
+            app.processEvents()
+            continue
+
+        size = editor.text_length()
+        start = time.perf_counter()
+
+        match kind:
+            case edit_trace.KEY:
+                key_event = QtGui.QKeyEvent(QtCore.QEvent.KeyPress, event["key"],
+                                            QtCore.Qt.KeyboardModifier(event["modifiers"]), event["text"])
+                QtWidgets.QApplication.sendEvent(editor, key_event)
+            case edit_trace.PASTE:
+                mime_data = QtCore.QMimeData()
+                mime_data.setText(event["text"])
+                editor.insertFromMimeData(mime_data)
+            case edit_trace.UNDO:
+                ui.undo_action.trigger()
+            case edit_trace.REDO:
+                ui.redo_action.trigger()
+            case edit_trace.BRANCH:
+                editor.switch_branch(event["step"])
+            case edit_trace.REPLACE:
+                editor.textCursor().insertText(event["text"])
+            case edit_trace.REPLACE_ALL:
+                find_bar = ui.get_find_bar()
+                find_bar.find_edit.setText(event["query"])
+                find_bar.match_case_box.setChecked(event["match_case"])
+                find_bar.replace_edit.setText(event["replacement"])
+                find_bar.replace_all()
+            case edit_trace.SAVE:
+                ui.user_save()
+            case edit_trace.LOAD:
+                editor.load_text(event["text"])
+        app.processEvents()
+
+        latencies.setdefault((kind, size_class(size)), []).append(time.perf_counter() - start)
+
+        if kind == edit_trace.SAVE:
+            ui.finish_saving()  # Untimed, so that the next actions are not slowed by writing
+
+    editor.wait_for_history()
+    app.processEvents()
+
+    if padding == 0:
+        matches = editor.toPlainText() == recorded_text(header, events)
+        print(f"  Replayed text {'matches' if matches else 'DIFFERS FROM'} the recorded one")
+
+    ui.saved = True
+    ui.close()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replays an edit trace, measuring the latency of its actions.")
+    parser.add_argument("trace", help="the edit trace, recorded by PydBook with --record-trace")
+    parser.add_argument("--pad", type=int, action="append", help="characters of text added after the one of the "
+                                                                 "trace; can be given several times")
+    arguments = parser.parse_args()
+
+    app = QtWidgets.QApplication([])
+    app.setApplicationName("PydBookBenchmark")  # So the journals of the user are not touched
+
+    header, events = edit_trace.read_trace(arguments.trace)
+
+    with tempfile.TemporaryDirectory() as folder:
+        for padding in arguments.pad or [0]:
+            print(f"Trace {os.path.basename(arguments.trace)}, {len(header['text']) + padding} characters at first")
+            latencies = replay(app, header, events, padding, os.path.join(folder, "replayed.txt"))
+
+            width = max([len("action")] + [len(kind) for kind, _ in latencies])  # Wide enough for "replace_all"
+            print(f"  {'action':{width}} {'document':>10} {'count':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+            for (kind, size_name), values in sorted(latencies.items()):
+                values.sort()
+                print(f"  {kind:{width}} {size_name:>10} {len(values):6}"
+                      + "".join(f" {percentile(values, percentage) * 1000:6.2f} ms" for percentage in (50, 95, 99))
+                      + f" {values[-1] * 1000:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
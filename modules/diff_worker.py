@@ -0,0 +1,90 @@
+"""Offers a pool of threads to calculate the changes between texts in the background, so that large comparisons do
+not block the interface."""
+
+import threading
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from typing import Callable, Hashable
+
+from modules import string_changes
+
+
+class DiffTask:
+    """The calculation of the changes from 'original' to 'changed', running, or waiting to, in a DiffPool."""
+
+    def __init__(self, original: str, changed: str):
+        self.original = original
+        self.changed = changed
+
+        self._cancelled = threading.Event()
+        self._future: Future | None = None
+
+    def cancel(self) -> None:
+        """Cancels the calculation: it is not started, or it stops soon, and 'result' raises DiffCancelled. If it had
+        already finished, its result is kept."""
+
+        self._cancelled.set()
+        self._future.cancel()
+
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def done(self) -> bool:
+        return self._future.done()
+
+    def result(self) -> list[string_changes.Change]:
+        """Returns the changes, waiting for them if they are still being calculated."""
+
+        try:
+            return self._future.result()
+        except CancelledError:  # It was cancelled before it started
+            raise string_changes.DiffCancelled
+
+
+class DiffPool:
+    """Calculates changes between texts in 'max_workers' background threads. A task can be submitted with a 'key';
+    then, it supersedes the last task submitted with the same key, which is cancelled, as its changes are no longer
+    needed."""
+
+    def __init__(self, max_workers: int = 2):
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="Diff")
+        self._last_tasks: dict[Hashable, DiffTask] = {}  # The last task of each key
+        self._lock = threading.Lock()  # For '_last_tasks', which tasks forget when they finish, in their threads
+
+    def submit(self, original: str, changed: str, key: Hashable | None = None,
+               when_done: Callable[[DiffTask], None] | None = None, by_lines: bool = False) -> DiffTask:
+        """Starts calculating the changes from 'original' to 'changed', and returns its task. 'when_done', if given, is
+        called with the task when it finishes, even if cancelled, in the thread of the pool. 'by_lines' is as in
+        'string_changes.get_changes'."""
+
+        if key is not None:
+            with self._lock:
+                last_task = self._last_tasks.pop(key, None)
+            if last_task is not None:
+                last_task.cancel()
+
+        task = DiffTask(original, changed)
+        task._future = self._executor.submit(string_changes.get_changes, original, changed, task.cancelled,
+                                             by_lines=by_lines)
+        if when_done is not None:
+            task._future.add_done_callback(lambda _future: when_done(task))
+
+        if key is not None:
+            with self._lock:
+                self._last_tasks[key] = task
+            task._future.add_done_callback(lambda _future: self._forget(key, task))
+
+        return task
+
+    def shutdown(self) -> None:
+        """Cancels every task, and stops the threads."""
+
+        with self._lock:
+            tasks = list(self._last_tasks.values())
+        for task in tasks:
+            task.cancel()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _forget(self, key: Hashable, task: DiffTask) -> None:
+        with self._lock:
+            if self._last_tasks.get(key) is task:
+                del self._last_tasks[key]
@@ -0,0 +1,70 @@
+"""Offers functions and a class to write and read edit traces: records of editing sessions, which can be replayed to
+measure the editor, or whose edits can be measured on their own.
+A trace is a file of JSON lines. The first one is its header: {"text": ..., "cursor": ..., "anchor": ...}, the text,
+and the selection, when the recording started. Each next line is an event, with "time", in seconds since the start,
+and "event", its kind, which are:
+    "key": a key pressed in the editor, with its "key", "modifiers" and "text", as in QKeyEvent;
+    "paste": a paste, of "text";
+    "cursor": the selection set, not by a key, as by the mouse, with its "position" and "anchor";
+    "undo", "redo" and "save";
+    "branch": a switch to another branch of the history, "step" branches after, or before, if negative;
+    "replace": the selection replaced by "text", from the find bar;
+    "replace_all": every occurrence of "query" replaced by "replacement", matching the case if "match_case";
+    "edit": an edit of the text, which any of the events before caused, with its "position", the number of characters
+    "removed" there, and the "text" then inserted there. Edits are applied in order;
+    "load": the text replaced by "text", as when a file is opened."""
+
+import json
+import time
+from typing import Any
+
+from modules import string_changes
+
+KEY = "key"
+PASTE = "paste"
+CURSOR = "cursor"
+UNDO = "undo"
+REDO = "redo"
+SAVE = "save"
+BRANCH = "branch"
+REPLACE = "replace"
+REPLACE_ALL = "replace_all"
+EDIT = "edit"
+LOAD = "load"
+
+
+class TraceWriter:
+    """Writes a trace to the file at 'path', which starts with the text 'text', with the cursor at 'cursor' and the
+    selection anchored at 'anchor'."""
+
+    def __init__(self, path: str, text: str, cursor: int = 0, anchor: int = 0):
+        self.path = path
+        self._file = open(path, "w", encoding="utf-8")
+        self._start = time.perf_counter()
+
+        self._write({"text": text, "cursor": cursor, "anchor": anchor})
+
+    def write_event(self, event: str, **values: Any) -> None:
+        self._write({"time": round(time.perf_counter() - self._start, 6), "event": event, **values})
+
+    def write_changes(self, changes: list[string_changes.Change]) -> None:
+        """Writes the set of changes 'changes' as its edits."""
+
+        for position, removed, text in string_changes.sequential_edits(changes):
+            self.write_event(EDIT, position=position, removed=removed, text=text)
+
+    def close(self) -> None:
+        self._file.close()
+
+    def _write(self, line: dict[str, Any]) -> None:
+        self._file.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+
+def read_trace(path: str) -> tuple[dict[str, Any], list[dict[str, Any]]]:
+    """Returns the header, and the events, of the trace at 'path'."""
+
+    with open(path, "r", encoding="utf-8") as file:
+        lines = [json.loads(line) for line in file if line.strip()]
+
+    return lines[0], lines[1:]
+
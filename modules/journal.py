@@ -0,0 +1,450 @@
+"""Offers an append-only journal of the history of a text, kept on disk, from which the text and its history can be
+recovered after a crash."""
+
+import array
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
+from modules import string_changes
+from modules import text_buffer
+
+MAGIC = b"PYDJ\x01"  # At the start of every journal, with its version
+
+# Kinds of records. Each record is its kind, the length of its data, and the data.
+NODE = 1  # A set of changes added: its number, the number of its parent and its changes
+CHANGES = 2  # The changes of a set of changes replaced, as when merged into: its number and its changes
+DELETION = 3  # A set of changes deleted: its number
+CURRENT = 4  # The last set of changes applied changed, as when undoing: its number
+SAVED = 5  # The text after a set of changes was saved to the file: its number, and the fingerprint of the text
+BASE = 6  # The text after a set of changes, when it is not in a file: its number and the text
+ROOT = 7  # The number of the oldest state, at the start of a rewritten journal, if it is not 0
+
+_RECORD = struct.Struct("<BI")
+_NUMBER = struct.Struct("<q")
+_NODE = struct.Struct("<qq")
+_SAVED = struct.Struct("<qqI")
+_COUNT = struct.Struct("<I")
+_CHANGE = struct.Struct("<BqI")
+_REPLACEMENT = struct.Struct("<IqqII")  # Its number of runs, their lengths, and the lengths of their encoded texts
+_REPLACEMENT_COUNT = 0xFFFFFFFF  # In place of the number of changes, if they are a string_changes.Replacement
+
+
+def fingerprint(text: str) -> tuple[int, int]:
+    """Returns the length and the CRC-32 of 'text', to know, cheaply, whether a file still has a text."""
+
+    return update_fingerprint((0, 0), text)
+
+
+def update_fingerprint(text_fingerprint: tuple[int, int], text: str) -> tuple[int, int]:
+    """Returns the fingerprint of a text, whose fingerprint so far is 'text_fingerprint', followed by 'text'. It is
+    used to fingerprint a text read in parts."""
+
+    length, crc = text_fingerprint
+    return length + len(text), zlib.crc32(text.encode("utf-8"), crc)
+
+
+class Journal:
+    """The journal of a text, in the file 'path'. Records are encoded when they happen, and written by a background
+    thread, in batches, each batch being synced to the disk. A batch is written once no record has come for
+    'FLUSH_DELAY' seconds, so that the disk is not written while typing, but, at most, 'MAX_FLUSH_DELAY' seconds
+    after its first record. Consecutive records of the changes of the same set, as when typing, replace each other while
+    they are not written.
+    As it is only appended to, the journal keeps every version of every set of changes. Once 'rewrite_due', as records
+    of, at least, 'REWRITE_MIN_BYTES', and of more than its size after the last rewrite, were appended, it should be
+    rewritten, by 'rewrite', with only the history as it is, and the text, also in the background.
+    The work of the thread is counted, to be measured: 'flushes', 'bytes_written' and 'flush_time', the time of the
+    processor used writing batches, and 'rewrites', 'bytes_rewritten' and 'rewrite_time'."""
+
+    FLUSH_DELAY = 0.5
+    MAX_FLUSH_DELAY = 3.0
+    REWRITE_MIN_BYTES = 4 * 1024 * 1024
+
+    def __init__(self, path: str):
+        self.path = path
+
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "ab")
+        if new:
+            self._file.write(MAGIC)
+
+        self._records: list[bytes] = []  # Encoded records not yet written
+        self._last_changes_number: int | None = None  # Number of the set whose changes are the last record, if so
+        self._first_record_time: float = 0  # When the oldest, and the newest, records not yet written came
+        self._last_record_time: float = 0
+        self._rewriting: tuple | None = None  # What to rewrite the journal with, while it is being rewritten
+        self._condition = threading.Condition()
+        self._closed = False
+
+        self._appended_bytes = 0  # Bytes written since the journal was opened, or rewritten,
+        self._rewritten_size = self._file.tell()  # and its size then
+
+        self.flushes = 0
+        self.bytes_written = 0
+        self.flush_time = 0.0
+        self.rewrites = 0
+        self.bytes_rewritten = 0
+        self.rewrite_time = 0.0
+
+        self._thread = threading.Thread(target=self._write_loop, name="Journal", daemon=True)
+        self._thread.start()
+
+    # Records. They are called by the history, in the thread of the interface.
+
+    def record_node(self, node: string_changes.ChangesNode) -> None:
+        self._append(NODE, _NODE.pack(node.number, node.parent.number) + _encode_changes(node.changes))
+
+    def record_changes(self, node: string_changes.ChangesNode) -> None:
+        self._append(CHANGES, _NUMBER.pack(node.number) + _encode_changes(node.changes), node.number)
+
+    def record_deletion(self, node: string_changes.ChangesNode) -> None:
+        self._append(DELETION, _NUMBER.pack(node.number))
+
+    def record_current(self, node: string_changes.ChangesNode) -> None:
+        self._append(CURRENT, _NUMBER.pack(node.number))
+
+    def record_saved(self, number: int, text_fingerprint: tuple[int, int]) -> None:
+        self._append(SAVED, _SAVED.pack(number, *text_fingerprint))
+
+    def record_base(self, number: int, text: str) -> None:
+        self._append(BASE, _NUMBER.pack(number) + text.encode("utf-8"))
+
+    def rewrite_due(self) -> bool:
+        return self._rewriting is None and self._appended_bytes >= max(self.REWRITE_MIN_BYTES, self._rewritten_size)
+
+    def rewrite(self, changes_list: string_changes.ChangesList, chunks: list[str]) -> None:
+        """Rewrites the journal, in the background, with only what is needed to recover 'changes_list' as it is now, and
+        the text after its last set of changes applied, whose snapshot is 'chunks'. Meanwhile, new records are kept, to
+        be written after it. The sets of changes are only referenced, not copied, as the history replaces them, when
+        merging, but never changes them."""
+
+        root = changes_list.root
+        nodes = [(node.number, node.parent.number, node.changes) for node in changes_list.nodes.values()
+                 if node is not root]  # From the oldest, so that every set comes after the set it was done after
+
+        with self._condition:
+            # The records so far are replaced by the rewrite, and the next ones must not replace them
+            self._rewriting = (root.number, nodes, changes_list.current.number, chunks, len(self._records))
+            self._last_changes_number = None
+            self._condition.notify()
+
+    def move(self, path: str) -> None:
+        """Moves the journal to the file 'path', as when the text is saved somewhere else. If it cannot be renamed to
+        it, as on another file system, it is copied, and then deleted. If that fails too, OSError is raised, and the
+        journal is kept, and still appended to, where it was."""
+
+        with self._condition:
+            self._flush()
+            self._file.close()
+
+            try:
+                try:
+                    os.replace(self.path, path)
+                    self.path = path
+                except OSError:
+                    self._copy(path)
+            finally:
+                self._file = open(self.path, "ab")  # Where it is now, whether it was moved or not
+
+    def _copy(self, path: str) -> None:
+        """Copies the journal to 'path', and deletes the old one, making 'path' the journal's. If it cannot be copied,
+        no copy is left."""
+
+        try:
+            shutil.copyfile(self.path, path)
+        except OSError:
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+
+        old_path, self.path = self.path, path
+        try:
+            os.remove(old_path)
+        except OSError:  # The journal has been moved, even if its old copy is left
+            pass
+
+    def close(self, delete: bool = False) -> None:
+        """Writes what is left and stops the journal. If 'delete', the file is deleted, as when the text is closed
+        normally and there is nothing to be recovered."""
+
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+
+        self._file.close()
+        if delete:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:  # Deleted by something else, which is what was wanted
+                pass
+
+    def _append(self, kind: int, data: bytes, changes_number: int | None = None) -> None:
+        record = _RECORD.pack(kind, len(data)) + data
+        now = time.monotonic()
+
+        with self._condition:
+            if changes_number is not None and changes_number == self._last_changes_number and self._records:
+                self._records[-1] = record  # The newer changes of the same set replace the older ones
+            else:
+                self._records.append(record)
+            self._last_changes_number = changes_number
+
+            self._last_record_time = now
+            if len(self._records) == 1:  # The thread is waiting for records, not for the time to write them
+                self._first_record_time = now
+                self._condition.notify()
+
+    def _write_loop(self) -> None:
+        with self._condition:
+            while not self._closed:
+                if self._rewriting is not None:
+                    self._rewrite()
+                    continue
+
+                if not self._records:
+                    self._condition.wait()
+                    continue
+
+                now = time.monotonic()
+                flush_time = min(self._last_record_time + self.FLUSH_DELAY,
+                                 self._first_record_time + self.MAX_FLUSH_DELAY)
+                if now < flush_time:  # Records are still coming
+                    self._condition.wait(flush_time - now)
+                else:
+                    self._flush()
+
+            self._flush()
+
+    def _flush(self, count: int | None = None) -> None:
+        """Writes and syncs the records not yet written, or only the first 'count' of them. It must be called with the
+        condition held."""
+
+        if count is None:
+            count = len(self._records)
+        if count == 0:
+            return
+
+        start = time.thread_time()
+
+        data = b"".join(self._records[:count])
+        self._file.write(data)
+        del self._records[:count]
+        if not self._records:
+            self._last_changes_number = None
+        self._first_record_time = self._last_record_time
+
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+        self._appended_bytes += len(data)
+        self.flushes += 1
+        self.bytes_written += len(data)
+        self.flush_time += time.thread_time() - start
+
+    def _rewrite(self) -> None:
+        """Rewrites the journal, as asked by 'rewrite'. The new journal is written to a temporary file, without the
+        condition held, so that records can still be added, and then replaces the journal. It must be called with the
+        condition held."""
+
+        root_number, nodes, current_number, chunks, count = self._rewriting
+        path = self.path
+        self._flush(count)  # So that the journal is complete, until it is replaced
+
+        self._condition.release()
+        temporary_path = None
+        try:
+            start = time.thread_time()
+            descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                                          prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+            with open(descriptor, "wb") as file:
+                file.write(MAGIC)
+                if root_number != 0:
+                    file.write(_RECORD.pack(ROOT, _NUMBER.size) + _NUMBER.pack(root_number))
+                for number, parent_number, changes in nodes:
+                    data = _NODE.pack(number, parent_number) + _encode_changes(changes)
+                    file.write(_RECORD.pack(NODE, len(data)) + data)
+                file.write(_RECORD.pack(CURRENT, _NUMBER.size) + _NUMBER.pack(current_number))
+
+                text = "".join(chunks).encode("utf-8")
+                file.write(_RECORD.pack(BASE, _NUMBER.size + len(text)) + _NUMBER.pack(current_number))
+                file.write(text)
+                del text
+
+                file.flush()
+                os.fsync(file.fileno())
+                size = file.tell()
+            rewrite_time = time.thread_time() - start
+        except OSError:  # The journal is kept as it is, and appended to
+            if temporary_path is not None and os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            temporary_path = None
+        finally:
+            self._condition.acquire()
+            self._rewriting = None
+
+        if temporary_path is None:
+            return
+        if self.path != path or self._closed:  # Moved, or closed, meanwhile, so the rewrite is of nothing
+            os.remove(temporary_path)
+            return
+
+        self._file.close()
+        os.replace(temporary_path, path)
+        self._file = open(path, "ab")
+
+        self._appended_bytes = 0
+        self._rewritten_size = size
+        self.rewrites += 1
+        self.bytes_rewritten += size
+        self.rewrite_time += rewrite_time
+
+
+def recover(path: str, changes_list: string_changes.ChangesList, saved_text: str | None = None) -> str | None:
+    """Restores, into 'changes_list', which must be empty, the history in the journal at 'path', and returns the text
+    after the last set of changes applied. 'saved_text' is the text of the file the journal is of, if any, which is
+    used if it is the text after a set of changes saved. Returns None if the text cannot be recovered."""
+
+    with open(path, "rb") as file:
+        data = file.read()
+
+    if not data.startswith(MAGIC):
+        return None
+
+    saved_fingerprint = fingerprint(saved_text) if saved_text is not None else None
+    base: tuple[int, str] | None = None  # A set of changes whose text is known, and its text
+    current = 0
+    changes_positions: dict[int, int] = {}  # Where the last changes of each set are. Only those are decoded.
+
+    # Bound to local names, as there may be hundreds of thousands of records
+    unpack_record, unpack_node, restore_node = _RECORD.unpack_from, _NODE.unpack_from, changes_list.restore_node
+    data_length = len(data)
+
+    position = len(MAGIC)
+    while position + _RECORD.size <= data_length:
+        kind, length = unpack_record(data, position)
+        position += _RECORD.size
+        end = position + length
+        if end > data_length:
+            break  # The last record was not completely written
+
+        if kind == NODE:
+            number, parent_number = unpack_node(data, position)
+            restore_node(number, parent_number, [])
+            changes_positions[number] = position + _NODE.size
+            current = number
+        elif kind == CHANGES:
+            number, = _NUMBER.unpack_from(data, position)
+            changes_positions[number] = position + _NUMBER.size
+        elif kind == DELETION:
+            number, = _NUMBER.unpack_from(data, position)
+            current = changes_list.nodes[number].parent.number
+            changes_list.restore_deletion(number)
+        elif kind == CURRENT:
+            current, = _NUMBER.unpack_from(data, position)
+        elif kind == SAVED:
+            number, text_length, crc = _SAVED.unpack_from(data, position)
+            if (text_length, crc) == saved_fingerprint:
+                base = number, saved_text
+        elif kind == BASE:
+            number, = _NUMBER.unpack_from(data, position)
+            base = number, data[position + _NUMBER.size: end].decode("utf-8")
+        elif kind == ROOT:
+            number, = _NUMBER.unpack_from(data, position)
+            changes_list.restore_root(number)
+
+        position = end
+
+    for number, changes_position in changes_positions.items():
+        if number in changes_list.nodes:
+            changes_list.restore_changes(number, _decode_changes(data, changes_position))
+
+    if base is None or base[0] not in changes_list.nodes:
+        return None
+
+    # The text is rebuilt from the known one, one set of changes at a time
+    buffer = text_buffer.TextBuffer(base[1])
+    undone, redone = changes_list.get_path(base[0], current)
+    for node in undone:
+        string_changes.change_buffer(buffer, string_changes.invert_changes(node.changes))
+    for node in reversed(redone):
+        string_changes.change_buffer(buffer, node.changes)
+
+    text = buffer.text()
+    changes_list.restore_current(current, text)
+
+    return text
+
+
+def _encode_changes(changes: list[string_changes.Change]) -> bytes:
+    if isinstance(changes, string_changes.Replacement):
+        return _encode_replacement(changes)
+
+    parts = [_COUNT.pack(len(changes))]
+
+    for change in changes:
+        text = change.text.encode("utf-8")
+        parts.append(_CHANGE.pack(change.change_type, change.index, len(text)))
+        parts.append(text)
+
+    return b"".join(parts)
+
+
+def _decode_changes(data: bytes, position: int) -> list[string_changes.Change]:
+    count, = _COUNT.unpack_from(data, position)
+    position += _COUNT.size
+
+    if count == _REPLACEMENT_COUNT:
+        return _decode_replacement(data, position)
+
+    if count == 1:  # As when typing
+        change_type, index, length = _CHANGE.unpack_from(data, position)
+        position += _CHANGE.size
+        return [string_changes.Change(change_type, index, data[position: position + length].decode("utf-8"))]
+
+    changes: list[string_changes.Change] = []
+    for _ in range(count):
+        change_type, index, length = _CHANGE.unpack_from(data, position)
+        position += _CHANGE.size
+        changes.append(string_changes.Change(change_type, index, data[position: position + length].decode("utf-8")))
+        position += length
+
+    return changes
+
+
+def _encode_replacement(replacement: string_changes.Replacement) -> bytes:
+    """Encodes 'replacement' as it is kept: its texts, and the indexes of its runs, 8 bytes each."""
+
+    removed = replacement.removed.encode("utf-8")
+    inserted = replacement.inserted.encode("utf-8")
+    positions = replacement.positions
+    if sys.byteorder == "big":  # The journal is little-endian, as its other numbers
+        positions = array.array("q", positions)
+        positions.byteswap()
+
+    return b"".join((_COUNT.pack(_REPLACEMENT_COUNT),
+                     _REPLACEMENT.pack(len(positions), replacement.removed_length, replacement.inserted_length,
+                                       len(removed), len(inserted)),
+                     removed, inserted, positions.tobytes()))
+
+
+def _decode_replacement(data: bytes, position: int) -> string_changes.Replacement:
+    count, removed_length, inserted_length, removed_size, inserted_size = _REPLACEMENT.unpack_from(data, position)
+    position += _REPLACEMENT.size
+
+    removed = data[position: position + removed_size].decode("utf-8")
+    position += removed_size
+    inserted = data[position: position + inserted_size].decode("utf-8")
+    position += inserted_size
+
+    positions = array.array("q")
+    positions.frombytes(data[position: position + count * positions.itemsize])
+    if sys.byteorder == "big":
+        positions.byteswap()
+
+    return string_changes.Replacement(positions, removed, inserted, removed_length, inserted_length)
@@ -0,0 +1,99 @@
+"""Offers a class to read the lines of a text file of any size, without loading the file, nor its text, in memory."""
+
+import mmap
+import threading
+from array import array
+from bisect import bisect_left
+
+
+class MappedText:
+    """The text of the file at 'path', memory-mapped, so that only the parts read are loaded, by the system, which can
+    drop them at any moment. The lines are found through an index, built in a background thread by 'start_indexing',
+    which keeps how many line breaks there are before each block of 'BLOCK_SIZE' bytes: it uses 8 bytes for each
+    block, so about a 8192th of the size of the file. A line is found by reading, at most, one block.
+    Lines are decoded using UTF-8, whose line breaks are always the byte of "\\n", and are cut after
+    'MAX_LINE_LENGTH' bytes."""
+
+    BLOCK_SIZE = 64 * 1024
+    READ_SIZE = 16 * BLOCK_SIZE  # Bytes read at once when indexing
+    MAX_LINE_LENGTH = 64 * 1024
+
+    def __init__(self, path: str):
+        self.path = path
+
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.size: int = len(self._map)
+
+        self._block_line_breaks = array("Q", [0])  # Line breaks before each block indexed, and the block after
+        self.indexed: bool = False  # Whether the whole file has been indexed
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start_indexing(self) -> None:
+        self._thread = threading.Thread(target=self._index, name="MappedText", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """Stops indexing, and unmaps the file."""
+
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._map.close()
+
+    def line_count(self) -> int:
+        """Returns the number of lines indexed so far. Until the whole file is, the last one may be longer than it is
+        known to be."""
+
+        return self._block_line_breaks[-1] + 1
+
+    def lines(self, first: int, count: int) -> list[str]:
+        """Returns, at most, 'count' lines, starting with the one numbered 'first', without their line breaks."""
+
+        count = max(0, min(count, self.line_count() - first))
+        position = self._line_start(first) if count else 0
+
+        lines: list[str] = []
+        for _ in range(count):
+            end = self._map.find(b"\n", position)
+            if end == -1:
+                end = self.size
+
+            line = self._map[position: min(end, position + self.MAX_LINE_LENGTH)]
+            lines.append(line.decode("utf-8", errors="replace").removesuffix("\r"))
+            position = end + 1
+
+        return lines
+
+    def _line_start(self, line: int) -> int:
+        """Returns the position of the start of the line numbered 'line', which must have been indexed."""
+
+        if line == 0:
+            return 0
+
+        block_line_breaks = self._block_line_breaks
+        block = bisect_left(block_line_breaks, line) - 1  # The last block with fewer line breaks before it
+        position = block * self.BLOCK_SIZE
+
+        for _ in range(line - block_line_breaks[block]):
+            position = self._map.find(b"\n", position) + 1
+
+        return position
+
+    def _index(self) -> None:
+        """Counts the line breaks of each block. The file is read, not mapped, so that the pages read are not kept as
+        memory of the process."""
+
+        line_breaks = 0
+
+        with open(self.path, "rb") as file:
+            while data := file.read(self.READ_SIZE):
+                if self._stop.is_set():
+                    return
+
+                for start in range(0, len(data), self.BLOCK_SIZE):
+                    line_breaks += data.count(b"\n", start, start + self.BLOCK_SIZE)
+                    self._block_line_breaks.append(line_breaks)
+
+        self.indexed = True
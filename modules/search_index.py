@@ -0,0 +1,245 @@
+"""Offers a class to find a text in another, kept up to date while the other is edited, so that searching again costs
+about nothing, whatever the length of the text."""
+
+import re
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from typing import Iterator
+
+from modules import string_changes
+
+
+class SearchIndex:
+    """The positions of all the occurrences of 'query' in a text, overlapping ones included, ignoring the case unless
+    'match_case'. It is built once, by 'build', and then updated from the changes of each edit, by 'apply_changes',
+    which only searches again around the edited characters.
+    The text is divided in buckets of about 'BUCKET_SIZE' characters, each keeping the positions of the occurrences
+    starting in it, relative to its start, so that an edit only moves the occurrences of its bucket: the others move
+    with the start of their bucket."""
+
+    BUCKET_SIZE = 1 << 16
+
+    def __init__(self, query: str, match_case: bool = True):
+        self.query = query
+        self.match_case = match_case
+        self.built: bool = False  # Whether the occurrences are known
+
+        # A lookahead finds every occurrence, even if overlapping the one before
+        self._pattern = re.compile(f"(?={re.escape(query)})", 0 if match_case else re.IGNORECASE)
+
+        self._lengths: list[int] = [0]  # Length of the text in each bucket
+        self._occurrences: list[list[int]] = [[]]  # Occurrences starting in each bucket, relative to its start
+        self._starts: list[int] | None = None  # Start of each bucket, calculated only when needed after an edit
+
+    def build(self, text: str) -> None:
+        """Finds all the occurrences in the whole 'text'."""
+
+        size = self.BUCKET_SIZE
+        buckets = max(1, -(-len(text) // size))
+        self._lengths = [size] * (buckets - 1) + [len(text) - size * (buckets - 1)]
+        self._occurrences = [[] for _ in range(buckets)]
+        self._starts = None
+
+        for position in self._find(text):
+            self._occurrences[position // size].append(position % size)
+
+        self.built = True
+
+    def apply_changes(self, changes: list[string_changes.Change], text) -> None:
+        """Updates the occurrences after the text was changed by 'changes'. 'text' is the text after the changes,
+        which has a 'slice(start, end)' method, like text_buffer.TextBuffer; only the characters around the changes are
+        read from it."""
+
+        if not self.built or not self.query:
+            return
+
+        reach = len(self.query) - 1  # How far before a position an occurrence containing it can start
+        dirty: list[tuple[int, int]] = []  # Ranges where occurrences may start, which must be searched again
+
+        for position, removed, inserted in string_changes.sequential_edits(changes):
+            inserted = len(inserted)
+            self._edit(position, removed, inserted)
+
+            dirty = [(_move(start, position, removed, inserted, False), _move(end, position, removed, inserted, True))
+                     for start, end in dirty]
+            dirty.append((max(0, position - reach), position + inserted))
+
+        dirty.sort()
+        merged: list[list[int]] = []
+        for start, end in dirty:
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+
+        for start, end in merged:
+            self._remove(start, end)
+            for position in self._find(text.slice(start, end + reach), start):
+                self._insert(position)
+
+    def count(self) -> int:
+        return sum(len(occurrences) for occurrences in self._occurrences)
+
+    def occurrences(self) -> Iterator[int]:
+        """Yields the positions of all the occurrences, in order."""
+
+        for start, occurrences in zip(self._bucket_starts(), self._occurrences):
+            for occurrence in occurrences:
+                yield start + occurrence
+
+    def find_next(self, position: int) -> int | None:
+        """Returns the first occurrence at, or after, 'position', or, if there is none, the first one."""
+
+        starts = self._bucket_starts()
+        bucket = self._locate(position)
+
+        for index in range(bucket, len(starts)):
+            occurrences = self._occurrences[index]
+            found = bisect_left(occurrences, position - starts[index])
+            if found < len(occurrences):
+                return starts[index] + occurrences[found]
+
+        return next(self.occurrences(), None)
+
+    def find_previous(self, position: int) -> int | None:
+        """Returns the last occurrence before 'position', or, if there is none, the last one."""
+
+        starts = self._bucket_starts()
+        bucket = self._locate(position)
+
+        for index in range(bucket, -1, -1):
+            occurrences = self._occurrences[index]
+            found = bisect_left(occurrences, position - starts[index])
+            if found > 0:
+                return starts[index] + occurrences[found - 1]
+
+        for index in range(len(starts) - 1, -1, -1):
+            if self._occurrences[index]:
+                return starts[index] + self._occurrences[index][-1]
+        return None
+
+    def replace_all_changes(self, replacement: str, text: str) -> string_changes.Replacement:
+        """Returns the changes which replace every occurrence in 'text' by 'replacement', as one set of changes, kept
+        compactly, as a string_changes.Replacement. Overlapping occurrences are replaced from the first: an occurrence
+        starting inside one replaced is not."""
+
+        length = len(self.query)
+        positions = array("q")
+        occurrences: list[str] = []  # The occurrences replaced, if the case is ignored, as they may differ
+        end = 0  # The end of the last occurrence replaced
+
+        for position in self.occurrences():
+            if position < end:
+                continue
+
+            positions.append(position)
+            if not self.match_case:
+                occurrences.append(text[position: position + length])
+            end = position + length
+
+        # If the case matches, every occurrence is the query, so they all share its string
+        removed = self.query if self.match_case else "".join(occurrences)
+        return string_changes.Replacement(positions, removed, replacement, length, len(replacement))
+
+    def _find(self, text: str, offset: int = 0) -> Iterator[int]:
+        """Yields the positions of the occurrences in 'text', plus 'offset'."""
+
+        if not self.query:
+            return
+
+        if self.match_case:
+            position = text.find(self.query)
+            while position != -1:
+                yield offset + position
+                position = text.find(self.query, position + 1)
+        else:
+            for match in self._pattern.finditer(text):
+                yield offset + match.start()
+
+    def _edit(self, position: int, removed: int, inserted: int) -> None:
+        """Updates the buckets after 'removed' characters, at 'position', were replaced by 'inserted' ones. The
+        occurrences containing the characters removed, or the position, are removed; the ones after are moved."""
+
+        self._remove(max(0, position - len(self.query) + 1), position + removed)
+
+        first = self._locate(position)
+        last = self._locate(position + removed)
+        if last > first:  # The removed characters span several buckets, which are joined in the first
+            starts = self._bucket_starts()
+            for index in range(first + 1, last + 1):
+                self._occurrences[first] += [starts[index] - starts[first] + occurrence
+                                             for occurrence in self._occurrences[index]]
+                self._lengths[first] += self._lengths[index]
+            del self._occurrences[first + 1: last + 1]
+            del self._lengths[first + 1: last + 1]
+
+        start = self._bucket_starts()[first]
+        occurrences = self._occurrences[first]
+        after = bisect_left(occurrences, position + removed - start)
+        delta = inserted - removed
+        occurrences[after:] = [occurrence + delta for occurrence in occurrences[after:]]
+        self._lengths[first] += delta
+        self._starts = None
+
+        if self._lengths[first] > 2 * self.BUCKET_SIZE:
+            self._split(first)
+        elif self._lengths[first] == 0 and len(self._lengths) > 1:
+            del self._lengths[first]
+            del self._occurrences[first]
+
+    def _split(self, bucket: int) -> None:
+        """Splits the bucket numbered 'bucket' in buckets of 'BUCKET_SIZE' characters."""
+
+        size = self.BUCKET_SIZE
+        length = self._lengths[bucket]
+        occurrences = self._occurrences[bucket]
+
+        lengths = [min(size, length - start) for start in range(0, length, size)]
+        split = [[] for _ in lengths]
+        for occurrence in occurrences:
+            split[occurrence // size].append(occurrence % size)
+
+        self._lengths[bucket: bucket + 1] = lengths
+        self._occurrences[bucket: bucket + 1] = split
+        self._starts = None
+
+    def _remove(self, start: int, end: int) -> None:
+        """Removes the occurrences starting between 'start' and 'end'."""
+
+        if start >= end:
+            return
+
+        starts = self._bucket_starts()
+        for index in range(self._locate(start), self._locate(end - 1) + 1):
+            occurrences = self._occurrences[index]
+            del occurrences[bisect_left(occurrences, start - starts[index]): bisect_left(occurrences,
+                                                                                         end - starts[index])]
+
+    def _insert(self, position: int) -> None:
+        bucket = self._locate(position)
+        insort(self._occurrences[bucket], position - self._bucket_starts()[bucket])
+
+    def _locate(self, position: int) -> int:
+        """Returns the number of the bucket where 'position' is. The end of the text is in the last bucket."""
+
+        return max(0, bisect_right(self._bucket_starts(), position) - 1)
+
+    def _bucket_starts(self) -> list[int]:
+        if self._starts is None:
+            starts = [0] * len(self._lengths)
+            for index in range(1, len(starts)):
+                starts[index] = starts[index - 1] + self._lengths[index - 1]
+            self._starts = starts
+
+        return self._starts
+
+
+def _move(position: int, edit_position: int, removed: int, inserted: int, is_end: bool) -> int:
+    """Returns where 'position' is after 'removed' characters, at 'edit_position', were replaced by 'inserted' ones.
+    A position inside the removed characters goes to the end of the inserted ones, if 'is_end', or to their start."""
+
+    if position <= edit_position:
+        return position
+    if position >= edit_position + removed:
+        return position + inserted - removed
+    return edit_position + inserted if is_end else edit_position
@@ -1,58 +1,635 @@
 """Offers functions and classes to deal with changes of characters between two strings."""
 
+import sys  # For measuring the memory used by the changes
+import time  # For merging changes done close in time
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+from typing import Callable
+
+numpy = None  # Optional, for comparing long strings faster. It is imported by '_load_numpy', only when first needed,
+_numpy_loaded = False  # as importing it takes longer than starting the rest of the application
+
+
+def _load_numpy() -> bool:
+    """Imports NumPy, if it was not yet, and returns whether it is installed."""
+
+    global numpy, _numpy_loaded
+
+    if not _numpy_loaded:
+        try:
+            import numpy as module
+        except ImportError:
+            module = None
+        numpy = module
+        _numpy_loaded = True
+
+    return numpy is not None
+
 
 class Change:
-    """One change of characters between two strings, of insertion or deletion."""
+    """One change of characters between two strings, of insertion or deletion of a run of consecutive characters."""
 
     NEW = 0
     DELETED = 1
 
-    def __init__(self, change_type: NEW | DELETED, index: int, character: str):
-        """If the character is new, then 'index' is its index. If the character has been deleted, then 'index' is
-        its old index."""
+    __slots__ = ("change_type", "index", "text")  # There may be many changes, so they do not have a '__dict__'
+
+    def __init__(self, change_type: NEW | DELETED, index: int, text: str):
+        """If the characters are new, then 'index' is the index of the first of them. If the characters have been
+        deleted, then 'index' is the old index of the first of them."""
 
         self.change_type = change_type
         self.index = index
-        self.character = character
+        self.text = text
+
+
+class Replacement:
+    """The changes which replace runs of characters, all of the same length, by runs all of the same length, as a
+    replace-all does, kept compactly: the indexes of the runs replaced, in the text before, in an array of 'positions',
+    and the texts 'removed' and 'inserted', each either one run, shared by all, or, if they differ, as when the case is
+    ignored, all of them joined. It is a sequence of Change, as the other sets of changes are, its deletions before its
+    insertions; but applying, inverting and measuring it, with the functions of this module, use the compact form, so
+    that, in the history, replacing millions of occurrences costs about 8 bytes each."""
+
+    __slots__ = ("positions", "removed", "inserted", "removed_length", "inserted_length")
+
+    def __init__(self, positions: array, removed: str, inserted: str, removed_length: int, inserted_length: int):
+        """'positions' must be sorted, and the runs must not overlap."""
+
+        self.positions = positions
+        self.removed = removed
+        self.inserted = inserted
+        self.removed_length = removed_length
+        self.inserted_length = inserted_length
+
+    def __len__(self) -> int:
+        return len(self.positions) * (bool(self.removed_length) + bool(self.inserted_length))
+
+    def __getitem__(self, index: int) -> Change:
+        count = len(self.positions)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("change index out of range")
+
+        if self.removed_length and index < count:
+            return Change(Change.DELETED, self.positions[index], self.removed_run(index))
+
+        index -= count if self.removed_length else 0
+        return Change(Change.NEW, self.positions[index] + index * (self.inserted_length - self.removed_length),
+                      self.inserted_run(index))
+
+    def __iter__(self):
+        if self.removed_length:
+            for index, position in enumerate(self.positions):
+                yield Change(Change.DELETED, position, self.removed_run(index))
+
+        if self.inserted_length:
+            shift = self.inserted_length - self.removed_length
+            for index, position in enumerate(self.positions):
+                yield Change(Change.NEW, position + index * shift, self.inserted_run(index))
+
+    def removed_run(self, index: int) -> str:
+        return _run(self.removed, self.removed_length, index)
 
+    def inserted_run(self, index: int) -> str:
+        return _run(self.inserted, self.inserted_length, index)
 
-def get_changes(original: str, changed: str) -> list[Change]:
-    """Returns a list of changes from 'original' to 'changed'.
+    def inverted(self) -> "Replacement":
+        """Returns the replacement which undoes this one."""
+
+        shift = self.inserted_length - self.removed_length
+        positions = array("q", (position + index * shift for index, position in enumerate(self.positions))) \
+            if shift else self.positions
+        return Replacement(positions, self.inserted, self.removed, self.inserted_length, self.removed_length)
+
+    def apply(self, source: str, offset: int = 0) -> str:
+        """Returns 'source', a part of the text before, which starts at the index 'offset' and contains every run
+        replaced, with the runs replaced."""
+
+        removed_length = self.removed_length
+        starts = [position - offset for position in self.positions]
+        # The kept parts of 'source', before, between and after the runs
+        kept = [source[start: end] for start, end in zip([0] + [start + removed_length for start in starts],
+                                                          starts + [len(source)])]
+
+        if len(self.inserted) == self.inserted_length:  # The same run everywhere
+            return self.inserted.join(kept)
+
+        inserted_length = self.inserted_length
+        pieces = [self.inserted[index * inserted_length: (index + 1) * inserted_length] for index in range(len(starts))]
+        pieces.append("")
+        return "".join([piece for pair in zip(kept, pieces) for piece in pair])
+
+    def span(self) -> tuple[int, int]:
+        """Returns the indexes, in the text before, from the start of the first run replaced to the end of the last."""
+
+        if not self.positions:
+            return 0, 0
+        return self.positions[0], self.positions[-1] + self.removed_length
+
+    def size(self) -> int:
+        """Returns about how many bytes of memory the replacement uses."""
+
+        return sys.getsizeof(self) + sys.getsizeof(self.positions) + sys.getsizeof(self.removed) + \
+            sys.getsizeof(self.inserted)
+
+
+def _run(text: str, length: int, index: int) -> str:
+    """Returns the run of 'length' characters numbered 'index' of 'text', which is either one run, shared by all, or all
+    of them joined."""
+
+    if len(text) == length:
+        return text
+    return text[index * length: (index + 1) * length]
+
+
+class DiffCancelled(Exception):
+    """Raised by 'get_changes' when it is cancelled."""
+
+
+def get_changes(original: str, changed: str, cancelled: Callable[[], bool] | None = None,
+                use_numpy: bool | None = None, by_lines: bool = False) -> list[Change]:
+    """Returns a minimal list of changes from 'original' to 'changed'.
         The calculation is the done in the following manner:
-        1. Tries to find the (possibly) deleted character by orderly mapping the character of 'original' on 'changed';
-        if a character could not be mapped, then it is considered deleted. For example, if 'original' = "Batman' and
-        'changed' = "Bye Bat!', then 'B' shall be considered found at index = 0, then 'a' at index = 5, then, lastly,
-        't' at index = 6. The other character shall be considered deleted.
-        2. The characters in 'changed' which are not considered 'found' shall be considered new."""
+        1. The common prefix and the common suffix of both strings are skipped, so that an edit of a few characters
+        costs little more than comparing the unchanged parts.
+        2. What is left is compared with Myers' O(ND) algorithm, in its linear space form, which finds the least
+        number of deleted and new characters that turn 'original' into 'changed'. For example, if 'original' =
+        "Batman" and 'changed' = "Bye Bat!", then "man" shall be considered deleted, and "ye B" and "!" new.
+        Consecutive deleted, or new, characters are returned as one change.
+    If 'by_lines', what is left after the first step is split in lines, which are compared first, as a whole, by
+    '_changed_line_blocks'; only the blocks of lines which differ are then compared by characters, as in the second
+    step. The changes may not be minimal, but are found much faster when the strings have many lines and a few of
+    them change, as when a file is reloaded; they still turn 'original' into 'changed' exactly.
+    If NumPy is installed, and 'use_numpy' is not False, once Myers' algorithm needs 'NUMPY_MIN_EDITS' edits or more
+    in a comparison, it goes on with arrays of the code points of the strings, following all the paths of each number
+    of edits at once; the changes are the same as without NumPy, only found faster.
+    If 'cancelled' is given, it is called, now and then, while comparing, and, if it returns True, DiffCancelled is
+    raised, as when the changes are no longer needed."""
 
-    mapped_indexes: set = set({})  # Indexes of mapped characters of 'original' in 'changed'
-    differences: list[Change] = []
+    comparison = _Comparison(original, changed, cancelled, use_numpy is not False)
 
-    # Finding deleted and kept characters from 'original' in 'changed', that is, mapping 'original' into 'changed'
+    deleted_ranges: list[tuple[int, int]] = []
+    new_ranges: list[tuple[int, int]] = []
+    if by_lines:
+        _diff_lines(comparison, deleted_ranges, new_ranges)
+    else:
+        _diff_ranges(comparison, 0, len(original), 0, len(changed), deleted_ranges, new_ranges)
 
-    start_search_index: int = 0
-    for original_index in range(0, len(original)):
+    differences: list[Change] = [Change(Change.DELETED, start, original[start: end]) for start, end in deleted_ranges]
+    differences += [Change(Change.NEW, start, changed[start: end]) for start, end in new_ranges]
 
-        searched_character = original[original_index]
-        for j in range(0, len(changed[start_search_index:])):
+    return differences
 
-            character_index = j + start_search_index
-            character = changed[character_index]
 
-            if character == searched_character:
-                start_search_index = character_index + 1
-                mapped_indexes.add(character_index)
-                break
+NUMPY_MIN_EDITS = 64  # Edits from which Myers' algorithm follows its paths on arrays, if it can
+_SHORT_SNAKE = 8  # Equal characters compared one by one, in Myers' algorithm, before measuring the rest of the run
+
+
+class _Comparison:
+    """The strings 'a' and 'b' being compared. If 'use_numpy', and NumPy is installed, the arrays of their code points
+    are made once they are first needed, by 'points'. 'cancelled' is as in 'get_changes'."""
+
+    __slots__ = ("a", "b", "cancelled", "use_numpy", "_points")
+
+    def __init__(self, a: str, b: str, cancelled: Callable[[], bool] | None, use_numpy: bool):
+        self.a = a
+        self.b = b
+        self.cancelled = cancelled
+        self.use_numpy = use_numpy
+
+        self._points = None
+
+    def points(self):
+        """Returns the code points of 'a' and of 'b', as NumPy arrays, with one item for each character."""
+
+        if self._points is None:
+            self._points = tuple(numpy.frombuffer(text.encode("utf-32-le", errors="surrogatepass"), dtype=numpy.uint32)
+                                 for text in (self.a, self.b))
+        return self._points
+
+    def prefix_length(self, a_start: int, a_end: int, b_start: int, b_end: int) -> int:
+        """Returns the length of the common prefix of a[a_start:a_end] and b[b_start:b_end]."""
+
+        return _common_prefix_length(self.a, a_start, a_end, self.b, b_start, b_end)
+
+    def suffix_length(self, a_start: int, a_end: int, b_start: int, b_end: int) -> int:
+        """Returns the length of the common suffix of a[a_start:a_end] and b[b_start:b_end]."""
+
+        return _common_suffix_length(self.a, a_start, a_end, self.b, b_start, b_end)
+
+
+def _common_prefix_length(a, a_start: int, a_end: int, b, b_start: int, b_end: int) -> int:
+    """Returns the length of the common prefix of a[a_start:a_end] and b[b_start:b_end]. The slices are compared in
+    windows of growing size, so that long equal stretches are compared by the interpreter, not character by
+    character."""
+
+    limit = min(a_end - a_start, b_end - b_start)
+    length = 0
+    window = 64
+
+    while length < limit:
+        end = min(length + window, limit)
+        if a[a_start + length: a_start + end] != b[b_start + length: b_start + end]:
+            break
+        length = end
+        window *= 2
+    else:
+        return limit
+
+    # The first difference is inside the window [length, end), which is searched by halving
+    low, high = length, end - 1  # The prefix has, at least, 'low' and, at most, 'high' items
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[a_start + low: a_start + middle] == b[b_start + low: b_start + middle]:
+            low = middle
         else:
-            differences.append(Change(Change.DELETED, original_index, searched_character))
+            high = middle - 1
 
-    # Finding new characters in 'changed'
+    return low
 
-    for index in range(0, len(changed)):
-        if index not in mapped_indexes:
-            differences.append(Change(Change.NEW, index, changed[index]))
 
-    return differences
+def _common_suffix_length(a, a_start: int, a_end: int, b, b_start: int, b_end: int) -> int:
+    """Returns the length of the common suffix of a[a_start:a_end] and b[b_start:b_end]."""
+
+    limit = min(a_end - a_start, b_end - b_start)
+    length = 0
+    window = 64
+
+    while length < limit:
+        end = min(length + window, limit)
+        if a[a_end - end: a_end - length] != b[b_end - end: b_end - length]:
+            break
+        length = end
+        window *= 2
+    else:
+        return limit
+
+    low, high = length, end - 1
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[a_end - middle: a_end - low] == b[b_end - middle: b_end - low]:
+            low = middle
+        else:
+            high = middle - 1
+
+    return low
+
+
+def _array_common_prefix_length(a, a_start: int, a_end: int, b, b_start: int, b_end: int) -> int:
+    """As '_common_prefix_length', for NumPy arrays: each window is compared item by item, at once, which also tells
+    where the first difference is. The arrays can be reversed views, to find common suffixes."""
+
+    limit = min(a_end - a_start, b_end - b_start)
+    length = 0
+    window = 64
+
+    while length < limit:
+        end = min(length + window, limit)
+        differences = numpy.flatnonzero(a[a_start + length: a_start + end] != b[b_start + length: b_start + end])
+        if differences.size:
+            return length + int(differences[0])
+        length = end
+        window *= 2
+
+    return limit
+
+
+def _middle_snake(comparison: _Comparison, a_start: int, a_end: int, b_start: int,
+                  b_end: int) -> tuple[int, int, int, int]:
+    """Finds the middle snake of Myers' algorithm, that is, the stretch of equal items in the middle of a shortest
+    edit path from a[a_start:a_end] to b[b_start:b_end]. Returns its start and end, relative to 'a_start' and
+    'b_start', as (x_start, y_start, x_end, y_end). Both ranges must not be empty nor have common prefix or suffix.
+    The first '_SHORT_SNAKE' equal items of a snake are compared one by one, as most snakes are short; the rest of a
+    longer one is measured at once."""
+
+    a, b, cancelled = comparison.a, comparison.b, comparison.cancelled
+
+    n = a_end - a_start
+    m = b_end - b_start
+    delta = n - m
+    odd = delta % 2 == 1
+    max_d = (n + m + 1) // 2
+
+    offset = max_d + 1
+    forward = [0] * (2 * max_d + 3)  # The furthest x reached on each diagonal, from the start
+    backward = [0] * (2 * max_d + 3)  # The furthest x reached on each diagonal, from the end
+
+    for d in range(0, max_d + 1):
+        if cancelled is not None and cancelled():
+            raise DiffCancelled
+        if d == NUMPY_MIN_EDITS and comparison.use_numpy and _load_numpy():
+            return _array_middle_snake(comparison, a_start, a_end, b_start, b_end, forward, backward, d)
+
+        # Forward paths
+
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and forward[offset + k - 1] < forward[offset + k + 1]):
+                x = forward[offset + k + 1]
+            else:
+                x = forward[offset + k - 1] + 1
+            y = x - k
+
+            x_start, y_start = x, y
+            while x < n and y < m and a[a_start + x] == b[b_start + y]:
+                x += 1
+                y += 1
+                if x - x_start == _SHORT_SNAKE:
+                    run = comparison.prefix_length(a_start + x, a_end, b_start + y, b_end)
+                    x += run
+                    y += run
+                    break
+            forward[offset + k] = x
+
+            if odd and -(d - 1) <= delta - k <= d - 1 and x + backward[offset + delta - k] >= n:
+                return x_start, y_start, x, y
+
+        # Backward paths, on the reversed ranges
+
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and backward[offset + k - 1] < backward[offset + k + 1]):
+                x = backward[offset + k + 1]
+            else:
+                x = backward[offset + k - 1] + 1
+            y = x - k
+
+            x_start, y_start = x, y
+            while x < n and y < m and a[a_end - 1 - x] == b[b_end - 1 - y]:
+                x += 1
+                y += 1
+                if x - x_start == _SHORT_SNAKE:
+                    run = comparison.suffix_length(a_start, a_end - x, b_start, b_end - y)
+                    x += run
+                    y += run
+                    break
+            backward[offset + k] = x
+
+            if not odd and -d <= delta - k <= d and x + forward[offset + delta - k] >= n:
+                return n - x, m - y, n - x_start, m - y_start
+
+    raise AssertionError("Myers' algorithm did not find the middle snake")  # Unreachable
+
+
+def _array_middle_snake(comparison: _Comparison, a_start: int, a_end: int, b_start: int, b_end: int,
+                        forward: list[int], backward: list[int], first_d: int) -> tuple[int, int, int, int]:
+    """Goes on with '_middle_snake', from the paths of 'first_d' edits, on the arrays of code points: for each number
+    of edits 'd', the furthest paths of all the diagonals are found at once, and then their snakes followed together,
+    so the work of the interpreter depends on 'd', not on the number of diagonals. 'forward' and 'backward' are the
+    furthest paths found so far. The paths, and thus the middle snake, are the same as '_middle_snake''s."""
+
+    a_points, b_points = comparison.points()
+    a = a_points[a_start: a_end]
+    b = b_points[b_start: b_end]
+    a_reversed = a[::-1]  # The backward paths are followed as forward ones on the reversed ranges
+    b_reversed = b[::-1]
+    cancelled = comparison.cancelled
+
+    n = a_end - a_start
+    m = b_end - b_start
+    delta = n - m
+    odd = delta % 2 == 1
+    max_d = (n + m + 1) // 2
+
+    offset = max_d + 1
+    reached = slice(offset - first_d, offset + first_d + 1)  # The diagonals reached so far
+    forward_paths, backward_paths = forward, backward
+    forward = numpy.zeros(len(forward_paths), dtype=numpy.int64)
+    backward = numpy.zeros(len(backward_paths), dtype=numpy.int64)
+    forward[reached] = forward_paths[reached]
+    backward[reached] = backward_paths[reached]
+    last_diagonal = len(forward) - 1
+
+    for d in range(first_d, max_d + 1):
+        if cancelled is not None and cancelled():
+            raise DiffCancelled
+
+        diagonals = numpy.arange(-d, d + 1, 2)
+        # The other diagonals, each path meets, of the paths of the other direction
+        other_diagonals = numpy.clip(offset + delta - diagonals, 0, last_diagonal)
+
+        # Forward paths
+
+        x_starts = _array_furthest_paths(forward, diagonals, offset, d)
+        x = _array_follow_snakes(a, b, x_starts.copy(), diagonals, n, m)
+        forward[offset - d: offset + d + 1: 2] = x
+
+        if odd:
+            meet = ((numpy.abs(delta - diagonals) <= d - 1) & (x + backward[other_diagonals] >= n)).nonzero()[0]
+            if meet.size:
+                index = meet[0]
+                k = int(diagonals[index])
+                return int(x_starts[index]), int(x_starts[index]) - k, int(x[index]), int(x[index]) - k
+
+        # Backward paths, on the reversed ranges
+
+        x_starts = _array_furthest_paths(backward, diagonals, offset, d)
+        x = _array_follow_snakes(a_reversed, b_reversed, x_starts.copy(), diagonals, n, m)
+        backward[offset - d: offset + d + 1: 2] = x
+
+        if not odd:
+            meet = ((numpy.abs(delta - diagonals) <= d) & (x + forward[other_diagonals] >= n)).nonzero()[0]
+            if meet.size:
+                index = meet[0]
+                k = int(diagonals[index])
+                x_start, x_end = int(x_starts[index]), int(x[index])
+                return n - x_end, m - (x_end - k), n - x_start, m - (x_start - k)
+
+    raise AssertionError("Myers' algorithm did not find the middle snake")  # Unreachable
+
+
+def _array_furthest_paths(furthest, diagonals, offset: int, d: int):
+    """Returns, for each of the 'diagonals' of 'd' edits, where its furthest path starts: one edit further than a
+    furthest path of 'd' - 1 edits, in 'furthest', as in '_middle_snake'."""
+
+    from_above = furthest[offset + diagonals + 1]  # A new item in 'b'
+    from_left = furthest[offset + diagonals - 1] + 1  # A deleted item of 'a'
+
+    use_above = from_left <= from_above  # As 'from_left' - 1 < 'from_above'
+    use_above[0] = True  # The first diagonal can only be reached from above,
+    use_above[-1] = d == 0  # and the last, from the left, unless it is the only one
+
+    return numpy.where(use_above, from_above, from_left)
+
+
+def _array_follow_snakes(a, b, x, diagonals, n: int, m: int):
+    """Follows the snakes, from the points of 'x' on 'diagonals', through the equal items of 'a' and 'b', and
+    returns where they end. The first '_SHORT_SNAKE' items are compared for all the snakes at once; the few longer
+    snakes are then measured one by one."""
+
+    y = x - diagonals
+    following = ((x < n) & (y < m)).nonzero()[0]
+
+    for _ in range(_SHORT_SNAKE):
+        if not following.size:
+            return x
+
+        following = following[a[x[following]] == b[y[following]]]
+        x[following] += 1
+        y[following] += 1
+        following = following[(x[following] < n) & (y[following] < m)]
+
+    for index in following.tolist():
+        x[index] += _array_common_prefix_length(a, int(x[index]), n, b, int(y[index]), m)
+
+    return x
+
+
+def _diff_ranges(comparison: _Comparison, a_start: int, a_end: int, b_start: int, b_end: int,
+                 deleted_ranges: list[tuple[int, int]], new_ranges: list[tuple[int, int]]) -> None:
+    """Appends, in order, to 'deleted_ranges' the ranges of a[a_start:a_end] which are deleted, and to 'new_ranges'
+    the ranges of b[b_start:b_end] which are new, in a shortest edit script. Adjacent ranges are joined."""
+
+    prefix = comparison.prefix_length(a_start, a_end, b_start, b_end)
+    a_start += prefix
+    b_start += prefix
+
+    suffix = comparison.suffix_length(a_start, a_end, b_start, b_end)
+    a_end -= suffix
+    b_end -= suffix
+
+    if a_start == a_end:
+        if b_start < b_end:
+            _append_range(new_ranges, b_start, b_end)
+        return
+    if b_start == b_end:
+        _append_range(deleted_ranges, a_start, a_end)
+        return
+
+    x_start, y_start, x_end, y_end = _middle_snake(comparison, a_start, a_end, b_start, b_end)
+
+    _diff_ranges(comparison, a_start, a_start + x_start, b_start, b_start + y_start, deleted_ranges, new_ranges)
+    _diff_ranges(comparison, a_start + x_end, a_end, b_start + y_end, b_end, deleted_ranges, new_ranges)
+
+
+def _diff_lines(comparison: _Comparison, deleted_ranges: list[tuple[int, int]],
+                new_ranges: list[tuple[int, int]]) -> None:
+    """As '_diff_ranges', for the whole strings, but comparing by characters only the blocks of lines which differ.
+    Each line is given a number, the same for equal lines, so that lines are compared as numbers."""
+
+    a, b = comparison.a, comparison.b
+
+    prefix = comparison.prefix_length(0, len(a), 0, len(b))
+    suffix = comparison.suffix_length(prefix, len(a), prefix, len(b))
+    a_lines = a[prefix: len(a) - suffix].splitlines(keepends=True)
+    b_lines = b[prefix: len(b) - suffix].splitlines(keepends=True)
+
+    line_numbers: dict[str, int] = {}
+    a_numbers = [line_numbers.setdefault(line, len(line_numbers)) for line in a_lines]
+    b_numbers = [line_numbers.setdefault(line, len(line_numbers)) for line in b_lines]
+
+    # The index of the start of each line, and of the end of the last one
+    a_starts = list(accumulate(map(len, a_lines), initial=prefix))
+    b_starts = list(accumulate(map(len, b_lines), initial=prefix))
+
+    for a_first, a_last, b_first, b_last in _changed_line_blocks(a_numbers, b_numbers, comparison.cancelled):
+        _diff_ranges(comparison, a_starts[a_first], a_starts[a_last], b_starts[b_first], b_starts[b_last],
+                     deleted_ranges, new_ranges)
+
+
+def _changed_line_blocks(a: list[int], b: list[int],
+                         cancelled: Callable[[], bool] | None = None) -> list[tuple[int, int, int, int]]:
+    """Returns, in order, the blocks of lines, as (a_start, a_end, b_start, b_end), which differ between the lines
+    'a' and 'b', by patience diff: after skipping their common first and last lines, the lines found once in each of
+    them are matched, as many as keep the same order in both, and the ranges between the matched lines are compared
+    in the same way. A range with no such lines is a block, whose lines are left to be compared by characters."""
+
+    blocks: list[tuple[int, int, int, int]] = []
+    ranges = [(0, len(a), 0, len(b))]  # The ranges left to compare, with the last one first
+
+    while ranges:
+        if cancelled is not None and cancelled():
+            raise DiffCancelled
+
+        a_start, a_end, b_start, b_end = ranges.pop()
+
+        while a_start < a_end and b_start < b_end and a[a_start] == b[b_start]:
+            a_start += 1
+            b_start += 1
+        while a_start < a_end and b_start < b_end and a[a_end - 1] == b[b_end - 1]:
+            a_end -= 1
+            b_end -= 1
+
+        if a_start == a_end and b_start == b_end:
+            continue
+
+        matches = _unique_matches(a, a_start, a_end, b, b_start, b_end)
+        if not matches:
+            blocks.append((a_start, a_end, b_start, b_end))
+            continue
+
+        between: list[tuple[int, int, int, int]] = []
+        for a_line, b_line in matches:
+            between.append((a_start, a_line, b_start, b_line))
+            a_start, b_start = a_line + 1, b_line + 1
+        between.append((a_start, a_end, b_start, b_end))
+
+        ranges += reversed(between)
+
+    return blocks
+
+
+def _unique_matches(a: list[int], a_start: int, a_end: int, b: list[int], b_start: int,
+                    b_end: int) -> list[tuple[int, int]]:
+    """Returns, in order, the pairs of indexes of equal lines, (a_line, b_line), which are found once in
+    a[a_start:a_end] and once in b[b_start:b_end], the most of them that keep the same order in both. They are found
+    by patience sorting, that is, the longest increasing subsequence of the 'b_line's, in the order of 'a'."""
+
+    a_unique = _unique_lines(a, a_start, a_end)
+    b_unique = _unique_lines(b, b_start, b_end)
+    candidates = [(a_line, b_unique[line]) for line, a_line in a_unique.items() if line in b_unique]
+
+    # Each pile keeps, at its top, the candidate with the least 'b_line' ending an increasing subsequence of its length
+    pile_tops: list[int] = []  # The 'b_line' of the top of each pile
+    top_candidates: list[int] = []  # The index of the top of each pile, in 'candidates'
+    previous = [-1] * len(candidates)  # The candidate before each one, in the subsequence it ends
+
+    for index, (_, b_line) in enumerate(candidates):
+        pile = bisect_left(pile_tops, b_line)
+        if pile == len(pile_tops):
+            pile_tops.append(b_line)
+            top_candidates.append(index)
+        else:
+            pile_tops[pile] = b_line
+            top_candidates[pile] = index
+        if pile > 0:
+            previous[index] = top_candidates[pile - 1]
+
+    matches: list[tuple[int, int]] = []
+    index = top_candidates[-1] if top_candidates else -1
+    while index != -1:
+        matches.append(candidates[index])
+        index = previous[index]
+    matches.reverse()
+
+    return matches
+
+
+def _unique_lines(lines: list[int], start: int, end: int) -> dict[int, int]:
+    """Returns the lines found once in lines[start:end], mapped to their indexes, in order."""
+
+    indexes: dict[int, int] = {}
+    repeated: set[int] = set()
+
+    for index in range(start, end):
+        line = lines[index]
+        if line in indexes:
+            repeated.add(line)
+        else:
+            indexes[line] = index
+
+    for line in repeated:
+        del indexes[line]
+
+    return indexes
+
+
+def _append_range(ranges: list[tuple[int, int]], start: int, end: int) -> None:
+    if ranges and ranges[-1][1] == start:
+        ranges[-1] = (ranges[-1][0], end)
+    else:
+        ranges.append((start, end))
 
 # Of changes
 
@@ -60,117 +637,745 @@ def get_changes(original: str, changed: str) -> list[Change]:
 def remake_str(changed: str, changes: list[Change]) -> str:
     """Returns how the string 'changed' would have been if the changes in 'changes' had been applied to it."""
 
-    # Filtering
-    deletion_indexes: set[int] = set({})
-    new_char_changes: list[Change] = []
+    return _apply_changes(changed, changes, Change.NEW, Change.DELETED)
+
+
+def change_str(original: str, changes: list[Change]) -> str:
+    """Applies the changes in 'changes' to 'original'."""
+
+    return _apply_changes(original, changes, Change.DELETED, Change.NEW)
+
+
+def _apply_changes(source: str, changes: list[Change], removed_type: int, inserted_type: int) -> str:
+    """Removes from 'source' the changes of type 'removed_type', whose indexes are of 'source', and inserts the
+    changes of type 'inserted_type', whose indexes are of the result. The result is built once, from a list of
+    pieces, so the cost is linear on the length of 'source' and of the changes."""
+
+    if isinstance(changes, Replacement):
+        return (changes if removed_type == Change.DELETED else changes.inverted()).apply(source)
+
+    def change_key(_change: Change) -> int: return _change.index
+
+    removed = sorted((change for change in changes if change.change_type == removed_type), key=change_key)
+    inserted = sorted((change for change in changes if change.change_type == inserted_type), key=change_key)
+
+    pieces: list[str] = []
+    source_index = 0  # Index, in 'source', of the next character to be copied
+    result_length = 0
+    removed_index = 0  # Index, in 'removed', of the next change to be skipped
+
+    def copy(count: int) -> None:
+        """Copies 'count' kept characters of 'source' to the result. If 'count' is -1, copies all that are left."""
+
+        nonlocal source_index, result_length, removed_index
+
+        while count != 0:
+            # Skips the removed characters at the current index
+            while removed_index < len(removed) and removed[removed_index].index <= source_index:
+                change = removed[removed_index]
+                source_index = max(source_index, change.index + len(change.text))
+                removed_index += 1
+
+            if removed_index < len(removed):
+                end = removed[removed_index].index
+            else:
+                end = len(source)
+            if count != -1:
+                end = min(end, source_index + count)
+
+            if end <= source_index:
+                break
+
+            pieces.append(source[source_index: end])
+            result_length += end - source_index
+            if count != -1:
+                count -= end - source_index
+            source_index = end
 
-    for change in changes:
+    for change in inserted:
+        copy(change.index - result_length)
+        pieces.append(change.text)
+        result_length += len(change.text)
+
+    copy(-1)
+
+    return "".join(pieces)
+
+
+def change_buffer(buffer, changes: list[Change]) -> None:
+    """Applies the changes in 'changes' to 'buffer', a text which has a 'replace(start, end, text)' method, like
+    text_buffer.TextBuffer, one run at a time. A Replacement is applied at once, to the span of the runs it replaces."""
+
+    if isinstance(changes, Replacement):
+        start, end = changes.span()
+        buffer.replace(start, end, changes.apply(buffer.slice(start, end), start))
+        return
+
+    if len(changes) == 1:  # As when typing
+        change = changes[0]
         if change.change_type == Change.NEW:
-            deletion_indexes.add(change.index)
+            buffer.replace(change.index, change.index, change.text)
         else:
-            new_char_changes.append(change)
+            buffer.replace(change.index, change.index + len(change.text), "")
+        return
 
-    # Deletion of new characters
+    def change_key(_change: Change) -> int: return _change.index
 
-    deletions_made = 0
-    ch_index = 0
-    while ch_index < len(changed):
-        del_index = ch_index + deletions_made
-        if del_index in deletion_indexes:
+    deleted = sorted((change for change in changes if change.change_type == Change.DELETED), key=change_key)
+    new = sorted((change for change in changes if change.change_type == Change.NEW), key=change_key)
+
+    for change in reversed(deleted):  # From the last, so that the indexes of the others are kept
+        buffer.replace(change.index, change.index + len(change.text), "")
+
+    for change in new:
+        buffer.replace(change.index, change.index, change.text)
 
-            changed = changed[: ch_index] + changed[ch_index + 1:]
-            deletions_made += 1
-            deletion_indexes.remove(del_index)
-        else:
-            ch_index += 1
 
-    # Insertion of deleted characters
+def invert_changes(changes: list[Change]) -> list[Change]:
+    """Returns the changes which undo the changes in 'changes'."""
+
+    if isinstance(changes, Replacement):
+        return changes.inverted()
+
+    return [Change(Change.NEW if change.change_type == Change.DELETED else Change.DELETED, change.index, change.text)
+            for change in changes]
+
+
+def sequential_edits(changes: list[Change]) -> list[tuple[int, int, str]]:
+    """Returns the edits, as (position, removed, text), which, done in order, do the same as the changes in 'changes':
+    at 'position', 'removed' characters are removed, and 'text' is inserted. As the deleted characters are indexed in
+    the text before the changes, and the new ones in the text after, the deletions are done from the last one, and
+    then the insertions from the first one."""
 
     def change_key(_change: Change) -> int: return _change.index
 
-    new_char_changes = sorted(new_char_changes, key=change_key)
+    deletions = sorted((change for change in changes if change.change_type == Change.DELETED), key=change_key,
+                       reverse=True)
+    insertions = sorted((change for change in changes if change.change_type == Change.NEW), key=change_key)
 
-    for change in new_char_changes:
-        changed = changed[: change.index] + change.character + changed[change.index:]
+    edits = [(change.index, len(change.text), "") for change in deletions]
+    edits += [(change.index, 0, change.text) for change in insertions]
+    return edits
 
-    return changed
 
+def changes_size(changes: list[Change]) -> int:
+    """Returns about how many bytes of memory the changes in 'changes' use."""
+
+    if isinstance(changes, Replacement):
+        return changes.size()
+
+    return sys.getsizeof(changes) + len(changes) * _CHANGE_SIZE + sum(sys.getsizeof(change.text) for change in changes)
+
+
+_CHANGE_SIZE = sys.getsizeof(Change(Change.NEW, 0, ""))  # Without its text
 
-def change_str(original: str, changes: list[Change]) -> str:
-    """Applies the changes in 'changes' to 'original'."""
 
-    # Filtering
+def compose_changes(first: list[Change], second: list[Change]) -> list[Change]:
+    """Returns the changes which have the same effect as applying the changes in 'first' and, afterwards, the ones in
+    'second'. The cost is linear on the number of changes, not on the length of the strings."""
 
-    deletion_indexes: set[int] = set({})
-    new_char_changes: list[Change] = []
+    first_operations = _to_operations(first)
+    second_operations = _to_operations(second)
+    operations: list[list] = []
 
-    for change in changes:
-        if change.change_type == Change.DELETED:
-            deletion_indexes.add(change.index)
+    first_index = second_index = 0
+    first_operation = first_operations[0][:] if first_operations else None
+    second_operation = second_operations[0][:] if second_operations else None
+
+    while first_operation or second_operation:
+
+        if first_operation and first_operation[0] == _DELETE:  # Deleted by 'first', so unknown to 'second'
+            _push_operation(operations, _DELETE, first_operation[1])
+            first_operation = None
+        elif second_operation and second_operation[0] == _INSERT:  # Inserted by 'second', so unknown to 'first'
+            _push_operation(operations, _INSERT, second_operation[1])
+            second_operation = None
+        elif not first_operation:  # After the last operation, the strings are kept
+            _push_operation(operations, *second_operation)
+            second_operation = None
+        elif not second_operation:
+            _push_operation(operations, *first_operation)
+            first_operation = None
         else:
-            new_char_changes.append(change)
+            # The first is a kept or an inserted stretch, and the second is a kept or a deleted one, of the same text
+            first_length = _operation_length(first_operation)
+            second_length = _operation_length(second_operation)
+            length = min(first_length, second_length)
+
+            if first_operation[0] == _RETAIN and second_operation[0] == _RETAIN:
+                _push_operation(operations, _RETAIN, length)
+            elif first_operation[0] == _INSERT and second_operation[0] == _RETAIN:
+                _push_operation(operations, _INSERT, first_operation[1][:length])
+            elif first_operation[0] == _RETAIN and second_operation[0] == _DELETE:
+                _push_operation(operations, _DELETE, second_operation[1][:length])
+            # An insertion which is deleted afterwards is not kept
+
+            first_operation = _consume_operation(first_operation, length)
+            second_operation = _consume_operation(second_operation, length)
+
+        if not first_operation:
+            first_index += 1
+            first_operation = first_operations[first_index][:] if first_index < len(first_operations) else None
+        if not second_operation:
+            second_index += 1
+            second_operation = second_operations[second_index][:] if second_index < len(second_operations) else None
 
-    # Deletion of characters to be deleted
+    return _from_operations(operations)
 
-    made_deletions: int = 0
-    ch_index = 0
-    while ch_index < len(original):
-        del_index = ch_index + made_deletions
 
-        if del_index in deletion_indexes:
-            original = original[: ch_index] + original[ch_index + 1:]
-            made_deletions += 1
+# The changes are composed as a sequence of operations, which are lists of [kind, number of kept characters or text]
+
+_RETAIN = 0
+_DELETE = 1
+_INSERT = 2
+
+
+def _to_operations(changes: list[Change]) -> list[list]:
+    """Returns the changes in 'changes' as a sequence of operations, from the start of the string. The characters after
+    the last operation are kept."""
+
+    def change_key(_change: Change) -> int: return _change.index
+
+    deleted = sorted((change for change in changes if change.change_type == Change.DELETED), key=change_key)
+    new = sorted((change for change in changes if change.change_type == Change.NEW), key=change_key)
+
+    operations: list[list] = []
+    original_index = changed_index = 0
+    deleted_index = new_index = 0
+
+    while deleted_index < len(deleted) or new_index < len(new):
+        kept = min(deleted[deleted_index].index - original_index if deleted_index < len(deleted) else float("inf"),
+                   new[new_index].index - changed_index if new_index < len(new) else float("inf"))
+        if kept > 0:
+            _push_operation(operations, _RETAIN, kept)
+            original_index += kept
+            changed_index += kept
+
+        if deleted_index < len(deleted) and deleted[deleted_index].index == original_index:
+            _push_operation(operations, _DELETE, deleted[deleted_index].text)
+            original_index += len(deleted[deleted_index].text)
+            deleted_index += 1
+        elif new_index < len(new) and new[new_index].index == changed_index:
+            _push_operation(operations, _INSERT, new[new_index].text)
+            changed_index += len(new[new_index].text)
+            new_index += 1
+
+    return operations
+
+
+def _from_operations(operations: list[list]) -> list[Change]:
+    deleted: list[Change] = []
+    new: list[Change] = []
+    original_index = changed_index = 0
+
+    for kind, value in operations:
+        if kind == _RETAIN:
+            original_index += value
+            changed_index += value
+        elif kind == _DELETE:
+            deleted.append(Change(Change.DELETED, original_index, value))
+            original_index += len(value)
         else:
-            ch_index += 1
+            new.append(Change(Change.NEW, changed_index, value))
+            changed_index += len(value)
+
+    return deleted + new
+
 
-    # Insertion of characters to be inserted
+def _push_operation(operations: list[list], kind: int, value) -> None:
+    """Appends an operation to 'operations', joining it to the last one, if they are of the same kind."""
 
-    def change_key(_change: Change): return _change.index
+    if not value:
+        return
 
-    sorted(new_char_changes, key=change_key)
+    if operations and operations[-1][0] == kind:
+        operations[-1][1] += value
+    elif kind == _DELETE and operations and operations[-1][0] == _INSERT:
+        # A deletion and an insertion at the same place can be in any order, so deletions are kept first, which joins
+        # consecutive deletions which would, otherwise, be separated by an insertion
+        inserted = operations.pop()
+        _push_operation(operations, _DELETE, value)
+        operations.append(inserted)
+    else:
+        operations.append([kind, value])
 
-    for change in new_char_changes:
-        original = original[: change.index] + change.character + original[change.index:]
 
-    return original
+def _operation_length(operation: list) -> int:
+    return operation[1] if operation[0] == _RETAIN else len(operation[1])
+
+
+def _consume_operation(operation: list, length: int) -> list | None:
+    """Returns what is left of 'operation' after its first 'length' characters, or None, if nothing is left."""
+
+    if _operation_length(operation) == length:
+        return None
+
+    if operation[0] == _RETAIN:
+        return [_RETAIN, operation[1] - length]
+    return [operation[0], operation[1][length:]]
 
 
 # Of lists of changes
 
+class ChangesNode:
+    """One set of changes in a ChangesList, with the set of changes it was done after, its parent, and the ones done
+    after it, its children. The text after it is the text after its parent with its changes applied."""
+
+    __slots__ = ("number", "changes", "parent", "children", "last_child", "size", "checkpoint",
+                 "checkpoint_distance", "checkpoint_debt")
+
+    def __init__(self, number: int, changes: list[Change], parent: "ChangesNode | None"):
+        self.number = number  # Unique, and greater for newer sets of changes
+        self.changes = changes
+        self.parent = parent
+        self.children: list[ChangesNode] = []
+        self.last_child: ChangesNode | None = None  # The child which is redone, the last one visited
+
+        self.size: int = sys.getsizeof(self) + changes_size(changes)  # Bytes of memory used, without the checkpoint
+        self.checkpoint: str | None = None  # The text after the changes, if it has been kept
+        self.checkpoint_distance: int = 0  # Number of sets of changes after the closest checkpoint before
+        self.checkpoint_debt: int = 0  # Bytes of changes after the closest checkpoint before
+
+
 class ChangesList:
-    """It is a linear set of changes with a pointer to the last set of changes. Its linearity makes a tree of changes
-    impossible, then, if the last set of changes is not the last set of changes and a new set of changes is added to the
-    list, all the sets of changes after the last set of changes shall be deleted."""
+    """It is a tree of sets of changes with a pointer to the last set of changes applied. Each set of changes is a
+    ChangesNode, and the sets done after the same one are its children, so that, if a set of changes is added after
+    undoing, the undone sets are kept in another branch, which shares all the sets before it. Redoing follows the
+    branch last visited. The root is the state before any changes.
+    Consecutive typing is merged into one set of changes, so that it is undone at once. A set of changes is merged into
+    the last one if it inserts or deletes only one character and, if enabled: it is added less than 'merge_interval'
+    seconds after the last one; it is next to the last one ('merge_contiguous'); and it does not start a new word
+    ('merge_words').
+    The memory used can be limited by 'max_bytes' and 'max_entries'. When a limit is exceeded, the oldest sets of
+    changes which are not needed to reach the current state are forgotten; if the oldest state is, then the set after
+    it becomes the oldest state, which cannot be undone. The last set of changes applied is never forgotten, even if it
+    alone exceeds the limits, so that it can always be undone.
+    Copies of the whole text, checkpoints, are kept every 'checkpoint_interval' sets of changes, or every
+    'checkpoint_bytes' bytes of changes, so that going to a far state costs, at most, loading one checkpoint and
+    applying about 'checkpoint_interval' sets of changes. They use, at most, 'max_checkpoint_bytes', or a quarter of
+    'max_bytes', within it: the oldest are forgotten first, and a text too long is not copied at all. When 'max_bytes'
+    is exceeded, the oldest sets of changes are forgotten first, with their checkpoints, so the ones kept are kept
+    within their share; the others are only forgotten, from the oldest, if no set of changes can be."""
 
-    def __init__(self, list_changes: list[list[Change]] = None):
-        if not list_changes:
-            self.changes: list[list[Change]] = []
-        else:
-            self.changes: list[list[Change]] = list_changes
+    def __init__(self, list_changes: list[list[Change]] = None, merge_interval: float = 1.0,
+                 merge_contiguous: bool = True, merge_words: bool = True, max_bytes: int | None = None,
+                 max_entries: int | None = None, checkpoint_interval: int | None = None,
+                 checkpoint_bytes: int | None = None, max_checkpoint_bytes: int | None = None):
+        self.root = ChangesNode(0, [], None)
+        self.current = self.root  # The node of the last set of changes applied
+        self.nodes: dict[int, ChangesNode] = {0: self.root}  # By number, from the oldest
+        self._next_number = 1
 
-        self.last_changes_index = len(self.changes) - 1  # It can be negative (-1), which would mean there are no
-        # last changes
+        self.journal = None  # If not None, it is told of every change to the tree, like journal.Journal
 
-    def get_last_change(self) -> list[Change]:
-        if self.last_changes_index < len(self.changes):
-            return self.changes[self.last_changes_index]
+        # Merging settings. An interval of 0 disables merging.
+        self.merge_interval = merge_interval
+        self.merge_contiguous = merge_contiguous
+        self.merge_words = merge_words
 
-        return []
+        # State of the last set of changes, for merging. While it is None, nothing can be merged into it.
+        self._merge_time: float = 0  # When the last changes were added or merged
+        self._merge_position: int | None = None  # Where the next typed character would be, after the last changes
+        self._merge_character: str = ""  # The last character typed
+
+        # Memory limits. None means no limit.
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.memory_usage: int = self.root.size  # Bytes used by all the sets of changes, and the checkpoints
+
+        # Checkpoints settings. None means never.
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoint_bytes = checkpoint_bytes
+        self.max_checkpoint_bytes = max_checkpoint_bytes if max_checkpoint_bytes is not None or max_bytes is None \
+            else max_bytes // 4
+        self.checkpoints_usage: int = 0  # Bytes used by the checkpoints, within 'memory_usage'
+
+        for changes in list_changes or []:
+            self._add_node(changes)
+
+    def get_last_change(self) -> list[Change]:
+        return self.current.changes
 
     def get_next_change(self) -> list[Change]:
-        if self.last_changes_index + 1 < len(self.changes):
-            return self.changes[self.last_changes_index + 1]
+        if self.current.last_child is not None:
+            return self.current.last_child.changes
 
         return []
 
-    def add_changes(self, changes: list[Change]) -> None:
-        del self.changes[self.last_changes_index + 1:]  # Deletes all the sets of changes after the last set of changes
-        self.changes.append(changes)
+    def add_changes(self, changes: list[Change], text=None) -> None:
+        """Adds 'changes' after the last set of changes, or merges it into the last one. 'text' is the current text,
+        after 'changes', which has a length and a 'text()' method, like text_buffer.TextBuffer; it is only copied if a
+        checkpoint is due, and the text fits within the limits of the checkpoints."""
+
+        now = time.monotonic()
+
+        if self._can_merge(changes, now):
+            node = self.current
+            merged = compose_changes(node.changes, changes)
+
+            if merged:
+                self.memory_usage -= node.size
+                node.changes = merged
+                node.size = sys.getsizeof(node) + changes_size(merged)
+                node.checkpoint_debt += changes_size(changes)
+                self.memory_usage += node.size
+                self._merge_time = now
+                self._update_merge_state(changes)
 
-        self.last_changes_index += 1
+                if self.journal is not None:
+                    self.journal.record_changes(node)
+            else:  # The typed characters were all deleted
+                self.current = node.parent
+                self._delete_node(node)
+                self._merge_position = None  # The set of changes before may have been closed
+
+                if self.journal is not None:
+                    self.journal.record_deletion(node)
+        else:
+            if text is not None and self._checkpoint_due(self.current):
+                # The text before 'changes' will not change anymore, as nothing more is merged into the last set. Its
+                # length, about the current one, is checked before it is copied, as copying a long text to forget it
+                # would be wasted.
+                if self._checkpoint_fits(len(text)):
+                    self._add_checkpoint(self.current, remake_str(text.text(), changes))
+                else:
+                    self._skip_checkpoint(self.current)
+
+            self._add_node(changes)
+
+            if self.journal is not None:
+                self.journal.record_node(self.current)
+
+            self._merge_time = now
+            self._update_merge_state(changes)
+
+        self._keep_limits()
+
+    def close_changes(self) -> None:
+        """Prevents the next changes from being merged into the last ones."""
+
+        self._merge_position = None
 
     def rollback_changes(self, times: int = 1) -> None:
-        self.last_changes_index = max(self.last_changes_index - times, -1)
+        self.close_changes()
+        for _ in range(times):
+            if self.current.parent is None:
+                break
+            self.current = self.current.parent
+
+        if self.journal is not None:
+            self.journal.record_current(self.current)
 
     def roll_forward_changes(self, times: int = 1) -> None:
-        self.last_changes_index = min(self.last_changes_index + times, len(self.changes) - 1)
+        self.close_changes()
+        for _ in range(times):
+            if self.current.last_child is None:
+                break
+            self.current = self.current.last_child
+
+        if self.journal is not None:
+            self.journal.record_current(self.current)
+
+    def get_branches(self) -> list[int]:
+        """Returns the numbers of the sets of changes done after the same set as the last one, including itself, from
+        the oldest."""
+
+        if self.current.parent is None:
+            return [self.current.number]
+
+        return [node.number for node in self.current.parent.children]
+
+    def jump_changes(self, number: int) -> tuple[str | None, list[Change]]:
+        """Moves the pointer to the set of changes numbered 'number', in any branch, and returns how to change the
+        current text into the text there: a checkpoint to be loaded first, or None, and the changes to be applied
+        afterwards. Afterwards, redoing follows the branch of that set of changes."""
+
+        target = self.nodes[number]
+        undone, redone = self.get_path(self.current.number, number)
+
+        # The path from the closest checkpoint before the target, if shorter
+        checkpoint_text = None
+        checkpoint_redone: list[ChangesNode] = []
+        node = target
+        while node is not None and len(checkpoint_redone) < len(undone) + len(redone):
+            if node.checkpoint is not None:
+                checkpoint_text = node.checkpoint
+                undone, redone = [], checkpoint_redone
+                break
+            checkpoint_redone.append(node)
+            node = node.parent
+
+        changes: list[Change] = []
+        for node in undone:
+            changes = compose_changes(changes, invert_changes(node.changes))
+        for node in reversed(redone):
+            changes = compose_changes(changes, node.changes)
+
+        self._set_current(target)
+
+        if self.journal is not None:
+            self.journal.record_current(self.current)
+
+        return checkpoint_text, changes
+
+    def get_path(self, number: int, other_number: int) -> tuple[list[ChangesNode], list[ChangesNode]]:
+        """Returns the path from the set of changes numbered 'number' to the one numbered 'other_number', through
+        their last common set: the nodes to be undone, in order, and the nodes to be redone, from the last."""
+
+        undone: list[ChangesNode] = []
+        redone: list[ChangesNode] = []
+
+        node, other = self.nodes[number], self.nodes[other_number]
+        while node is not other:
+            if node.number > other.number:  # A node is always newer than its parent
+                undone.append(node)
+                node = node.parent
+            else:
+                redone.append(other)
+                other = other.parent
+
+        return undone, redone
+
+    # Restoring, as from a journal. The limits are only kept at the end.
+
+    def restore_root(self, number: int) -> None:
+        """Numbers the oldest state 'number', as when older ones were forgotten. The list must be empty."""
+
+        del self.nodes[self.root.number]
+        self.root.number = number
+        self.nodes[number] = self.root
+        self._next_number = max(self._next_number, number + 1)
+
+    def restore_node(self, number: int, parent_number: int, changes: list[Change]) -> None:
+        self.current = self.nodes[parent_number]
+        self._add_node(changes, number)
+
+    def restore_changes(self, number: int, changes: list[Change]) -> None:
+        node = self.nodes[number]
+
+        self.memory_usage -= node.size
+        node.changes = changes
+        node.size = sys.getsizeof(node) + changes_size(changes)
+        self.memory_usage += node.size
+
+    def restore_deletion(self, number: int) -> None:
+        self._delete_node(self.nodes[number])
+
+    def restore_current(self, number: int, text: str) -> None:
+        """Makes the set of changes numbered 'number' the last one applied, 'text' being the text after it, which is
+        kept as a checkpoint."""
+
+        self._set_current(self.nodes[number])
+
+        if self.current.checkpoint is None:
+            self._add_checkpoint(self.current, text)
+        self._keep_limits()
+
+    def _set_current(self, node: ChangesNode) -> None:
+        """Makes 'node' the last set of changes applied, and its branch the one which is redone."""
+
+        self.close_changes()
+        self.current = node
+
+        while node.parent is not None:
+            node.parent.last_child = node
+            node = node.parent
+
+    def _add_node(self, changes: list[Change], number: int | None = None) -> None:
+        if number is None:
+            number = self._next_number
+        self._next_number = max(self._next_number, number + 1)
+
+        parent = self.current
+        node = ChangesNode(number, changes, parent)
+
+        if parent.checkpoint is not None:
+            node.checkpoint_distance = 1
+            node.checkpoint_debt = node.size
+        else:
+            node.checkpoint_distance = parent.checkpoint_distance + 1
+            node.checkpoint_debt = parent.checkpoint_debt + node.size
+
+        parent.children.append(node)
+        parent.last_child = node
+        self.nodes[node.number] = node
+        self.memory_usage += node.size
+        self.current = node
+
+    def _delete_node(self, node: ChangesNode) -> None:
+        """Deletes 'node', which must have no children, from the tree."""
+
+        parent = node.parent
+        parent.children.remove(node)
+        if parent.last_child is node:
+            parent.last_child = parent.children[-1] if parent.children else None
+
+        del self.nodes[node.number]
+        self.memory_usage -= node.size
+        self._forget_checkpoint(node)
+
+    def _checkpoint_due(self, node: ChangesNode) -> bool:
+        if node.checkpoint is not None:
+            return False
+
+        return (self.checkpoint_interval is not None and node.checkpoint_distance >= self.checkpoint_interval) or \
+            (self.checkpoint_bytes is not None and node.checkpoint_debt >= self.checkpoint_bytes)
+
+    def _checkpoint_fits(self, length: int) -> bool:
+        """Returns whether a text of 'length' characters, at one byte each, at least, can be a checkpoint."""
+
+        return self._checkpoint_size_fits(sys.getsizeof("") + length)
+
+    def _checkpoint_size_fits(self, size: int) -> bool:
+        return (self.max_checkpoint_bytes is None or size <= self.max_checkpoint_bytes) and \
+            (self.max_bytes is None or size <= self.max_bytes)
+
+    def _skip_checkpoint(self, node: ChangesNode) -> None:
+        """Counts the next checkpoint from 'node', as if it had one, so it is not tried again on every change."""
+
+        node.checkpoint_distance = 0
+        node.checkpoint_debt = 0
+
+    def _add_checkpoint(self, node: ChangesNode, text: str) -> None:
+        self._skip_checkpoint(node)
+
+        size = sys.getsizeof(text)
+        if not self._checkpoint_size_fits(size):
+            return  # The text is too long to be copied within the limits
+
+        while self.checkpoints_usage and self.max_checkpoint_bytes is not None and \
+                self.checkpoints_usage + size > self.max_checkpoint_bytes:
+            self._forget_checkpoint(self._oldest_checkpoint())
+
+        node.checkpoint = text
+        self.memory_usage += size
+        self.checkpoints_usage += size
+
+    def _oldest_checkpoint(self) -> ChangesNode | None:
+        return next((node for node in self.nodes.values() if node.checkpoint is not None), None)
+
+    def _forget_checkpoint(self, node: ChangesNode | None) -> None:
+        if node is None or node.checkpoint is None:
+            return
+
+        size = sys.getsizeof(node.checkpoint)
+        node.checkpoint = None
+        self.memory_usage -= size
+        self.checkpoints_usage -= size
+
+    def _keep_limits(self) -> None:
+        """Forgets sets of changes, from the oldest, until the limits are kept. A set of changes is forgotten if no
+        other is done after it and it is not needed to reach the last one, or if it is the only one done after the
+        oldest state and it is needed to reach the last one, but is not the last one; then, it becomes the oldest
+        state. Only if no set of changes can be forgotten are the checkpoints left, from the oldest."""
+
+        def exceeded() -> bool:
+            return (self.max_bytes is not None and self.memory_usage > self.max_bytes) or \
+                (self.max_entries is not None and len(self.nodes) - 1 > self.max_entries)
+
+        if not exceeded():
+            return
+
+        needed: set[int] | None = None  # Numbers of the nodes from the root to the current one, when known
+
+        while exceeded():
+            forgotten = None  # The oldest node which can be forgotten
+            becomes_root = False  # Whether it is needed, and is only forgotten as its changes become the oldest state
+
+            for node in self.nodes.values():
+                if node is self.root:
+                    continue
+
+                if node.parent is self.root and len(self.root.children) == 1 and self.current is not self.root:
+                    if node is not self.current:
+                        forgotten, becomes_root = node, True  # The current node is after it
+                        break
+
+                if needed is None:
+                    needed = set({})
+                    needed_node = self.current
+                    while needed_node is not None:
+                        needed.add(needed_node.number)
+                        needed_node = needed_node.parent
+                if node.number not in needed:
+                    forgotten = node
+                    break
+
+            if forgotten is None:
+                if not self.checkpoints_usage or self.max_bytes is None or self.memory_usage <= self.max_bytes:
+                    break
+                self._forget_checkpoint(self._oldest_checkpoint())
+            elif becomes_root:
+                self._delete_root()
+            else:
+                self._delete_branch(forgotten)  # The nodes done after it depend on it, so they are forgotten too
+
+    def _delete_branch(self, node: ChangesNode) -> None:
+        """Deletes 'node' and every node done after it."""
+
+        stack = [node]
+        while stack:
+            branch_node = stack[-1]
+            if branch_node.children:
+                stack.append(branch_node.children[-1])
+            else:
+                stack.pop()
+                self._delete_node(branch_node)
+
+    def _delete_root(self) -> None:
+        """Makes the only child of the root the new root. Its changes cannot be undone anymore."""
+
+        old_root = self.root
+        new_root = old_root.children[0]
+
+        del self.nodes[old_root.number]
+        self.memory_usage -= old_root.size
+        self._forget_checkpoint(old_root)
+
+        self.memory_usage -= new_root.size
+        new_root.parent = None
+        new_root.changes = []
+        new_root.size = sys.getsizeof(new_root)
+        self.memory_usage += new_root.size
+
+        self.root = new_root
+        if self.current is new_root:
+            self._merge_position = None  # Its changes cannot be merged into anymore
+
+    def _can_merge(self, changes: list[Change], now: float) -> bool:
+        if self._merge_position is None or self.merge_interval <= 0:
+            return False
+        if self.current.children or self.current.parent is None or self.current.checkpoint is not None:
+            return False
+        if len(changes) != 1 or len(changes[0].text) != 1:  # Only typing, erasing or deleting is merged
+            return False
+        if now - self._merge_time > self.merge_interval:
+            return False
+
+        change = changes[0]
+
+        if self.merge_contiguous:
+            if change.change_type == Change.NEW:
+                contiguous = change.index == self._merge_position
+            else:  # Either erased before the position (backspace) or deleted after it (delete)
+                contiguous = change.index + 1 == self._merge_position or change.index == self._merge_position
+            if not contiguous:
+                return False
+
+        if self.merge_words and change.change_type == Change.NEW:
+            if self._merge_character.isspace() and not change.text.isspace():  # A new word is started
+                return False
+
+        return True
+
+    def _update_merge_state(self, changes: list[Change]) -> None:
+        if len(changes) != 1 or len(changes[0].text) != 1:
+            self._merge_position = None
+            return
+
+        change = changes[0]
+        if change.change_type == Change.NEW:
+            self._merge_position = change.index + 1
+            self._merge_character = change.text
+        else:
+            self._merge_position = change.index
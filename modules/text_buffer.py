@@ -0,0 +1,240 @@
+"""Offers a class to keep a copy of a text which is cheap to edit and to read slices of, no matter its length."""
+
+from bisect import bisect_right
+
+
+def count_wide(text: str) -> int:
+    """Returns the number of characters of 'text' outside of the Basic Multilingual Plane, as emojis, which are two
+    code units in UTF-16, as Qt counts positions."""
+
+    if text.isascii():
+        return 0
+    return len(text.encode("utf-16-le", "surrogatepass")) // 2 - len(text)
+
+
+class TextBuffer:
+    """A text split into chunks of, at most, about 'CHUNK_SIZE' characters. Replacing a part of the text only rebuilds
+    the chunks it touches, so its cost depends on the size of the edit, not on the length of the text. The start
+    offsets of the chunks are recalculated lazily, only up to where they are needed.
+    Indexes count characters, as Python does; Qt counts positions in UTF-16 code units, where a character outside of the
+    Basic Multilingual Plane is two. 'position_of' and 'index_of' convert between them, at the cost of locating a chunk;
+    while the text has no such characters, they are the same, and nothing is converted."""
+
+    CHUNK_SIZE = 1 << 13
+
+    def __init__(self, text: str = ""):
+        self.chunks: list[str] = self._split(text)
+        self.length: int = len(text)
+        self._wides: list[int] = [count_wide(chunk) for chunk in self.chunks]  # Wide characters in each chunk
+        self.wide_count: int = sum(self._wides)  # Characters outside of the Basic Multilingual Plane, in the text
+
+        self._starts: list[int] = [0] * len(self.chunks)  # Start offsets of the chunks, and the wide characters
+        self._wide_starts: list[int] = [0] * len(self.chunks)  # before them; only the first '_valid' of them are
+        self._valid: int = 1  # up-to-date. The first chunk always starts at 0.
+
+    def __len__(self) -> int:
+        return self.length
+
+    def utf16_length(self) -> int:
+        """Returns the length of the text in UTF-16 code units, as Qt counts it."""
+
+        return self.length + self.wide_count
+
+    def position_of(self, index: int) -> int:
+        """Returns the UTF-16 position, as Qt counts it, of the character at 'index'."""
+
+        if not self.wide_count:
+            return index
+
+        index = max(0, min(index, self.length))
+        chunk_index, offset = self._locate(index)
+        return index + self._wide_starts[chunk_index] + count_wide(self.chunks[chunk_index][:offset])
+
+    def index_of(self, position: int) -> int:
+        """Returns the index of the character at the UTF-16 'position', as Qt counts it. A position inside of a wide
+        character is taken as the one after it."""
+
+        if not self.wide_count:
+            return position
+
+        position = max(0, min(position, self.utf16_length()))
+        chunk_index = self._locate_utf16(position)
+        chunk = self.chunks[chunk_index]
+        offset = position - self._starts[chunk_index] - self._wide_starts[chunk_index]
+
+        if self._wides[chunk_index]:
+            offset = len(chunk.encode("utf-16-le", "surrogatepass")[:2 * offset].decode("utf-16-le", "surrogatepass"))
+        return self._starts[chunk_index] + offset
+
+    def edit_positions(self, removed: list, inserted: list) -> tuple[list[tuple[int, int]], list[int]]:
+        """Returns the UTF-16 positions, as Qt counts them, of a set of changes to this text, to be applied in one edit
+        block, where Qt only reports the edits at its end: the start and end of each of 'removed', which are removed
+        from the last, and the position of each of 'inserted', which are inserted from the first, after them. Both are
+        sorted changes, with an 'index' and a 'text'; the indexes of 'removed' are of this text, and the ones of
+        'inserted' are of the result. The positions are reckoned from this text, offset by the code units removed, and
+        inserted, before each."""
+
+        removed_positions = [(self.position_of(change.index), self.position_of(change.index + len(change.text)))
+                             for change in removed]
+        if not self.wide_count and not any(count_wide(change.text) for change in inserted):
+            return removed_positions, [change.index for change in inserted]
+
+        inserted_positions: list[int] = []
+        removed_index = 0
+        removed_length = removed_units = 0  # Characters, and code units, removed before the current insertion
+        inserted_length = inserted_units = 0  # Characters, and code units, inserted before it
+
+        for change in inserted:
+            index = change.index - inserted_length  # Index in the text once the removals are done
+            while removed_index < len(removed) and removed[removed_index].index - removed_length <= index:
+                start, end = removed_positions[removed_index]
+                removed_length += len(removed[removed_index].text)
+                removed_units += end - start
+                removed_index += 1
+
+            inserted_positions.append(self.position_of(index + removed_length) - removed_units + inserted_units)
+            inserted_length += len(change.text)
+            inserted_units += len(change.text) + count_wide(change.text)
+
+        return removed_positions, inserted_positions
+
+    def text(self) -> str:
+        """Returns the whole text, as one string."""
+
+        return "".join(self.chunks)
+
+    def snapshot(self) -> list[str]:
+        """Returns the chunks of the text, as they are now. Later edits do not change them, so it is a cheap copy of the
+        text, which can be read in another thread."""
+
+        return list(self.chunks)
+
+    def slice(self, start: int, end: int) -> str:
+        """Returns the text between the indexes 'start' and 'end', as text[start:end]."""
+
+        start = max(0, min(start, self.length))
+        end = max(start, min(end, self.length))
+        if start == end:
+            return ""
+
+        chunk_index, offset = self._locate(start)
+        pieces: list[str] = []
+        left = end - start
+
+        while left > 0:
+            chunk = self.chunks[chunk_index]
+            piece = chunk[offset: offset + left]
+            pieces.append(piece)
+            left -= len(piece)
+            chunk_index += 1
+            offset = 0
+
+        return "".join(pieces)
+
+    def replace(self, start: int, end: int, text: str) -> None:
+        """Replaces the text between the indexes 'start' and 'end' with 'text', as text[:start] + text + text[end:]."""
+
+        start = max(0, min(start, self.length))
+        end = max(start, min(end, self.length))
+
+        first_index, first_offset = self._locate(start)
+        if end == start:  # As when inserting
+            last_index, last_offset = first_index, first_offset
+        else:
+            last_index, last_offset = self._locate(end)
+        first_start = self._starts[first_index]
+        first_wide_start = self._wide_starts[first_index]
+
+        new_text = self.chunks[first_index][:first_offset] + text + self.chunks[last_index][last_offset:]
+        self.length += len(text) - (end - start)
+
+        if first_index == last_index and 0 < len(new_text) <= 2 * self.CHUNK_SIZE:  # Only one chunk changes
+            if self.wide_count or not text.isascii():  # Only the characters replaced, and the new ones, are counted
+                wide = count_wide(text) - count_wide(self.chunks[first_index][first_offset:last_offset])
+                self._wides[first_index] += wide
+                self.wide_count += wide
+            self.chunks[first_index] = new_text
+            self._valid = min(self._valid, first_index + 1)
+            return
+
+        new_chunks = self._split(new_text)
+        if new_text == "" and len(self.chunks) > last_index - first_index + 1:
+            new_chunks = []  # Empty chunks are only kept if the text is empty
+
+        new_wides = [count_wide(chunk) for chunk in new_chunks]
+        self.wide_count += sum(new_wides) - sum(self._wides[first_index: last_index + 1])
+
+        self.chunks[first_index: last_index + 1] = new_chunks
+        self._wides[first_index: last_index + 1] = new_wides
+        self._starts[first_index: last_index + 1] = [0] * len(new_chunks)
+        self._wide_starts[first_index: last_index + 1] = [0] * len(new_chunks)
+
+        # The chunk now at 'first_index', new or not, starts where the first replaced chunk started
+        if first_index < len(self.chunks):
+            self._starts[first_index] = first_start
+            self._wide_starts[first_index] = first_wide_start
+        self._valid = min(self._valid, first_index + 1, len(self.chunks))
+
+    def _locate(self, position: int) -> tuple[int, int]:
+        """Returns the index of the chunk where 'position' is, and the offset of 'position' inside it. The end of the
+        text is located at the end of the last chunk."""
+
+        chunks = self.chunks
+        starts = self._starts
+        valid = self._valid
+
+        last = valid - 1
+        if position < starts[last] + len(chunks[last]):
+            chunk_index = bisect_right(starts, position, 0, valid) - 1
+            return chunk_index, position - starts[chunk_index]
+
+        while valid < len(chunks):
+            self._validate(valid)
+            valid += 1
+            if position < starts[valid - 1] + len(chunks[valid - 1]):
+                break
+        self._valid = valid
+
+        chunk_index = valid - 1
+        return chunk_index, position - starts[chunk_index]
+
+    def _locate_utf16(self, position: int) -> int:
+        """Returns the index of the chunk where the UTF-16 'position' is, as '_locate' does for indexes."""
+
+        chunks = self.chunks
+        starts = self._starts
+        wide_starts = self._wide_starts
+        valid = self._valid
+
+        def utf16_start(chunk_index: int) -> int: return starts[chunk_index] + wide_starts[chunk_index]
+
+        def utf16_end(chunk_index: int) -> int:
+            return utf16_start(chunk_index) + len(chunks[chunk_index]) + self._wides[chunk_index]
+
+        if position < utf16_end(valid - 1):
+            return bisect_right(range(valid), position, key=utf16_start) - 1
+
+        while valid < len(chunks):
+            self._validate(valid)
+            valid += 1
+            if position < utf16_end(valid - 1):
+                break
+        self._valid = valid
+
+        return valid - 1
+
+    def _validate(self, chunk_index: int) -> None:
+        """Calculates the start offset, and the wide characters before, of the chunk at 'chunk_index', from the ones of
+        the chunk before it, which must be up-to-date."""
+
+        self._starts[chunk_index] = self._starts[chunk_index - 1] + len(self.chunks[chunk_index - 1])
+        self._wide_starts[chunk_index] = self._wide_starts[chunk_index - 1] + self._wides[chunk_index - 1]
+
+    def _split(self, text: str) -> list[str]:
+        """Splits 'text' in chunks. There is always, at least, one chunk, even if empty."""
+
+        size = self.CHUNK_SIZE
+        if len(text) <= 2 * size:
+            return [text]
+
+        return [text[index: index + size] for index in range(0, len(text), size)]
@@ -0,0 +1,112 @@
+"""Offers functions to read and write text files piece by piece, so that large files are never handled as a whole at
+once."""
+
+import codecs
+import os
+import stat
+import tempfile
+from typing import Iterable, Iterator
+
+_UMASK = os.umask(0)  # Read once, as it can only be read by changing it
+os.umask(_UMASK)
+
+
+def read_chunks(path: str, chunk_size: int, first_chunk_size: int | None = None) -> Iterator[tuple[str, int]]:
+    """Reads the text of the file at 'path', using UTF-8, in chunks of, at most, 'chunk_size' characters, or
+    'first_chunk_size' for the first one, so that it can be shown early. Yields each chunk with the number of bytes of
+    the file read so far. Line endings are translated to "\\n", as when reading the whole file, even if split between
+    chunks."""
+
+    with open(path, "r", encoding="utf-8") as file:
+        size = first_chunk_size if first_chunk_size is not None else chunk_size
+
+        while True:
+            text = file.read(size)
+            if text == "":
+                break
+
+            yield text, file.buffer.tell()
+            size = chunk_size
+
+
+def write_atomic(path: str, chunks: Iterable[str]) -> None:
+    """Writes the text in 'chunks' to the file at 'path', using UTF-8, so that the file has either its former text or
+    the whole new one, even if the writing fails midway or the system crashes: the text is written to a temporary
+    file, next to the file, synced to the disk, and then renamed to it."""
+
+    path = os.path.realpath(path)  # If it is a link, the file it points to is replaced, not the link
+    folder = os.path.dirname(path)
+
+    descriptor, temporary_path = tempfile.mkstemp(dir=folder, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with open(descriptor, "w", encoding="utf-8") as file:
+            for chunk in chunks:
+                file.write(chunk)
+            file.flush()
+            os.fsync(file.fileno())
+
+        # The temporary file is only readable by its owner, so it gets the permissions of the file it replaces
+        if os.path.exists(path):
+            os.chmod(temporary_path, stat.S_IMODE(os.stat(path).st_mode))
+        else:
+            os.chmod(temporary_path, 0o666 & ~_UMASK)
+
+        os.replace(temporary_path, path)
+    except BaseException:
+        try:
+            os.remove(temporary_path)
+        except OSError:
+            pass
+        raise
+
+    if os.name == "posix":  # The rename is only durable once the folder is synced
+        folder_descriptor = os.open(folder, os.O_RDONLY)
+        try:
+            os.fsync(folder_descriptor)
+        finally:
+            os.close(folder_descriptor)
+
+
+def file_state(path: str, probe_size: int, size: int | None = None) -> tuple[int, int, bytes]:
+    """Returns the state of the file at 'path', to know later whether, and how, it changed: its size, its time of
+    modification, in nanoseconds, and its last 'probe_size' bytes, its probe. If 'size' is given, the file is taken to
+    be its first 'size' bytes, as when only those were read."""
+
+    status = os.stat(path)
+    if size is None:
+        size = status.st_size
+
+    with open(path, "rb") as file:
+        file.seek(max(0, size - probe_size))
+        probe = file.read(min(size, probe_size))
+
+    return size, status.st_mtime_ns, probe
+
+
+def read_appended(path: str, size: int, probe: bytes) -> tuple[str, int] | None:
+    """If the file at 'path', whose first 'size' bytes were read, ending with 'probe', has only had text appended, as a
+    log, returns the text appended, and the size of the file read, up to its last complete character. Otherwise,
+    returns None. Only the probe, and the text appended, are read. Line endings are translated as by 'read_chunks'.
+    Raises UnicodeDecodeError if the text appended is not UTF-8."""
+
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size < size:
+            return None
+
+        file.seek(size - len(probe))
+        if file.read(len(probe)) != probe:
+            return None
+
+        data = file.read()
+
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    text = decoder.decode(data)  # A character still being written is left in the decoder
+    read_size = size + len(data) - len(decoder.getstate()[0])
+
+    if text.endswith("\r"):  # It may be followed by "\n", still being written, which makes one line ending
+        text = text[:-1]
+        read_size -= 1
+    if probe.endswith(b"\r") and text.startswith("\n"):  # The "\r" read before was already a line ending
+        text = text[1:]
+
+    return text.replace("\r\n", "\n").replace("\r", "\n"), read_size
@@ -0,0 +1,38 @@
+"""Offers a class to count the lines, words and characters of a text, kept up to date while the text is edited, at a
+cost which depends on the size of each edit, not on the length of the text."""
+
+
+def count_words(text: str) -> int:
+    """Returns the number of words of 'text': its runs of characters which are not whitespace."""
+
+    return len(text.split())
+
+
+class TextStats:
+    """The numbers of 'lines', 'words' and 'characters' of a text. They are counted once, by 'reset', and then adjusted
+    from each edit, by 'replace', which only reads the characters removed and inserted, and the ones just around them:
+    a word can only be joined, or split, where the text was edited."""
+
+    def __init__(self, text: str = ""):
+        self.lines: int = 1
+        self.words: int = 0
+        self.characters: int = 0
+
+        self.reset(text)
+
+    def reset(self, text: str) -> None:
+        """Counts the whole 'text'."""
+
+        self.lines = text.count("\n") + 1
+        self.words = count_words(text)
+        self.characters = len(text)
+
+    def replace(self, removed: str, inserted: str, before: str = "", after: str = "") -> None:
+        """Adjusts the counts after 'removed' was replaced by 'inserted'. 'before' and 'after' are the characters just
+        before, and just after, the edit, or empty strings at the start, or at the end, of the text."""
+
+        self.lines += inserted.count("\n") - removed.count("\n")
+        self.characters += len(inserted) - len(removed)
+
+        # The words outside of the edit are the same; only the ones touching it, through its neighbours, can change
+        self.words += count_words(before + inserted + after) - count_words(before + removed + after)